@@ -0,0 +1,468 @@
+# reproducible (seeded, offline) time and peak memory benchmarks of the hot helper functions of the repository
+from __future__ import print_function
+import os
+import io
+import gc
+import ast
+import sys
+import json
+import time
+import types
+import platform
+import warnings
+import argparse
+import importlib.util
+import tracemalloc
+from contextlib import redirect_stdout
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import graphlab_standin
+import synthetic_data
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+# multipliers of the base size of every benchmark
+SCALES = OrderedDict([('small', 0.1), ('medium', 1.), ('large', 10.)])
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+_MODULES = {}
+
+
+def load_module(relative_path):
+    '''Import a helper module of the repository by its path (its directory first on sys.path):
+
+    The Dato helpers are imported with the pandas stand-in registered as `graphlab`.
+    '''
+    if relative_path in _MODULES:
+        return _MODULES[relative_path]
+    path = os.path.join(REPO_DIR, relative_path)
+    if relative_path.startswith('Dato-tutorials'):
+        graphlab_standin.install()
+    name = os.path.splitext(relative_path)[0].replace(os.sep, '_').replace('-', '_').replace('.', '_')
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(os.path.dirname(path))
+    _MODULES[relative_path] = module
+    return module
+
+
+def _source_trees(relative_path):
+    # the syntax trees of a script, or of the code cells of a notebook
+    path = os.path.join(REPO_DIR, relative_path)
+    with open(path) as f:
+        if not path.endswith('.ipynb'):
+            return [ast.parse(f.read())]
+        cells = json.load(f)['cells']
+    sources = [''.join(cell['source']) for cell in cells if cell['cell_type'] == 'code']
+    # (IPython magics are not Python)
+    return [ast.parse('\n'.join(line for line in source.splitlines() if not line.lstrip().startswith(('%', '!'))))
+            for source in sources]
+
+
+def load_functions(relative_path, names, namespace=None):
+    '''The functions `names` defined in a script or in the code cells of a notebook (only their definitions run).'''
+    namespace = {'np': np, 'pd': pd} if namespace is None else namespace
+    for tree in _source_trees(relative_path):
+        definitions = [node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name in names]
+        if definitions:
+            exec(compile(ast.Module(body=definitions, type_ignores=[]), relative_path, 'exec'), namespace)
+    missing = [name for name in names if name not in namespace]
+    if missing:
+        raise SkipBenchmark('%s does not define %s' % (relative_path, ', '.join(missing)))
+    return [namespace[name] for name in names]
+
+
+def load_constants(relative_path, names):
+    '''The literal values assigned to `names` anywhere in a script (e.g. under its __main__ block).'''
+    constants = {}
+    for tree in _source_trees(relative_path):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+                    and node.targets[0].id in names:
+                try:
+                    constants[node.targets[0].id] = ast.literal_eval(node.value)
+                except ValueError:
+                    continue
+    return [constants[name] for name in names]
+
+
+# Benchmarks: name -> (base size, setup). A setup(n, seed) builds the synthetic inputs and
+# returns (fn, make_args): every timed run calls fn(*make_args()), make_args being untimed.
+MARKETING_HELPERS = os.path.join('Dato-tutorials', 'marketing-analytics', 'helper_functions.py')
+SENTIMENT_HELPERS = os.path.join('Dato-tutorials', 'sentiment-analysis', 'helper_util.py')
+PATTERN_VISUALIZATION = os.path.join('Dato-tutorials', 'pattern-mining', 'visualization_helper_functions.py')
+BNP_CLASSIFIER = os.path.join('KAGGLE', 'BNP_Paribas_Cardif_Claims_Management', 'XGBoostTree.Classifier.py')
+BLACKJACK_NOTEBOOK = os.path.join('Reinforcement-Learning', 'MC-simulations', '01.BlackJack_MC.ipynb')
+RL_PROFILE_UTILS = os.path.join('Reinforcement-Learning', 'Profile_Utils.py')
+
+
+def setup_add_running_date(n, seed):
+    helpers = load_module(MARKETING_HELPERS)
+    bank = synthetic_data.bank_marketing_data(n, seed=seed)[['year', 'month_nr', 'wkday_nr']]
+    return (lambda data: helpers.add_running_date(data, 'year', 'month_nr', 'wkday_nr'),
+            lambda: (graphlab_standin.SFrame(bank),))
+
+
+def setup_add_timestamps(n, seed):
+    helpers = load_module(MARKETING_HELPERS)
+    bank = synthetic_data.bank_marketing_data(n, seed=seed)[['month', 'day_of_week']]
+    return (lambda data: helpers.add_timestamps(data, 2008),
+            lambda: (bank.copy(),))
+
+
+def setup_get_comparisons(n, seed):
+    helpers = load_module(SENTIMENT_HELPERS)
+    a = helpers.gl.SFrame(synthetic_data.tagged_reviews(n, seed=seed, name='Item A'))
+    b = helpers.gl.SFrame(synthetic_data.tagged_reviews(n, seed=seed + 1, name='Item B'))
+    aspects = synthetic_data.REVIEW_ASPECTS
+    return (lambda: helpers.get_comparisons(a, b, 'Item A', 'Item B', aspects)), lambda: ()
+
+
+def setup_get_extreme_sentences(n, seed):
+    helpers = load_module(SENTIMENT_HELPERS)
+    tagged = helpers.gl.SFrame(synthetic_data.tagged_reviews(n, seed=seed))
+    return (lambda: helpers.get_extreme_sentences(tagged, k=100)), lambda: ()
+
+
+def setup_item_freq_plot(n, seed):
+    import matplotlib
+    matplotlib.use('Agg')
+    helpers = load_module(PATTERN_VISUALIZATION)
+    bakery = graphlab_standin.SFrame(synthetic_data.bakery_receipts(n, seed=seed))
+    return (lambda: helpers.item_freq_plot(bakery, 'Item', topk=30)), lambda: ()
+
+
+def _bnp_inputs(n, seed):
+    train, test = synthetic_data.bnp_data(n, seed=seed)
+    return train.drop(['ID', 'target'], axis=1), test.drop(['ID'], axis=1)
+
+
+class _Imputer(object):
+    '''Stand-in of the (removed) sklearn.preprocessing.Imputer: mean imputation of the NaNs, column by column.'''
+    def __init__(self, missing_values='NaN', strategy='mean'):
+        if strategy != 'mean':
+            raise ValueError('Only the mean imputation is supported.')
+
+    def fit(self, X):
+        self.statistics_ = np.nanmean(np.asarray(X, dtype=np.float64), axis=0)
+        return self
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return np.where(np.isnan(X), self.statistics_, X)
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+
+class _LegacySeries(pd.Series):
+    # Series.append (removed in pandas 2)
+    @property
+    def _constructor(self):
+        return _LegacySeries
+
+    def append(self, other):
+        return _LegacySeries(pd.concat([self, other]))
+
+
+def _legacy_factorize(values, na_sentinel=-1, **kwargs):
+    # factorize(na_sentinel=...) (removed in pandas 2)
+    codes, uniques = pd.factorize(values, **kwargs)
+    codes[codes == -1] = na_sentinel
+    return codes, uniques
+
+
+def _bnp_functions(names):
+    # the BNP script imports removed sklearn modules: only its function definitions are loaded, with
+    # the stand-ins of the removed sklearn/pandas APIs it relies on
+    legacy_pd = types.ModuleType('pandas')
+    legacy_pd.__dict__.update(pd.__dict__)
+    legacy_pd.Series, legacy_pd.factorize = _LegacySeries, _legacy_factorize
+    return load_functions(BNP_CLASSIFIER, names, namespace={'np': np, 'pd': legacy_pd, 'Imputer': _Imputer})
+
+
+def setup_clean_encode_data(n, seed):
+    clean_encode_data, = _bnp_functions(['clean_encode_data'])
+    todrop_float, todrop_categorical = load_constants(BNP_CLASSIFIER, ['attribs_todrop_float',
+                                                                       'attribs_todrop_categorical'])
+    train, test = _bnp_inputs(n, seed)
+    # the function drops (in place) and encodes the attributes of its inputs: fresh copies for every run
+    return (lambda train, test: clean_encode_data(train, test, attribs_todrop=todrop_float + todrop_categorical),
+            lambda: (train.copy(), test.copy()))
+
+
+def setup_remove_collinear_predictors(n, seed):
+    remove_collinear_predictors, = _bnp_functions(['remove_collinear_predictors'])
+    todrop_float, = load_constants(BNP_CLASSIFIER, ['attribs_todrop_float'])
+    train, test = _bnp_inputs(n, seed)
+    features_float = [attrib for attrib in train.select_dtypes(include=['float64']).columns
+                      if attrib not in todrop_float]
+    return (lambda train, test: remove_collinear_predictors(train, test, features_float, threshold=0.97),
+            lambda: (train.copy(), test.copy()))
+
+
+def _blackjack_q_values(seed):
+    # (player sum 12..21, dealer card 1..10, usable ace, action) returns and counts, with ties
+    rng = np.random.RandomState(seed)
+    q_values = rng.randint(-3, 3, size=(10, 10, 2, 2)).astype(np.float64)
+    return q_values, np.ones_like(q_values)
+
+
+def setup_rl_argmax(n, seed):
+    argmax, = load_functions(BLACKJACK_NOTEBOOK, ['argmax'])
+    rows = _blackjack_q_values(seed)[0].reshape(-1, 2)
+    rows = rows[np.random.RandomState(seed).randint(0, len(rows), n)]
+
+    def run():
+        np.random.seed(seed)
+        for q_values in rows:
+            argmax(q_values)
+    return run, lambda: ()
+
+
+def setup_rl_behavior_policy(n, seed):
+    argmax, behavior_policy = load_functions(BLACKJACK_NOTEBOOK, ['argmax', 'behavior_policy'])
+    behavior_policy.__globals__['argmax'] = argmax
+    q_values, q_values_count = _blackjack_q_values(seed)
+    rng = np.random.RandomState(seed)
+    observations = list(zip(rng.randint(12, 22, n), rng.randint(1, 11, n), rng.rand(n) < 0.5))
+
+    def run():
+        np.random.seed(seed)
+        for obs in observations:
+            behavior_policy(obs, q_values, q_values_count, epsilon=0.1)
+    return run, lambda: ()
+
+
+def setup_rl_epsilon_greedy(n, seed):
+    profile_utils = load_module(RL_PROFILE_UTILS)
+    # a Taxi-v3 sized table, with ties
+    rng = np.random.RandomState(seed)
+    q_values = rng.randint(-5, 5, size=(500, 6)).astype(np.float64)
+    states = rng.randint(0, 500, n)
+
+    def run():
+        np.random.seed(seed)
+        for state in states:
+            profile_utils._epsilon_greedy(q_values, state, 0.017)
+    return run, lambda: ()
+
+
+BENCHMARKS = OrderedDict([
+    ('add_running_date', (10000, setup_add_running_date)),
+    ('add_timestamps', (10000, setup_add_timestamps)),
+    ('get_comparisons', (20000, setup_get_comparisons)),
+    ('get_extreme_sentences', (20000, setup_get_extreme_sentences)),
+    ('item_freq_plot', (20000, setup_item_freq_plot)),
+    ('clean_encode_data', (10000, setup_clean_encode_data)),
+    ('remove_collinear_predictors', (10000, setup_remove_collinear_predictors)),
+    ('rl_argmax', (20000, setup_rl_argmax)),
+    ('rl_behavior_policy', (20000, setup_rl_behavior_policy)),
+    ('rl_epsilon_greedy', (20000, setup_rl_epsilon_greedy))])
+
+
+def _close_figures():
+    if 'matplotlib.pyplot' in sys.modules:
+        sys.modules['matplotlib.pyplot'].close('all')
+
+
+def run_benchmark(name, scale='medium', repeat=3, seed=0):
+    '''Time (best and median of `repeat` runs) and peak memory (one traced run) of a benchmark:
+
+    Returns
+    -------
+    record: OrderedDict
+        'status' ('ok', 'skipped' when a dependency is missing, or 'error'), 'size',
+        'time_s', 'time_median_s', 'peak_mb' (the peak of the memory allocated by the run)
+        and the 'reason' of a skip or an error.
+    '''
+    base_size, setup = BENCHMARKS[name]
+    size = max(1, int(round(base_size * SCALES[scale])))
+    record = OrderedDict([('status', 'ok'), ('size', size)])
+    output = io.StringIO()
+    warnings.simplefilter('ignore')
+    try:
+        with redirect_stdout(output):
+            fn, make_args = setup(size, seed)
+    except (ImportError, SyntaxError, SkipBenchmark) as e:
+        record.update(status='skipped', reason='%s: %s' % (e.__class__.__name__, e))
+        return record
+
+    try:
+        times = []
+        for _ in range(repeat):
+            args = make_args()
+            gc.collect()
+            with redirect_stdout(output):
+                t0 = time.perf_counter()
+                fn(*args)
+                times.append(time.perf_counter() - t0)
+            _close_figures()
+            output.seek(0)
+            output.truncate()
+
+        args = make_args()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with redirect_stdout(output):
+                fn(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            _close_figures()
+    except Exception as e:
+        record.update(status='error', reason='%s: %s' % (e.__class__.__name__, e))
+        return record
+
+    record.update(time_s=min(times), time_median_s=float(np.median(times)), peak_mb=peak / 2. ** 20)
+    return record
+
+
+def environment():
+    '''The machine and library versions of a run (baselines are only comparable on the same machine).'''
+    return OrderedDict([('machine', platform.machine()), ('processor', platform.processor()),
+                        ('node', platform.node()), ('python', platform.python_version()),
+                        ('numpy', np.__version__), ('pandas', pd.__version__),
+                        ('graphlab', 'pandas stand-in')])
+
+
+def run_benchmarks(names=None, scales=('small', 'medium'), repeat=3, seed=0, verbose=True):
+    '''Run the benchmarks at the given scales:
+
+    Returns
+    -------
+    results: OrderedDict
+        'environment', 'seed', and 'results' (benchmark -> scale -> record, see `run_benchmark`).
+    '''
+    results = OrderedDict()
+    if verbose:
+        print('{0:<30s}{1:>8s}{2:>10s}{3:>12s}{4:>12s}  {5}'.format('benchmark', 'scale', 'size', 'time [s]',
+                                                                    'peak [MB]', 'status'))
+        print('-' * 84)
+    for name in (names or list(BENCHMARKS.keys())):
+        results[name] = OrderedDict()
+        for scale in scales:
+            record = run_benchmark(name, scale=scale, repeat=repeat, seed=seed)
+            results[name][scale] = record
+            if verbose:
+                if record['status'] == 'ok':
+                    print('{0:<30s}{1:>8s}{2:>10,d}{3:>12.4f}{4:>12.2f}  ok'.format(name, scale, record['size'],
+                                                                                   record['time_s'],
+                                                                                   record['peak_mb']))
+                else:
+                    print('{0:<30s}{1:>8s}{2:>10,d}{3:>12s}{4:>12s}  {5} ({6})'.format(
+                        name, scale, record['size'], '-', '-', record['status'], record['reason'][:60]))
+    return OrderedDict([('environment', environment()), ('seed', seed), ('results', results)])
+
+
+def compare(results, baseline, time_tolerance=0.25, memory_tolerance=0.25, min_time_s=0.02, min_memory_mb=1.):
+    '''The regressions of a run against a baseline:
+
+    A benchmark regresses when its (best) time exceeds the baseline one by more
+    than `time_tolerance` (relative) and `min_time_s` (absolute, the timer noise),
+    when its peak memory exceeds the baseline one by more than `memory_tolerance`
+    and `min_memory_mb`, or when it fails while it succeeded in the baseline.
+    Benchmarks missing from the baseline, or of a different size, are not compared.
+
+    Returns
+    -------
+    regressions: list of strings
+    '''
+    regressions = []
+    for name, records in results['results'].items():
+        for scale, record in records.items():
+            reference = baseline['results'].get(name, {}).get(scale)
+            if reference is None or reference['status'] != 'ok' or reference['size'] != record['size']:
+                continue
+            label = '%s [%s]' % (name, scale)
+            if record['status'] == 'error':
+                regressions.append('%s fails: %s' % (label, record['reason']))
+                continue
+            if record['status'] != 'ok':
+                continue
+            if record['time_s'] > reference['time_s'] * (1. + time_tolerance) + min_time_s:
+                regressions.append('%s time %.4fs > baseline %.4fs (+%.0f%%)'
+                                   % (label, record['time_s'], reference['time_s'],
+                                      100. * (record['time_s'] / reference['time_s'] - 1.)))
+            if record['peak_mb'] > reference['peak_mb'] * (1. + memory_tolerance) + min_memory_mb:
+                regressions.append('%s peak memory %.2fMB > baseline %.2fMB'
+                                   % (label, record['peak_mb'], reference['peak_mb']))
+    return regressions
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def save_baseline(results, path):
+    '''Store the results as the baseline (keeping the baseline records of the benchmarks not run).'''
+    if os.path.exists(path):
+        baseline = load_baseline(path)
+        for name, records in results['results'].items():
+            baseline['results'].setdefault(name, OrderedDict()).update(records)
+        baseline['environment'], baseline['seed'] = results['environment'], results['seed']
+    else:
+        baseline = results
+    with open(path + '.tmp', 'w') as f:
+        json.dump(baseline, f, indent=2)
+    os.rename(path + '.tmp', path)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Seeded time and peak memory benchmarks of the helper functions.')
+    parser.add_argument('benchmarks', nargs='*',
+                        help='benchmarks to run, among {} (default: all)'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--scales', nargs='+', default=['small', 'medium'], choices=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=3, help='number of timed runs (the best one is kept)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='JSON baseline file (recorded by the first run, compared against afterwards)')
+    parser.add_argument('--update-baseline', action='store_true', help='record the results as the new baseline')
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help='relative time regression tolerance')
+    parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                        help='relative peak memory regression tolerance')
+    parser.add_argument('--output', default=None, help='JSON file to store the results')
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown benchmarks: {}'.format(', '.join(unknown)))
+
+    results = run_benchmarks(args.benchmarks, scales=args.scales, repeat=args.repeat, seed=args.seed)
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        save_baseline(results, args.baseline)
+        print('\nBaseline recorded: %s' % args.baseline)
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    if baseline.get('environment', {}).get('node') != results['environment']['node']:
+        print('\nWarning: the baseline was recorded on another machine (%s).'
+              % baseline.get('environment', {}).get('node'))
+    regressions = compare(results, baseline, time_tolerance=args.time_tolerance,
+                          memory_tolerance=args.memory_tolerance)
+    if regressions:
+        print('\nRegressions against %s:' % args.baseline)
+        for regression in regressions:
+            print('  ' + regression)
+        sys.exit(1)
+    print('\nNo regression against %s.' % args.baseline)
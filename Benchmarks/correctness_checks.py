@@ -0,0 +1,91 @@
+# seeded (offline) correctness checks of the helper functions of the repository, next to their benchmarks
+from __future__ import print_function
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import traceback
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from benchmark_suite import load_module
+
+STREAMING_HELPERS = os.path.join('Dato-tutorials', 'anomaly-detection', 'streaming_helper_functions.py')
+LOADING_HELPERS = os.path.join('Finance-Banking-Related', 'data_loading_helper_functions.py')
+
+
+def check_changepoint_index(seed=0):
+    # a mean shift at index 300 is scored highest at 300 (index 0, the start of the first run, aside)
+    helpers = load_module(STREAMING_HELPERS)
+    rng = np.random.RandomState(seed)
+    values = np.concatenate([rng.randn(300), rng.randn(200) + 4.])
+    for lag in (1, 5, 20):
+        scores = helpers.OnlineBayesianChangepoints(expected_runlength=100, lag=lag).fit(values)
+        index = 1 + int(np.nanargmax(scores[1:]))
+        assert index == 300, 'lag=%d: changepoint reported at %d instead of 300' % (lag, index)
+
+
+def _memmapped(array):
+    # an array (a view of a view...) over a memory map
+    while array is not None and not isinstance(array, np.memmap):
+        array = getattr(array, 'base', None)
+    return array is not None
+
+
+def check_columnar_cache_memmap(seed=0):
+    # the loaded columns are backed by the memory-mapped column files (not copied into memory)
+    helpers = load_module(LOADING_HELPERS)
+    rng = np.random.RandomState(seed)
+    data_df = pd.DataFrame({'amount': rng.rand(1000).astype('float32'), 'age': rng.randint(18, 80, 1000),
+                            'grade': pd.Categorical(rng.choice(list('ABC'), 1000)),
+                            'issue_d': pd.date_range('2015-01-01', periods=1000, freq='D')})
+    cache_dir = tempfile.mkdtemp()
+    try:
+        helpers.save_columnar(data_df, os.path.join(cache_dir, 'cache'))
+        loaded = helpers.load_columnar(os.path.join(cache_dir, 'cache'))
+        for attrib in ['amount', 'age', 'issue_d']:
+            assert _memmapped(loaded[attrib].values), '%s is not memory-mapped' % attrib
+        assert _memmapped(loaded['grade'].values.codes), 'grade is not memory-mapped'
+        pd.testing.assert_frame_equal(loaded, data_df)
+        del loaded
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+CHECKS = OrderedDict([
+    ('changepoint_index', check_changepoint_index),
+    ('columnar_cache_memmap', check_columnar_cache_memmap),
+])
+
+
+def run_checks(names=None, seed=0):
+    '''Run the checks, returning the names of the failed ones.'''
+    failed = []
+    for name in names or CHECKS:
+        try:
+            CHECKS[name](seed=seed)
+            print('%-32s ok' % name)
+        except Exception:
+            print('%-32s FAILED' % name)
+            traceback.print_exc()
+            failed.append(name)
+    return failed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Seeded correctness checks of the helper functions.')
+    parser.add_argument('checks', nargs='*', help='checks to run, among {} (default: all)'.format(', '.join(CHECKS)))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    unknown = [name for name in args.checks if name not in CHECKS]
+    if unknown:
+        parser.error('unknown checks: {}'.format(', '.join(unknown)))
+
+    sys.exit(1 if run_checks(args.checks, seed=args.seed) else 0)
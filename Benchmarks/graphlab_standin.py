@@ -0,0 +1,309 @@
+# pandas-backed stand-in of the GraphLab Create (SFrame/SArray/aggregate) subset used by the Dato helpers
+import sys
+import types
+import operator
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+class SArray(object):
+    '''A column (a pandas Series with a default index).'''
+    def __init__(self, data=None, dtype=None):
+        if isinstance(data, SArray):
+            data = data._series
+        if isinstance(data, pd.Series):
+            series = data.reset_index(drop=True)
+        else:
+            data = [] if data is None else data
+            values = list(data) if not isinstance(data, np.ndarray) else data
+            if len(values) and any(isinstance(value, (dict, list)) for value in values):
+                series = pd.Series(values, dtype=object)
+            else:
+                series = pd.Series(values)
+        self._series = series if dtype is None else series.astype(dtype)
+
+    def __len__(self):
+        return len(self._series)
+
+    def __iter__(self):
+        return iter(self._series.tolist())
+
+    def __getitem__(self, key):
+        if isinstance(key, SArray):
+            return SArray(self._series[key._series.values.astype(bool)])
+        if isinstance(key, slice):
+            return SArray(self._series.iloc[key])
+        return self._series.iat[key]
+
+    def __repr__(self):
+        return 'SArray(%r)' % self._series.tolist()[:10]
+
+    def astype(self, dtype):
+        return SArray(self._series.astype(dtype))
+
+    def apply(self, fn, dtype=None):
+        return SArray([fn(value) for value in self._series.tolist()], dtype=dtype)
+
+    def unique(self):
+        return SArray(pd.unique(self._series.values))
+
+    def sort(self, ascending=True):
+        return SArray(self._series.sort_values(ascending=ascending, kind='mergesort'))
+
+    def dropna(self):
+        return SArray(self._series.dropna())
+
+    def head(self, n=10):
+        return SArray(self._series.iloc[:n])
+
+    def sum(self):
+        return self._series.sum()
+
+    def mean(self):
+        return self._series.mean()
+
+    def max(self):
+        return self._series.max()
+
+    def min(self):
+        return self._series.min()
+
+    def to_numpy(self):
+        return self._series.values
+
+
+def _binary(op, reflected=False):
+    def method(self, other):
+        other = other._series.values if isinstance(other, SArray) else other
+        return SArray(op(other, self._series) if reflected else op(self._series, other))
+    return method
+
+
+# element-wise arithmetic and comparisons (returning SArrays)
+for _name, _op in [('add', operator.add), ('sub', operator.sub), ('mul', operator.mul),
+                   ('truediv', operator.truediv), ('div', operator.truediv), ('eq', operator.eq),
+                   ('ne', operator.ne), ('lt', operator.lt), ('le', operator.le), ('gt', operator.gt),
+                   ('ge', operator.ge), ('and', operator.and_), ('or', operator.or_)]:
+    setattr(SArray, '__%s__' % _name, _binary(_op))
+for _name, _op in [('radd', operator.add), ('rsub', operator.sub), ('rmul', operator.mul),
+                   ('rtruediv', operator.truediv)]:
+    setattr(SArray, '__%s__' % _name, _binary(_op, reflected=True))
+SArray.__hash__ = None
+
+
+# aggregation specifications: (operation, column)
+def COUNT(*args):
+    return ('count', None)
+
+
+def SUM(column):
+    return ('sum', column)
+
+
+def AVG(column):
+    return ('mean', column)
+
+
+MEAN = AVG
+
+
+def MAX(column):
+    return ('max', column)
+
+
+def MIN(column):
+    return ('min', column)
+
+
+def CONCAT(column):
+    return ('concat', column)
+
+
+def SELECT_ONE(column):
+    return ('select_one', column)
+
+
+def COUNT_DISTINCT(column):
+    return ('count_distinct', column)
+
+
+_DEFAULT_NAMES = {'count': 'Count', 'sum': 'Sum of %s', 'mean': 'Avg of %s', 'max': 'Max of %s',
+                  'min': 'Min of %s', 'concat': 'List of %s', 'select_one': 'Select One of %s',
+                  'count_distinct': 'Count Distinct of %s'}
+
+
+def _aggregate(grouped, operation, column):
+    if operation == 'count':
+        return grouped.size()
+    if operation == 'concat':
+        return grouped[column].agg(lambda values: [value for value in values if not _is_missing(value)])
+    if operation == 'select_one':
+        return grouped[column].first()
+    if operation == 'count_distinct':
+        return grouped[column].nunique()
+    return grouped[column].agg(operation)
+
+
+class SFrame(object):
+    '''A table (a pandas DataFrame with a default index).'''
+    def __init__(self, data=None):
+        if isinstance(data, SFrame):
+            data = data._df
+        if isinstance(data, pd.DataFrame):
+            self._df = data.reset_index(drop=True)
+        else:
+            data = OrderedDict() if data is None else data
+            self._df = pd.DataFrame(OrderedDict((name, SArray(values)._series) for name, values in data.items()))
+
+    def __len__(self):
+        return len(self._df)
+
+    def num_rows(self):
+        return len(self._df)
+
+    def column_names(self):
+        return list(self._df.columns)
+
+    def __repr__(self):
+        return 'SFrame(%d rows: %s)' % (len(self._df), ', '.join(map(str, self._df.columns)))
+
+    def __iter__(self):
+        return iter(self._df.to_dict('records'))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return SArray(self._df[key])
+        if isinstance(key, SArray):
+            return SFrame(self._df[key._series.values.astype(bool)])
+        if isinstance(key, list):
+            return SFrame(self._df[key])
+        if isinstance(key, slice):
+            return SFrame(self._df.iloc[key])
+        return self._df.iloc[key].to_dict()
+
+    def __setitem__(self, name, values):
+        if isinstance(values, SArray):
+            values = values._series.values
+        elif not np.isscalar(values):
+            values = SArray(values)._series.values
+        self._df[name] = values
+
+    def select_columns(self, column_names):
+        return SFrame(self._df[list(column_names)])
+
+    def head(self, n=10):
+        return SFrame(self._df.iloc[:n])
+
+    def to_dataframe(self):
+        return self._df.copy()
+
+    def apply(self, fn, dtype=None):
+        return SArray([fn(row) for row in self._df.to_dict('records')], dtype=dtype)
+
+    def filter_by(self, values, column_name, exclude=False):
+        if isinstance(values, SArray):
+            values = values._series.tolist()
+        elif np.isscalar(values) or values is None:
+            values = [values]
+        mask = self._df[column_name].isin(list(values)).values
+        return SFrame(self._df[~mask if exclude else mask])
+
+    def dropna(self, columns=None, how='any'):
+        if isinstance(columns, str):
+            columns = [columns]
+        return SFrame(self._df.dropna(subset=columns, how=how))
+
+    def sort(self, key_column_names, ascending=True):
+        return SFrame(self._df.sort_values(key_column_names, ascending=ascending, kind='mergesort'))
+
+    def topk(self, column_name, k=10, reverse=False):
+        # the k largest values (the k smallest with reverse=True), sorted
+        return SFrame(self._df.sort_values(column_name, ascending=reverse, kind='mergesort').iloc[:k])
+
+    def join(self, right, on=None, how='inner'):
+        if on is None:
+            on = [name for name in self._df.columns if name in right._df.columns]
+        return SFrame(self._df.merge(right._df, on=on, how=how))
+
+    def groupby(self, key_columns, operations):
+        if isinstance(key_columns, str):
+            key_columns = [key_columns]
+        if not isinstance(operations, dict):
+            operations = [operations] if callable(operations) or isinstance(operations, tuple) else operations
+            specs = [operation() if callable(operation) else operation for operation in operations]
+            operations = OrderedDict((_DEFAULT_NAMES[op] % column if column else _DEFAULT_NAMES[op], (op, column))
+                                     for op, column in specs)
+        grouped = self._df.groupby(list(key_columns), sort=False, dropna=False)
+        columns = OrderedDict()
+        for name, operation in operations.items():
+            op, column = operation() if callable(operation) else operation
+            columns[name] = _aggregate(grouped, op, column)
+        return SFrame(pd.DataFrame(columns).reset_index())
+
+    def stack(self, column_name, new_column_name=None, drop_na=False):
+        '''One row per element of a list column, or per (key, value) pair of a dict column.'''
+        values = self._df[column_name].tolist()
+        is_dict = any(isinstance(value, dict) for value in values)
+        rows = []
+        for value in values:
+            items = [] if _is_missing(value) else list(value.items()) if is_dict else list(value)
+            if not items and not drop_na:
+                items = [(None, None)] if is_dict else [None]
+            rows.append(items)
+        positions = np.repeat(np.arange(len(values)), [len(items) for items in rows])
+        stacked = self._df.drop(columns=[column_name]).iloc[positions].reset_index(drop=True)
+        flat = [item for items in rows for item in items]
+        if is_dict:
+            key_name, value_name = new_column_name or ['K', 'V']
+            stacked[key_name] = pd.Series([key for key, _ in flat], dtype=object)
+            stacked[value_name] = pd.Series([value for _, value in flat], dtype=object)
+        else:
+            stacked[new_column_name or column_name] = pd.Series(flat, dtype=object)
+        return SFrame(stacked)
+
+
+class PartOfSpeech(object):
+    ADJ = 'ADJ'
+    NOUN = 'NOUN'
+    VERB = 'VERB'
+
+
+def _unavailable(name):
+    def fn(*args, **kwargs):
+        raise NotImplementedError('graphlab.%s is not available in the pandas stand-in.' % name)
+    return fn
+
+
+def install():
+    '''Register the stand-in as the `graphlab` package (and the submodules the helpers import).'''
+    aggregate = types.ModuleType('graphlab.aggregate')
+    for name in ('COUNT', 'SUM', 'AVG', 'MEAN', 'MAX', 'MIN', 'CONCAT', 'SELECT_ONE', 'COUNT_DISTINCT'):
+        setattr(aggregate, name, globals()[name])
+
+    text_analytics = types.ModuleType('graphlab.toolkits.text_analytics')
+    for name in ('trim_rare_words', 'split_by_sentence', 'extract_parts_of_speech', 'stopwords'):
+        setattr(text_analytics, name, _unavailable('toolkits.text_analytics.' + name))
+    text_analytics.PartOfSpeech = PartOfSpeech
+    toolkits = types.ModuleType('graphlab.toolkits')
+    toolkits.text_analytics = text_analytics
+
+    sframe = types.ModuleType('graphlab.data_structures.sframe')
+    sframe.SFrame = SFrame
+    data_structures = types.ModuleType('graphlab.data_structures')
+    data_structures.sframe = sframe
+
+    graphlab = types.ModuleType('graphlab')
+    graphlab.__doc__ = 'pandas-backed stand-in of GraphLab Create (benchmarks only)'
+    graphlab.SArray, graphlab.SFrame = SArray, SFrame
+    graphlab.aggregate, graphlab.toolkits, graphlab.data_structures = aggregate, toolkits, data_structures
+
+    sys.modules.update({'graphlab': graphlab, 'graphlab.aggregate': aggregate, 'graphlab.toolkits': toolkits,
+                        'graphlab.toolkits.text_analytics': text_analytics,
+                        'graphlab.data_structures': data_structures, 'graphlab.data_structures.sframe': sframe})
+    return graphlab
@@ -0,0 +1,217 @@
+# generators of (seeded) synthetic data sets mimicking the schemas of the real data sets of the repository
+import calendar
+import string
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+# BNP Paribas Cardif claims: v1..v131, 19 nominal (object) and 4 ordinal (int64) attributes, floats otherwise
+BNP_NOMINAL_CARDINALITIES = OrderedDict([
+    ('v3', 3), ('v22', 18210), ('v24', 5), ('v30', 7), ('v31', 3), ('v47', 10), ('v52', 12), ('v56', 122),
+    ('v66', 3), ('v71', 9), ('v74', 3), ('v75', 4), ('v79', 18), ('v91', 7), ('v107', 7), ('v110', 3),
+    ('v112', 22), ('v113', 36), ('v125', 90)])
+BNP_ORDINAL_MAXIMA = OrderedDict([('v38', 12), ('v62', 7), ('v72', 12), ('v129', 11)])
+BNP_FLOAT_ATTRIBS = ['v%d' % i for i in range(1, 132)
+                     if 'v%d' % i not in BNP_NOMINAL_CARDINALITIES and 'v%d' % i not in BNP_ORDINAL_MAXIMA]
+
+
+def _level_names(n_levels):
+    # 'A', 'B', ..., 'Z', 'AA', 'AB', ... (as the anonymized BNP levels)
+    names = []
+    for i in range(n_levels):
+        name = ''
+        i += 1
+        while i > 0:
+            i, r = divmod(i - 1, 26)
+            name = string.ascii_uppercase[r] + name
+        names.append(name)
+    return np.array(names, dtype=object)
+
+
+def _zipf_choice(rng, n_levels, size, exponent=1.1):
+    weights = 1. / np.arange(1, n_levels + 1) ** exponent
+    return rng.choice(n_levels, size=size, p=weights / weights.sum())
+
+
+def bnp_data(n_rows, seed=0, test_fraction=0.5, missing_block_rate=0.43, collinear_fraction=0.3):
+    '''Synthetic BNP Paribas Cardif claims data (the train.csv/test.csv layout):
+
+    Float attributes are noisy loadings of a few latent factors (a fraction
+    of them nearly collinear), mostly missing together for a block of rows
+    (as in the real data set); nominal attributes are Zipf-distributed
+    anonymized levels (with missing values), ordinal ones small counts.
+
+    Parameters
+    ----------
+    n_rows: int
+        The number of train rows.
+    seed: int
+    test_fraction: float
+        The number of test rows, as a fraction of n_rows.
+    missing_block_rate: float
+        The fraction of rows whose float attributes are (mostly) missing.
+    collinear_fraction: float
+        The fraction of float attributes that are nearly collinear with another one.
+
+    Returns
+    -------
+    (train, test): tuple of DataFrames
+        With the 'ID', ('target',) v1..v131 attributes.
+    '''
+    rng = np.random.RandomState(seed)
+    n_test = int(round(n_rows * test_fraction))
+    n_total = n_rows + n_test
+    n_factors = 12
+
+    factors = rng.randn(n_total, n_factors)
+    loadings = rng.randn(n_factors, len(BNP_FLOAT_ATTRIBS)) * (rng.rand(n_factors, len(BNP_FLOAT_ATTRIBS)) < 0.3)
+    floats = factors.dot(loadings) + rng.randn(n_total, len(BNP_FLOAT_ATTRIBS))
+    collinear = np.flatnonzero(rng.rand(len(BNP_FLOAT_ATTRIBS)) < collinear_fraction)
+    for j in collinear[collinear > 0]:
+        floats[:, j] = 2.5 * floats[:, j - 1] + 0.01 * rng.randn(n_total)
+    # positive, scaled values (as the anonymized ones of the data set)
+    floats = 20 * (floats - floats.min(axis=0)) / np.ptp(floats, axis=0)
+    missing_block = rng.rand(n_total) < missing_block_rate
+    floats[missing_block] = np.where(rng.rand(missing_block.sum(), len(BNP_FLOAT_ATTRIBS)) < 0.95, np.nan,
+                                     floats[missing_block])
+    floats[rng.rand(n_total, len(BNP_FLOAT_ATTRIBS)) < 0.01] = np.nan
+
+    columns = OrderedDict()
+    for attrib, values in zip(BNP_FLOAT_ATTRIBS, floats.T):
+        columns[attrib] = values
+    for attrib, n_levels in BNP_NOMINAL_CARDINALITIES.items():
+        levels = _level_names(n_levels)[_zipf_choice(rng, n_levels, n_total)]
+        levels[rng.rand(n_total) < 0.03] = np.nan
+        columns[attrib] = levels
+    for attrib, maximum in BNP_ORDINAL_MAXIMA.items():
+        columns[attrib] = rng.poisson(maximum / 4., n_total).clip(0, maximum).astype(np.int64)
+
+    # the nominal attributes keep the object dtype (as read by older pandas versions)
+    data = pd.DataFrame(OrderedDict((attrib, pd.Series(columns[attrib], dtype=object)
+                                     if attrib in BNP_NOMINAL_CARDINALITIES else columns[attrib])
+                                    for attrib in ['v%d' % i for i in range(1, 132)]))
+    score = factors[:, 0] + 0.5 * factors[:, 1] + 1.2
+    target = (rng.rand(n_total) < 1. / (1. + np.exp(-score))).astype(np.int64)
+    data.insert(0, 'ID', np.arange(n_total, dtype=np.int64) * 2 + 3)
+
+    train = data.iloc[:n_rows].reset_index(drop=True)
+    train.insert(1, 'target', target[:n_rows])
+    test = data.iloc[n_rows:].reset_index(drop=True)
+    return train, test
+
+
+BANK_JOBS = ['admin.', 'blue-collar', 'technician', 'services', 'management', 'retired', 'entrepreneur',
+             'self-employed', 'housemaid', 'unemployed', 'student', 'unknown']
+
+
+def bank_marketing_data(n_rows, seed=0, start='2008-05-05', end='2010-11-30'):
+    '''Synthetic bank marketing (lead scoring) contacts, in chronological order:
+
+    As the real campaign, the contacts are made on business days of the months
+    'mar'..'dec', more intensively at its start; the month and day_of_week
+    attributes are given both as names and as numbers (month_nr, and wkday_nr
+    with Sunday=0), with the year of every contact.
+
+    Returns
+    -------
+    data_df: DataFrame
+    '''
+    rng = np.random.RandomState(seed)
+    days = pd.bdate_range(start, end)
+    days = days[days.month >= 3]
+    # a decaying contact intensity, every day keeping some contacts
+    weights = np.exp(-np.arange(len(days)) / 200.) + 0.05
+    dates = days[np.sort(rng.choice(len(days), size=n_rows, p=weights / weights.sum()))]
+
+    month_names = np.array([calendar.month_abbr[nr].lower() for nr in range(13)], dtype=object)
+    wkday_names = np.array([calendar.day_abbr[wkday].lower() for wkday in range(7)], dtype=object)
+    data = OrderedDict([
+        ('age', rng.randint(18, 90, n_rows)),
+        ('job', np.array(BANK_JOBS, dtype=object)[_zipf_choice(rng, len(BANK_JOBS), n_rows, 0.8)]),
+        ('marital', rng.choice(np.array(['married', 'single', 'divorced', 'unknown'], dtype=object), n_rows,
+                               p=[0.6, 0.28, 0.11, 0.01])),
+        ('education', rng.choice(np.array(['university.degree', 'high.school', 'basic.9y', 'professional.course',
+                                           'basic.4y', 'basic.6y', 'unknown', 'illiterate'], dtype=object),
+                                 n_rows)),
+        ('default', rng.choice(np.array(['no', 'unknown', 'yes'], dtype=object), n_rows, p=[0.79, 0.2, 0.01])),
+        ('housing', rng.choice(np.array(['yes', 'no', 'unknown'], dtype=object), n_rows, p=[0.52, 0.45, 0.03])),
+        ('loan', rng.choice(np.array(['no', 'yes', 'unknown'], dtype=object), n_rows, p=[0.82, 0.15, 0.03])),
+        ('contact', rng.choice(np.array(['cellular', 'telephone'], dtype=object), n_rows, p=[0.63, 0.37])),
+        ('month', month_names[dates.month]),
+        ('day_of_week', wkday_names[dates.dayofweek]),
+        ('duration', rng.exponential(250., n_rows).astype(np.int64)),
+        ('campaign', 1 + rng.poisson(1.5, n_rows)),
+        ('pdays', np.where(rng.rand(n_rows) < 0.96, 999, rng.randint(0, 27, n_rows))),
+        ('previous', rng.poisson(0.17, n_rows)),
+        ('poutcome', rng.choice(np.array(['nonexistent', 'failure', 'success'], dtype=object), n_rows,
+                                p=[0.86, 0.1, 0.04])),
+        ('emp.var.rate', rng.choice([-3.4, -1.8, -1.1, -0.1, 1.1, 1.4], n_rows)),
+        ('cons.price.idx', 92.2 + 2.6 * rng.rand(n_rows)),
+        ('cons.conf.idx', -50.8 + 24. * rng.rand(n_rows)),
+        ('euribor3m', 0.6 + 4.4 * rng.rand(n_rows)),
+        ('nr.employed', rng.choice([4963.6, 5008.7, 5076.2, 5099.1, 5191., 5228.1], n_rows)),
+        ('y', (rng.rand(n_rows) < 0.11).astype(np.int64)),
+        ('month_nr', dates.month.values.astype(np.int64)),
+        # as strftime('%w'), with Sunday=0
+        ('wkday_nr', ((dates.dayofweek.values + 1) % 7).astype(np.int64)),
+        ('year', dates.year.values.astype(np.int64))])
+    return pd.DataFrame(data)
+
+
+BAKERY_FLAVORS = ['Apple', 'Almond', 'Apricot', 'Blackberry', 'Blueberry', 'Casino', 'Cheese', 'Cherry',
+                  'Chocolate', 'Coffee', 'Lemon', 'Marzipan', 'Napoleon', 'Opera', 'Raspberry', 'Strawberry',
+                  'Truffle', 'Vanilla', 'Walnut', 'Green']
+BAKERY_FOODS = ['Cake', 'Tart', 'Eclair', 'Pie', 'Croissant', 'Danish', 'Cookie', 'Meringue', 'Twist',
+                'Bear Claw', 'Coffee', 'Tea', 'Lemonade', 'Juice', 'Soda']
+
+
+def bakery_receipts(n_receipts, seed=0, n_stores=10, n_employees=30, max_items=8):
+    '''Synthetic bakery receipts (the pattern mining bakery_sf layout):
+
+    One row per item of a receipt ('Receipt', 'StoreNum', 'EmpId', 'Item'),
+    with Zipf-distributed item popularity and 1..max_items items per receipt.
+
+    Returns
+    -------
+    data_df: DataFrame
+    '''
+    rng = np.random.RandomState(seed)
+    items = np.array(['%s %s' % (flavor, food) for food in BAKERY_FOODS for flavor in BAKERY_FLAVORS],
+                     dtype=object)
+    items = items[rng.permutation(len(items))]
+    sizes = 1 + rng.binomial(max_items - 1, 0.35, n_receipts)
+    receipts = np.repeat(np.arange(1, n_receipts + 1), sizes)
+    return pd.DataFrame(OrderedDict([
+        ('Receipt', receipts),
+        ('StoreNum', np.repeat(rng.randint(1, n_stores + 1, n_receipts), sizes)),
+        ('EmpId', np.repeat(rng.randint(1, n_employees + 1, n_receipts), sizes)),
+        ('Item', items[_zipf_choice(rng, len(items), len(receipts), 1.)])]))
+
+
+REVIEW_ASPECTS = ['audio', 'price', 'sound', 'picture', 'screen', 'video', 'color', 'size', 'stand', 'speakers']
+REVIEW_ADJECTIVES = ['great', 'good', 'nice', 'excellent', 'bad', 'poor', 'cheap', 'bright', 'clear', 'sharp',
+                     'terrible', 'amazing', 'decent', 'loud', 'blurry', 'perfect', 'awful', 'big', 'small', 'fine']
+
+
+def tagged_reviews(n_sentences, seed=0, name='Product', aspects=REVIEW_ASPECTS):
+    '''Synthetic tagged review sentences (the output layout of the sentiment notebook's nlp_pipeline):
+
+    'name', 'sentence', 'tag' (an aspect), 'sentiment' in [0, 1] and
+    'adjectives' ({'ADJ': {adjective: count}}, or {} without adjectives).
+
+    Returns
+    -------
+    data_df: DataFrame
+    '''
+    rng = np.random.RandomState(seed)
+    tags = np.array(aspects, dtype=object)[rng.randint(0, len(aspects), n_sentences)]
+    adjectives, sentences = [], []
+    for tag in tags:
+        words = rng.choice(REVIEW_ADJECTIVES, size=min(rng.poisson(1.2), 4), replace=False) if rng.rand() < 0.9 else []
+        adjectives.append({'ADJ': dict((word, 1) for word in words)} if len(words) else {})
+        sentences.append('The %s of this item is %s.' % (tag, ' and '.join(words) if len(words) else 'ok'))
+    return pd.DataFrame(OrderedDict([('name', name), ('sentence', sentences), ('tag', tags),
+                                     ('sentiment', rng.beta(2., 1., n_sentences)),
+                                     ('adjectives', adjectives)]))
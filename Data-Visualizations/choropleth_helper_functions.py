@@ -0,0 +1,411 @@
+# helper classes for pre-aggregated choropleths over cached, simplified (binary) region geometries
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+class RegionAggregates(object):
+    '''Per-region aggregates of a (streamed) data set, accumulated chunk by chunk:
+
+    The region values of every chunk are factorized into codes of a global
+    vocabulary and all the aggregates are accumulated with `np.bincount`s
+    (sums, counts) or `np.minimum.at`/`np.maximum.at` (minima, maxima), so the
+    full loan book is never held in memory and is scanned once.
+
+    Usage
+    -----
+    aggs = RegionAggregates('addr_state', {'loanbook_amnt_per_state': ('loan_amnt', 'sum'),
+                                           'loanbook_vol_per_state': ('loan_amnt', 'count_nonzero')})
+    aggs.fit(pd.read_csv(loan_csv_path, usecols=['addr_state', 'loan_amnt'], chunksize=100000))
+    grouped_agg_df = aggs.result()
+
+    Parameters
+    ----------
+    region_column: string
+        The region attribute, e.g. 'addr_state'.
+    aggregations: dict
+        output name -> (attribute, function), the function being one of
+        'sum', 'count' (non missing values), 'count_nonzero', 'size', 'mean', 'min', 'max'.
+    '''
+    FUNCTIONS = ('sum', 'count', 'count_nonzero', 'size', 'mean', 'min', 'max')
+
+    def __init__(self, region_column, aggregations):
+        self.region_column = region_column
+        self.aggregations = OrderedDict(aggregations)
+        for name, (_, func) in self.aggregations.items():
+            if func not in self.FUNCTIONS:
+                raise ValueError('Unknown aggregation function %r of %r.' % (func, name))
+        self.regions = []
+        self._ids = {}
+        self._state = OrderedDict()
+        self.num_records = 0
+
+    @property
+    def columns(self):
+        '''The attributes read by the aggregates (e.g. the `usecols` of `pd.read_csv`).'''
+        columns = [self.region_column]
+        for column, _ in self.aggregations.values():
+            if column not in columns:
+                columns.append(column)
+        return columns
+
+    def _codes(self, column):
+        chunk_codes, uniques = pd.factorize(column.values)
+        mapping = np.empty(len(uniques), dtype=np.int64)
+        for i, value in enumerate(uniques):
+            if value not in self._ids:
+                self._ids[value] = len(self.regions)
+                self.regions.append(value)
+            mapping[i] = self._ids[value]
+        return np.where(chunk_codes >= 0, mapping[np.maximum(chunk_codes, 0)], -1)
+
+    def _accumulator(self, key, fill):
+        # (re)sized to the current vocabulary
+        n_regions = len(self.regions)
+        values = self._state.get(key)
+        if values is None:
+            values = np.full(n_regions, fill, dtype=np.float64)
+        elif len(values) < n_regions:
+            values = np.concatenate([values, np.full(n_regions - len(values), fill)])
+        self._state[key] = values
+        return values
+
+    def _keys(self):
+        # the accumulated (function, attribute) statistics (a mean is a sum over a count)
+        keys = []
+        for column, func in self.aggregations.values():
+            for key in ([('sum', column), ('count', column)] if func == 'mean' else
+                        [] if func == 'size' else [(func, column)]):
+                if key not in keys:
+                    keys.append(key)
+        return keys
+
+    def partial_fit(self, data_chunk):
+        '''Add the aggregates of a chunk of data (a DataFrame).'''
+        codes = self._codes(data_chunk[self.region_column])
+        n_regions = len(self.regions)
+        valid_region = codes >= 0
+        size = np.bincount(codes[valid_region], minlength=n_regions)
+        self._accumulator(('size', None), 0.)[:] += size
+
+        for func, column in self._keys():
+            values = np.asarray(data_chunk[column].values, dtype=np.float64)
+            valid = valid_region & ~np.isnan(values)
+            chunk_codes, values = codes[valid], values[valid]
+            if func == 'sum':
+                self._accumulator((func, column), 0.)[:] += np.bincount(chunk_codes, weights=values,
+                                                                        minlength=n_regions)
+            elif func == 'count':
+                self._accumulator((func, column), 0.)[:] += np.bincount(chunk_codes, minlength=n_regions)
+            elif func == 'count_nonzero':
+                self._accumulator((func, column), 0.)[:] += np.bincount(chunk_codes[values != 0],
+                                                                        minlength=n_regions)
+            elif func == 'min':
+                np.minimum.at(self._accumulator((func, column), np.inf), chunk_codes, values)
+            elif func == 'max':
+                np.maximum.at(self._accumulator((func, column), -np.inf), chunk_codes, values)
+        self.num_records += len(data_chunk)
+        return self
+
+    def fit(self, data, chunksize=None):
+        '''Aggregate a DataFrame (in chunks of `chunksize` rows), or an iterable of DataFrame chunks.'''
+        if isinstance(data, pd.DataFrame):
+            chunksize = chunksize or max(len(data), 1)
+            data = [data.iloc[start:start + chunksize] for start in range(0, len(data), chunksize)]
+        for data_chunk in data:
+            self.partial_fit(data_chunk)
+        return self
+
+    def result(self):
+        '''The aggregates: one row per region (the region attribute as a column, sorted).'''
+        n_regions = len(self.regions)
+        result = OrderedDict([(self.region_column, self.regions)])
+        for name, (column, func) in self.aggregations.items():
+            if func == 'size':
+                values = self._accumulator(('size', None), 0.)
+            elif func == 'mean':
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    values = self._accumulator(('sum', column), 0.) / self._accumulator(('count', column), 0.)
+            elif func in ('min', 'max'):
+                values = self._accumulator((func, column), np.inf if func == 'min' else -np.inf)
+                values = np.where(np.isinf(values), np.nan, values)
+            else:
+                values = self._accumulator((func, column), 0.)
+            if func in ('size', 'count', 'count_nonzero'):
+                values = values.astype(np.int64)
+            result[name] = values[:n_regions]
+        return pd.DataFrame(result).sort_values(self.region_column).reset_index(drop=True)
+
+
+def region_aggregates(data, region_column, aggregations, chunksize=100000, **read_csv_kwargs):
+    '''Per-region aggregates of a DataFrame, or of a CSV file streamed in chunks:
+
+    Parameters
+    ----------
+    data: DataFrame or string
+        e.g. loan_df, or the path of the loan CSV file (only the needed attributes are read).
+    region_column: string
+        e.g. 'addr_state'
+    aggregations: dict
+        output name -> (attribute, function), e.g.
+        {'loanbook_amnt_per_state': ('loan_amnt', 'sum'),
+         'loanbook_vol_per_state': ('loan_amnt', 'count_nonzero')}
+    chunksize: int
+        The number of rows per chunk.
+
+    Returns
+    -------
+    aggregates: DataFrame
+        As the notebook's grouped_agg_df.
+    '''
+    aggs = RegionAggregates(region_column, aggregations)
+    if not isinstance(data, pd.DataFrame):
+        data = pd.read_csv(data, usecols=aggs.columns, chunksize=chunksize, **read_csv_kwargs)
+    return aggs.fit(data, chunksize=chunksize).result()
+
+
+def simplify_ring(points, tolerance):
+    '''Douglas-Peucker simplification of a (closed) ring:
+
+    Parameters
+    ----------
+    points: numpy array
+        The (n, 2) coordinates of the ring.
+    tolerance: float
+        The maximum distance (in the coordinates unit, e.g. pixels of the albersUSA
+        projection) of the removed points to the simplified ring.
+
+    Returns
+    -------
+    points: numpy array
+        The kept coordinates (the ring itself when it would degenerate).
+    '''
+    n = len(points)
+    if tolerance <= 0 or n <= 4:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last <= first + 1:
+            continue
+        segment = points[last] - points[first]
+        relative = points[first + 1:last] - points[first]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            # closed ring: distances to its first point
+            distances = np.hypot(relative[:, 0], relative[:, 1])
+        else:
+            distances = np.abs(segment[0] * relative[:, 1] - segment[1] * relative[:, 0]) / length
+        farthest = np.argmax(distances)
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    simplified = points[keep]
+    return simplified if len(simplified) >= 4 else points
+
+
+def _feature_rings(geometry):
+    # the exterior rings of a (multi)polygon (the patches glyph has no holes)
+    if geometry is None:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates'][0]]
+    if geometry['type'] == 'MultiPolygon':
+        return [polygon[0] for polygon in geometry['coordinates']]
+    raise ValueError('Unsupported geometry type %r.' % geometry['type'])
+
+
+class RegionGeometry(object):
+    '''Simplified region polygons, stored as flat binary coordinate buffers:
+
+    The polygons of all the features (regions) are laid out in two float32
+    buffers xs and ys, the rings of a feature being separated by NaNs (as the
+    Bokeh `patches` glyph expects them), and feature i spanning
+    offsets[i]:offsets[i+1]. The geometry is parsed and simplified once, then
+    cached as a .npz file (keyed by the GeoJSON file version, the key property
+    and the tolerance): loading it back is a few array reads, no GeoJSON parsing.
+
+    The per-feature arrays are views of the buffers, so a plot source holds the
+    coordinates once, and Bokeh sends numpy arrays to the browser as binary
+    buffers instead of (much larger) JSON number lists.
+
+    Usage
+    -----
+    geometry = load_geometry(us_states_GeoJSON, key_property='state', tolerance=0.5,
+                             cache_dir='./geometry_cache')
+    data = geometry.data(grouped_agg_df, key_column='addr_state')
+
+    Parameters
+    ----------
+    keys: array-like
+        The region key of every feature.
+    xs, ys: numpy arrays
+        The coordinate buffers.
+    offsets: numpy array
+        The (num features + 1) feature offsets into the buffers.
+    properties: DataFrame, optional
+        The other (scalar) properties of the features.
+    '''
+    def __init__(self, keys, xs, ys, offsets, properties=None):
+        self.keys = pd.Index(keys)
+        self.xs = np.asarray(xs, dtype=np.float32)
+        self.ys = np.asarray(ys, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.properties = pd.DataFrame(index=range(len(self.keys))) if properties is None else properties
+
+    @classmethod
+    def from_geojson(cls, path, key_property, tolerance=0.):
+        '''Parse and simplify the features of a GeoJSON file.'''
+        with open(path, 'r') as f:
+            features = json.load(f)['features']
+        keys, properties, xs, ys, offsets = [], [], [], [], [0]
+        for feature in features:
+            feature_properties = feature.get('properties') or {}
+            keys.append(feature_properties.get(key_property))
+            properties.append(dict((name, value) for name, value in feature_properties.items()
+                                   if not isinstance(value, (list, dict))))
+            size = 0
+            for i, ring in enumerate(_feature_rings(feature.get('geometry'))):
+                points = simplify_ring(np.asarray(ring, dtype=np.float64)[:, :2], tolerance)
+                if i > 0:
+                    xs.append([np.nan])
+                    ys.append([np.nan])
+                    size += 1
+                xs.append(points[:, 0])
+                ys.append(points[:, 1])
+                size += len(points)
+            offsets.append(offsets[-1] + size)
+        concat = lambda parts: np.concatenate(parts) if parts else np.zeros(0)
+        return cls(keys, concat(xs), concat(ys), offsets,
+                   pd.DataFrame(properties, index=range(len(keys))))
+
+    def save(self, path):
+        '''Store the geometry as a .npz file (written atomically).'''
+        tmp_path = path + '.tmp.npz'
+        properties = OrderedDict((name, self.properties[name].tolist()) for name in self.properties.columns)
+        np.savez(tmp_path, xs=self.xs, ys=self.ys, offsets=self.offsets,
+                 keys=np.array(json.dumps(self.keys.tolist(), default=str)),
+                 properties=np.array(json.dumps(properties, default=str)))
+        os.rename(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as stored:
+            return cls(json.loads(str(stored['keys'])), stored['xs'], stored['ys'], stored['offsets'],
+                       pd.DataFrame(json.loads(str(stored['properties']), object_pairs_hook=OrderedDict)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def num_points(self):
+        return len(self.xs)
+
+    def patches(self):
+        '''The per-feature coordinates (views of the buffers), as lists of xs and ys arrays.'''
+        bounds = list(zip(self.offsets[:-1], self.offsets[1:]))
+        return [self.xs[start:stop] for start, stop in bounds], [self.ys[start:stop] for start, stop in bounds]
+
+    def metrics(self, aggregates_df, key_column, columns=None):
+        '''The aggregates of every feature (in the features order; NaN for the regions without data):
+
+        Parameters
+        ----------
+        aggregates_df: DataFrame
+            e.g. grouped_agg_df
+        key_column: string
+            The region key attribute of the aggregates, e.g. 'addr_state'.
+        columns: list of strings, optional
+            The metric attributes (default: all but the key).
+
+        Returns
+        -------
+        metrics: OrderedDict
+            attribute -> numpy array
+        '''
+        if columns is None:
+            columns = [column for column in aggregates_df.columns if column != key_column]
+        positions = pd.Index(aggregates_df[key_column]).get_indexer(self.keys)
+        found = positions >= 0
+        metrics = OrderedDict()
+        for column in columns:
+            values = aggregates_df[column].values
+            joined = np.full(len(self.keys), np.nan, dtype=np.float64 if values.dtype.kind in 'biuf' else object)
+            joined[found] = values[positions[found]]
+            metrics[column] = joined
+        return metrics
+
+    def data(self, aggregates_df=None, key_column=None, columns=None):
+        '''The columns of a `ColumnDataSource` of the `patches` glyph:
+
+        'xs', 'ys', the feature properties and the joined aggregates (see `metrics`).
+        '''
+        xs, ys = self.patches()
+        data = OrderedDict([('xs', xs), ('ys', ys)])
+        for name in self.properties.columns:
+            data[name] = self.properties[name].values
+        if aggregates_df is not None:
+            data.update(self.metrics(aggregates_df, key_column, columns))
+        return data
+
+
+def _geometry_key(path, key_property, tolerance):
+    # identifies the GeoJSON file version and the simplification options of a cache
+    stat = os.stat(path)
+    spec = [os.path.abspath(path), stat.st_size, stat.st_mtime, key_property, float(tolerance)]
+    return hashlib.md5(json.dumps(spec).encode('utf-8')).hexdigest()
+
+
+def load_geometry(geojson_path, key_property, tolerance=0., cache_dir=None, refresh=False):
+    '''The simplified geometry of a GeoJSON file, parsed once and then loaded from its binary cache:
+
+    Parameters
+    ----------
+    geojson_path: string
+        e.g. us_states_GeoJSON, us_counties_GeoJSON
+    key_property: string
+        The feature property joining the aggregates, e.g. 'state'.
+    tolerance: float
+        The simplification tolerance (0 keeps every point).
+    cache_dir: string, optional
+        The directory of the cached geometries (None disables the caching).
+    refresh: boolean
+        Rebuild the cached geometry.
+
+    Returns
+    -------
+    geometry: RegionGeometry
+    '''
+    if cache_dir is None:
+        return RegionGeometry.from_geojson(geojson_path, key_property, tolerance)
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    path = os.path.join(cache_dir, _geometry_key(geojson_path, key_property, tolerance) + '.npz')
+    if not refresh and os.path.exists(path):
+        return RegionGeometry.load(path)
+    geometry = RegionGeometry.from_geojson(geojson_path, key_property, tolerance)
+    geometry.save(path)
+    return geometry
+
+
+def choropleth_source(geometry, aggregates_df=None, key_column=None, columns=None):
+    '''A Bokeh `ColumnDataSource` of the geometry joined with the aggregates:
+
+    To be plotted as in the notebooks, with `p.patches('xs', 'ys', source=source, ...)`.
+    '''
+    from bokeh.models import ColumnDataSource
+    return ColumnDataSource(data=geometry.data(aggregates_df, key_column, columns))
+
+
+def update_metrics(source, geometry, aggregates_df, key_column, columns=None):
+    '''Replace (or add) the metric columns of a choropleth source, leaving its geometry untouched.'''
+    source.data.update(geometry.metrics(aggregates_df, key_column, columns))
+    return source
@@ -0,0 +1,170 @@
+# helper classes for index-accelerated Local Outlier Factor (LOF) anomaly scoring
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+class CustomerFeatureEncoder(object):
+    '''Dense encoding of mixed categorical/numerical customer features:
+
+    The categorical features are one-hot encoded (as the GraphLab `OneHotEncoder`
+    does, two customers with different categories are sqrt(2) apart) and the
+    numerical ones are standardized. The categories and the means/standard
+    deviations learned by `fit` are reused by `transform`, so that new customers
+    are encoded consistently with the reference set.
+
+    Parameters
+    ----------
+    categorical_features: list of strings
+        e.g. ['gender', 'language']
+    numerical_features: list of strings
+        e.g. ['age']
+    '''
+    def __init__(self, categorical_features, numerical_features):
+        self.categorical_features = list(categorical_features)
+        self.numerical_features = list(numerical_features)
+        self.categories = {}
+        self.means = {}
+        self.stds = {}
+
+    def fit(self, data_df):
+        for feature in self.categorical_features:
+            self.categories[feature] = pd.Index(pd.unique(data_df[feature].astype(str)))
+        for feature in self.numerical_features:
+            values = data_df[feature].astype(float)
+            self.means[feature] = values.mean()
+            self.stds[feature] = values.std() if values.std() > 0 else 1.
+        return self
+
+    def transform(self, data_df):
+        n_columns = (sum(len(self.categories[f]) for f in self.categorical_features) +
+                     len(self.numerical_features))
+        encoded = np.zeros((len(data_df), n_columns), dtype=np.float64)
+        rows = np.arange(len(data_df))
+        offset = 0
+        for feature in self.categorical_features:
+            # unseen categories (code -1) are encoded as all zeros
+            codes = self.categories[feature].get_indexer(data_df[feature].astype(str))
+            known = codes >= 0
+            encoded[rows[known], offset + codes[known]] = 1.
+            offset += len(self.categories[feature])
+        for feature in self.numerical_features:
+            encoded[:, offset] = ((data_df[feature].astype(float).values - self.means[feature]) /
+                                  self.stds[feature])
+            offset += 1
+        return encoded
+
+    def fit_transform(self, data_df):
+        return self.fit(data_df).transform(data_df)
+
+
+class LocalOutlierFactor(object):
+    '''Local Outlier Factor model backed by a KD-tree spatial index:
+
+    Mostly categorical customer data contain many identical feature vectors,
+    so the reference set is collapsed to its unique rows (with multiplicities)
+    once, and the KD-tree is built on those. k-distances, local reachability
+    densities and LOF scores are then computed with vectorized batch neighbor
+    queries. New customers are scored against the stored reference set
+    without rebuilding the model.
+
+    Parameters
+    ----------
+    num_neighbors: int
+        The number of neighbors k of the LOF model.
+    leafsize: int, optional
+        The KD-tree leaf size.
+    '''
+    # guards against infinite densities of duplicated points (as scikit-learn does)
+    _eps = 1e-10
+
+    def __init__(self, num_neighbors=10, leafsize=16):
+        self.num_neighbors = int(num_neighbors)
+        self.leafsize = leafsize
+
+    def _neighbor_stats(self, distances, indices, weights):
+        # the k-distance is the distance at which the multiplicities add up to k;
+        # all the (unique) points within it are neighbors, weighted by multiplicity
+        k = self.num_neighbors
+        cumulative = np.cumsum(weights, axis=1)
+        kpos = np.argmax(cumulative >= k, axis=1)
+        k_distance = distances[np.arange(len(distances)), kpos]
+        mask = (distances <= k_distance[:, None]) & (weights > 0)
+        neighbor_weights = np.where(mask, weights, 0.)
+        return k_distance, neighbor_weights
+
+    def _lrd(self, distances, indices, neighbor_weights):
+        reach_distances = np.maximum(self.k_distance_[indices], distances)
+        mean_reach = ((neighbor_weights * reach_distances).sum(axis=1) /
+                      neighbor_weights.sum(axis=1))
+        return 1. / (mean_reach + self._eps)
+
+    def fit(self, features):
+        '''Build the spatial index and score the reference set:
+
+        Parameters
+        ----------
+        features: numpy array, (n_samples, n_features)
+            e.g. the output of `CustomerFeatureEncoder.fit_transform`.
+
+        Returns
+        -------
+        self
+        '''
+        features = np.asarray(features, dtype=float)
+        unique_rows, inverse, counts = np.unique(features, axis=0, return_inverse=True,
+                                                 return_counts=True)
+        if counts.sum() <= self.num_neighbors:
+            raise ValueError('The number of samples should be larger than num_neighbors.')
+        self.points_ = unique_rows
+        self.counts_ = counts.astype(float)
+        self.inverse_ = np.asarray(inverse).ravel()
+        self.tree_ = cKDTree(unique_rows, leafsize=self.leafsize)
+
+        # k+1 nearest unique points always hold at least k other samples
+        n_query = min(self.num_neighbors + 1, len(unique_rows))
+        distances, indices = self.tree_.query(unique_rows, k=n_query)
+        distances = distances.reshape(len(unique_rows), n_query)
+        indices = indices.reshape(len(unique_rows), n_query)
+        weights = self.counts_[indices]
+        # a point is not its own neighbor, its duplicates are
+        weights[indices == np.arange(len(unique_rows))[:, None]] -= 1.
+
+        self.k_distance_, neighbor_weights = self._neighbor_stats(distances, indices, weights)
+        self.lrd_ = self._lrd(distances, indices, neighbor_weights)
+        unique_scores = ((neighbor_weights * self.lrd_[indices]).sum(axis=1) /
+                         neighbor_weights.sum(axis=1)) / self.lrd_
+        self.scores_ = unique_scores[self.inverse_]
+        return self
+
+    def score(self, features):
+        '''Score new samples against the stored reference set (no refitting):
+
+        Returns
+        -------
+        anomaly_scores: numpy array, (n_samples,)
+            The LOF scores; values well above 1 indicate outliers.
+        '''
+        features = np.atleast_2d(np.asarray(features, dtype=float))
+        n_query = min(self.num_neighbors, len(self.points_))
+        distances, indices = self.tree_.query(features, k=n_query)
+        distances = distances.reshape(len(features), n_query)
+        indices = indices.reshape(len(features), n_query)
+        weights = self.counts_[indices]
+
+        _, neighbor_weights = self._neighbor_stats(distances, indices, weights)
+        lrd = self._lrd(distances, indices, neighbor_weights)
+        return ((neighbor_weights * self.lrd_[indices]).sum(axis=1) /
+                neighbor_weights.sum(axis=1)) / lrd
+
+    def anomalies(self, quantile=0.9, scores=None):
+        '''Row positions (and the threshold) of the samples scoring above a quantile:
+
+        Returns
+        -------
+        (row_ids, threshold): tuple
+            row_ids index the rows of the reference set (or of `scores`).
+        '''
+        scores = self.scores_ if scores is None else np.asarray(scores)
+        threshold = np.quantile(scores, quantile)
+        return np.flatnonzero(scores >= threshold), threshold
@@ -0,0 +1,452 @@
+# helper classes for online (streaming) anomaly detection on a live feed
+import json
+from math import lgamma, log, pi
+import numpy as np
+
+
+class P2Quantile(object):
+    '''Streaming quantile sketch (P-square algorithm, Jain & Chlamtac, 1985):
+
+    Keeps five markers whose heights track the minimum, the p/2, p, (1+p)/2
+    quantiles and the maximum of all the values seen so far, with O(1) memory
+    and O(1) work per value. It replaces a `sketch_summary().quantile(p)`
+    computed over the full history of scores.
+
+    Parameters
+    ----------
+    p: float in (0,1) range
+        The quantile of interest, e.g. 0.99
+    '''
+    def __init__(self, p=0.99):
+        if not 0 < p < 1:
+            raise ValueError('The quantile p should lie in the (0,1) range.')
+        self.p = float(p)
+        self.count = 0
+        self.heights = []
+        self.positions = [1., 2., 3., 4., 5.]
+        self.desired = [1., 1. + 2 * p, 1. + 4 * p, 3. + 2 * p, 5.]
+        self.increments = [0., p / 2., p, (1. + p) / 2., 1.]
+
+    def update(self, x):
+        '''Add a value to the sketch.'''
+        x = float(x)
+        self.count += 1
+        if self.count <= 5:
+            self.heights.append(x)
+            self.heights.sort()
+            return
+
+        q, n = self.heights, self.positions
+        # find the cell k of x and update the extreme markers
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # adjust the heights of the middle markers (parabolic, else linear)
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1. if d > 0 else -1.
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < qp < q[i + 1]:
+                    j = i + int(d)
+                    qp = q[i] + d * (q[j] - q[i]) / (n[j] - n[i])
+                q[i] = qp
+                n[i] += d
+
+    def quantile(self):
+        '''Current estimate of the p-quantile (None before any value).'''
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            idx = int(round(self.p * (self.count - 1)))
+            return self.heights[idx]
+        return self.heights[2]
+
+    def to_dict(self):
+        return {'p': self.p, 'count': self.count, 'heights': list(self.heights),
+                'positions': list(self.positions), 'desired': list(self.desired)}
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(state['p'])
+        sketch.count = state['count']
+        sketch.heights = list(state['heights'])
+        sketch.positions = list(state['positions'])
+        sketch.desired = list(state['desired'])
+        return sketch
+
+
+class StreamingMovingZScore(object):
+    '''Online moving Z-score anomaly detector:
+
+    The streaming counterpart of `gl.anomaly_detection.moving_zscore.create`.
+    Every new observation x_t is scored against the mean and (sample) standard
+    deviation of the previous `window_size` observations,
+
+        anomaly_score_t = |x_t - moving_average_t| / moving_std_t,
+
+    which are kept in a ring buffer and updated in O(1) per observation. The
+    anomaly threshold is the running `threshold_quantile` of all the scores,
+    tracked by a streaming quantile sketch, so scoring a new point (or a
+    micro-batch of points) costs constant time and memory.
+
+    Parameters
+    ----------
+    window_size: int
+        The number of previous observations the moving statistics are computed on,
+        e.g. 252 (average trading days per year).
+    threshold_quantile: float in (0,1) range, optional
+        Quantile of the anomaly scores above which a point is flagged as anomaly.
+    min_observations: int, optional
+        Minimum number of observations in the window before scores are emitted
+        (default: window_size).
+    '''
+    def __init__(self, window_size, threshold_quantile=0.99, min_observations=None):
+        if window_size < 2:
+            raise ValueError('The window_size should be larger than one.')
+        self.window_size = int(window_size)
+        self.min_observations = self.window_size if min_observations is None else int(min_observations)
+        self.min_observations = max(2, min(self.min_observations, self.window_size))
+        self.sketch = P2Quantile(threshold_quantile)
+
+        self.buffer = np.zeros(self.window_size)
+        self.position = 0
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+        self.n_observed = 0
+
+    def _recompute(self):
+        # exact statistics of the window (amortized O(1), removes numerical drift)
+        window = self.window()
+        self.mean = window.mean() if len(window) else 0.
+        self.m2 = ((window - self.mean) ** 2).sum() if len(window) else 0.
+
+    def _push(self, x):
+        if self.count < self.window_size:
+            # growing window: Welford's update
+            self.buffer[self.position] = x
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            # sliding window: replace the oldest observation
+            old = self.buffer[self.position]
+            self.buffer[self.position] = x
+            old_mean = self.mean
+            self.mean += (x - old) / self.window_size
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        self.position = (self.position + 1) % self.window_size
+        self.n_observed += 1
+        if self.position == 0:
+            self._recompute()
+
+    def window(self):
+        '''The observations currently in the window, oldest first.'''
+        if self.count < self.window_size:
+            return self.buffer[:self.count].copy()
+        return np.roll(self.buffer, -self.position)
+
+    def moving_average(self):
+        return self.mean if self.count else None
+
+    def moving_std(self):
+        if self.count < 2:
+            return None
+        return np.sqrt(max(self.m2, 0.) / (self.count - 1))
+
+    def threshold(self):
+        return self.sketch.quantile()
+
+    def score(self, x):
+        '''Score one new observation and add it to the window:
+
+        Returns
+        -------
+        (anomaly_score, moving_average, is_anomaly): tuple
+            anomaly_score and is_anomaly are None until min_observations
+            observations have been seen.
+        '''
+        x = float(x)
+        anomaly_score, moving_average, is_anomaly = None, self.moving_average(), None
+        if self.count >= self.min_observations:
+            std = self.moving_std()
+            anomaly_score = float(abs(x - self.mean) / std) if std > 0 else 0.
+            self.sketch.update(anomaly_score)
+            is_anomaly = bool(anomaly_score > self.sketch.quantile())
+        self._push(x)
+
+        return anomaly_score, moving_average, is_anomaly
+
+    def score_batch(self, values):
+        '''Score a micro-batch of new observations in one vectorized pass:
+
+        The moving averages/standard deviations of all the points of the batch
+        are computed with cumulative sums over the concatenation of the current
+        window and the batch.
+
+        Returns
+        -------
+        (anomaly_scores, moving_averages, is_anomaly): tuple of numpy arrays
+            NaN (False for is_anomaly) where no score could be emitted yet.
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        n_values = len(values)
+        window = self.window()
+        extended = np.concatenate([window, values])
+        # shift by the current mean for a numerically stable sum of squares
+        shift = self.mean
+        csum = np.concatenate([[0.], np.cumsum(extended - shift)])
+        csum2 = np.concatenate([[0.], np.cumsum((extended - shift) ** 2)])
+
+        ends = len(window) + np.arange(n_values)
+        starts = np.maximum(0, ends - self.window_size)
+        counts = (ends - starts).astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sums = csum[ends] - csum[starts]
+            moving_averages = sums / counts + shift
+            variances = (csum2[ends] - csum2[starts] - sums ** 2 / counts) / (counts - 1)
+            stds = np.sqrt(np.maximum(variances, 0.))
+            anomaly_scores = np.where(stds > 0, np.abs(values - moving_averages) / stds, 0.)
+        valid = counts >= self.min_observations
+        anomaly_scores[~valid] = np.nan
+        moving_averages[counts == 0] = np.nan
+
+        is_anomaly = np.zeros(n_values, dtype=bool)
+        for i in np.flatnonzero(valid):
+            self.sketch.update(anomaly_scores[i])
+            is_anomaly[i] = anomaly_scores[i] > self.sketch.quantile()
+
+        # update the ring buffer with the last window_size observations
+        tail = extended[-self.window_size:]
+        self.count = len(tail)
+        self.buffer[:] = 0.
+        self.buffer[:self.count] = tail
+        self.position = self.count % self.window_size
+        self.n_observed += n_values
+        self._recompute()
+
+        return anomaly_scores, moving_averages, is_anomaly
+
+    def to_dict(self):
+        return {'window_size': self.window_size, 'min_observations': self.min_observations,
+                'window': self.window().tolist(), 'n_observed': self.n_observed,
+                'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, state):
+        model = cls(state['window_size'], threshold_quantile=state['sketch']['p'],
+                    min_observations=state['min_observations'])
+        window = np.asarray(state['window'], dtype=float)
+        model.count = len(window)
+        model.buffer[:model.count] = window
+        model.position = model.count % model.window_size
+        model.n_observed = state['n_observed']
+        model.sketch = P2Quantile.from_dict(state['sketch'])
+        model._recompute()
+        return model
+
+    def save(self, path):
+        '''Serialize the model state (window, sketch) into a JSON file.'''
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class OnlineBayesianChangepoints(object):
+    '''Online Bayesian changepoint detector (Adams & MacKay, 2007):
+
+    The incremental counterpart of `gl.anomaly_detection.bayesian_changepoints.create`.
+    The posterior over the current run length (number of observations since
+    the last changepoint) is updated per observation in vectorized NumPy, with
+    a Normal-Gamma conjugate model of every run (Student-t predictive) and a
+    constant hazard rate 1/expected_runlength.
+
+    Run lengths beyond `max_runlength`, and tail run lengths whose posterior
+    probability drops below `prune_threshold`, are truncated, so the per-step
+    cost and memory stay bounded. The changepoint score of observation t is
+    the posterior probability that a run started at t, given the observations
+    up to t + lag; it is therefore emitted `lag` observations later.
+
+    Parameters
+    ----------
+    expected_runlength: float
+        Expected number of observations between changepoints, e.g. 252
+        (average trading days per year).
+    lag: int
+        Number of observations to wait for before scoring a point, e.g. 63
+        (average trading days per fiscal quarter).
+    max_runlength: int, optional
+        Maximum number of run lengths kept in the posterior (default: 4 x expected_runlength).
+    prune_threshold: float, optional
+        Tail run lengths with a lower posterior probability are dropped.
+    prior_mean, prior_var: float, optional
+        Prior mean and variance of the observations; if not given, they are
+        estimated from the first (up to expected_runlength) observations passed to `fit`.
+    prior_kappa, prior_alpha: float, optional
+        Prior pseudo-counts of the Normal-Gamma model.
+    '''
+    def __init__(self, expected_runlength=252, lag=63, max_runlength=None, prune_threshold=1e-10,
+                 prior_mean=None, prior_var=None, prior_kappa=1., prior_alpha=1.):
+        self.hazard = 1. / expected_runlength
+        self.expected_runlength = expected_runlength
+        self.lag = int(lag)
+        self.max_runlength = int(4 * expected_runlength) if max_runlength is None else int(max_runlength)
+        if self.max_runlength <= self.lag + 1:
+            raise ValueError('The max_runlength should be larger than lag + 1.')
+        self.prune_threshold = prune_threshold
+        self.prior_mean = prior_mean
+        self.prior_var = prior_var
+        self.prior_kappa = float(prior_kappa)
+        self.prior_alpha = float(prior_alpha)
+
+        # lgamma terms of the Student-t predictive depend on the run length only
+        alphas = self.prior_alpha + 0.5 * np.arange(self.max_runlength + 1)
+        self._lgamma_ratio = np.array([lgamma(a + 0.5) - lgamma(a) for a in alphas])
+        self.n_observed = 0
+        self._initialized = False
+
+    def _initialize(self):
+        self.prior_beta = self.prior_alpha * self.prior_var
+        # log run-length posterior and sufficient statistics per run length
+        self.log_probs = np.array([0.])
+        self.mu = np.array([float(self.prior_mean)])
+        self.kappa = np.array([self.prior_kappa])
+        self.alpha = np.array([self.prior_alpha])
+        self.beta = np.array([self.prior_beta])
+        self._initialized = True
+
+    def update(self, x):
+        '''Add one observation and update the run-length posterior:
+
+        Returns
+        -------
+        (index, changepoint_score): tuple
+            index of the observation scored at this step (n_observed - 1 - lag)
+            and its changepoint score, or (None, None) during the first lag steps.
+        '''
+        x = float(x)
+        if not self._initialized:
+            if self.prior_mean is None:
+                self.prior_mean = x
+            if self.prior_var is None:
+                self.prior_var = 1.
+            self._initialize()
+
+        # Student-t predictive log-likelihood of x for every run length
+        n_runs = len(self.log_probs)
+        scale2 = self.beta * (self.kappa + 1.) / (self.alpha * self.kappa)
+        nu = 2. * self.alpha
+        log_pred = (self._lgamma_ratio[:n_runs] - 0.5 * np.log(nu * pi * scale2) -
+                    0.5 * (nu + 1.) * np.log1p((x - self.mu) ** 2 / (nu * scale2)))
+
+        # growth (run continues) and changepoint (run resets) probabilities
+        log_joint = self.log_probs + log_pred
+        log_growth = log_joint + log(1. - self.hazard)
+        log_cp = np.logaddexp.reduce(log_joint) + log(self.hazard)
+        log_probs = np.concatenate([[log_cp], log_growth])
+        log_probs -= np.logaddexp.reduce(log_probs)
+
+        # conjugate updates of the sufficient statistics
+        kappa = self.kappa + 1.
+        mu = (self.kappa * self.mu + x) / kappa
+        alpha = self.alpha + 0.5
+        beta = self.beta + self.kappa * (x - self.mu) ** 2 / (2. * kappa)
+        self.mu = np.concatenate([[self.prior_mean], mu])
+        self.kappa = np.concatenate([[self.prior_kappa], kappa])
+        self.alpha = np.concatenate([[self.prior_alpha], alpha])
+        self.beta = np.concatenate([[self.prior_beta], beta])
+        self.log_probs = log_probs
+
+        # truncate/prune the tail of the run-length posterior (keeping the run length lag + 1 scored below)
+        keep = min(len(self.log_probs), self.max_runlength)
+        above = np.flatnonzero(self.log_probs[self.lag + 1:keep] >= log(self.prune_threshold))
+        keep = min(keep, self.lag + 2 + (above[-1] if len(above) else 0))
+        if keep < len(self.log_probs):
+            self.log_probs = self.log_probs[:keep] - np.logaddexp.reduce(self.log_probs[:keep])
+            self.mu, self.kappa = self.mu[:keep], self.kappa[:keep]
+            self.alpha, self.beta = self.alpha[:keep], self.beta[:keep]
+
+        self.n_observed += 1
+        if self.n_observed <= self.lag:
+            return None, None
+        # a run of lag + 1 observations started at the scored observation
+        return self.n_observed - 1 - self.lag, float(np.exp(self.log_probs[self.lag + 1]))
+
+    def append(self, values):
+        '''Add new observations to a (fitted or loaded) model:
+
+        Returns
+        -------
+        changepoint_scores: numpy array
+            Scores of the points that became scorable, i.e. of the observations
+            with indices [n_observed_before - lag, n_observed_after - lag).
+        '''
+        scores = []
+        for x in np.asarray(values, dtype=float).ravel():
+            index, score = self.update(x)
+            if index is not None:
+                scores.append(score)
+        return np.array(scores)
+
+    def fit(self, values):
+        '''Start the model on a series (estimating the priors if not given):
+
+        Returns
+        -------
+        changepoint_scores: numpy array, len(values)
+            NaN for the last lag points (not scorable yet).
+        '''
+        values = np.asarray(values, dtype=float).ravel()
+        warmup = values[:max(2, int(self.expected_runlength))]
+        if self.prior_mean is None:
+            self.prior_mean = float(warmup.mean())
+        if self.prior_var is None:
+            self.prior_var = float(warmup.var()) if warmup.var() > 0 else 1.
+        self._initialize()
+        self.n_observed = 0
+
+        scores = np.full(len(values), np.nan)
+        scored = self.append(values)
+        scores[:len(scored)] = scored
+        return scores
+
+    def save(self, path):
+        '''Save the model state (posterior and statistics) into a `.npz` file.'''
+        np.savez(path, log_probs=self.log_probs, mu=self.mu, kappa=self.kappa,
+                 alpha=self.alpha, beta=self.beta,
+                 params=np.array([self.expected_runlength, self.lag, self.max_runlength,
+                                  self.prune_threshold, self.prior_mean, self.prior_var,
+                                  self.prior_kappa, self.prior_alpha, self.n_observed]))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        params = data['params']
+        model = cls(expected_runlength=params[0], lag=int(params[1]), max_runlength=int(params[2]),
+                    prune_threshold=params[3], prior_mean=params[4], prior_var=params[5],
+                    prior_kappa=params[6], prior_alpha=params[7])
+        model._initialize()
+        model.n_observed = int(params[8])
+        for name in ['log_probs', 'mu', 'kappa', 'alpha', 'beta']:
+            setattr(model, name, data[name])
+        return model
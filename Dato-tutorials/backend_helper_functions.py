@@ -0,0 +1,497 @@
+# helper classes of interchangeable table backends (GraphLab SFrame, pandas DataFrame, Arrow Table)
+# (shared by the Dato tutorials: their helpers add the Dato-tutorials folder to sys.path)
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+
+# aggregation specifications (as graphlab.aggregate): (operation, column)
+def COUNT(*args):
+    return ('count', None)
+
+
+def SUM(column):
+    return ('sum', column)
+
+
+def AVG(column):
+    return ('mean', column)
+
+
+MEAN = AVG
+
+
+def MAX(column):
+    return ('max', column)
+
+
+def MIN(column):
+    return ('min', column)
+
+
+def CONCAT(column):
+    return ('concat', column)
+
+
+def SELECT_ONE(column):
+    return ('select_one', column)
+
+
+def COUNT_DISTINCT(column):
+    return ('count_distinct', column)
+
+
+# the GraphLab output column names of unnamed aggregations
+_DEFAULT_NAMES = {'count': 'Count', 'sum': 'Sum of %s', 'mean': 'Avg of %s', 'max': 'Max of %s',
+                  'min': 'Min of %s', 'concat': 'List of %s', 'select_one': 'Select One of %s',
+                  'count_distinct': 'Count Distinct of %s'}
+
+
+def _operations(operations):
+    # name -> (operation, column) of a dict, a list or a single aggregation (called or not)
+    if isinstance(operations, dict):
+        items = list(operations.items())
+    else:
+        if callable(operations) or isinstance(operations, tuple):
+            operations = [operations]
+        items = [(None, operation) for operation in operations]
+    specs = OrderedDict()
+    for name, operation in items:
+        op, column = operation() if callable(operation) else operation
+        if name is None:
+            name = _DEFAULT_NAMES[op] % column if column is not None else _DEFAULT_NAMES[op]
+        specs[name] = (op, column)
+    return specs
+
+
+def _as_list(values):
+    if isinstance(values, np.generic):
+        return [values.item()]
+    if isinstance(values, str) or np.isscalar(values) or values is None:
+        return [values]
+    if hasattr(values, 'to_pylist'):
+        return values.to_pylist()
+    return list(values)
+
+
+def _stack_items(value):
+    # the stacked elements of a list value, (key, value) pairs of a dict value, none of a missing value
+    if isinstance(value, dict):
+        return list(value.items())
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return list(value)
+    return []
+
+
+def is_graphlab(data):
+    '''True for GraphLab (or stand-in) SFrames/SArrays, without importing graphlab.'''
+    return type(data).__module__.startswith('graphlab')
+
+
+class GraphLabBackend(object):
+    '''The GraphLab Create SFrame/SArray operations (graphlab is only imported when needed).'''
+    name = 'graphlab'
+
+    def handles(self, data):
+        return is_graphlab(data)
+
+    def from_pandas(self, data_df):
+        import graphlab as gl
+        return gl.SFrame(data_df)
+
+    def to_pandas(self, data):
+        if hasattr(data, 'to_dataframe'):
+            return data.to_dataframe()
+        return pd.Series(list(data))
+
+    def num_rows(self, data):
+        return len(data)
+
+    def column_names(self, data):
+        return data.column_names()
+
+    def column(self, data, name):
+        return data[name]
+
+    def values(self, column):
+        if hasattr(column, 'to_numpy'):
+            return np.asarray(column.to_numpy())
+        return np.asarray(list(column))
+
+    def add_column(self, data, name, values):
+        import graphlab as gl
+        data[name] = values if isinstance(values, gl.SArray) else gl.SArray(list(values))
+        return data
+
+    def select_columns(self, data, columns):
+        return data.select_columns(list(columns))
+
+    def filter_by(self, data, values, column, exclude=False):
+        import graphlab as gl
+        return data.filter_by(gl.SArray(_as_list(values)), column, exclude=exclude)
+
+    def filter_rows(self, data, mask):
+        import graphlab as gl
+        return data[gl.SArray(list(np.asarray(mask, dtype=int)))]
+
+    def dropna(self, data, columns=None):
+        return data.dropna(columns=columns)
+
+    def sort(self, data, columns, ascending=True):
+        return data.sort(columns, ascending=ascending)
+
+    def head(self, data, n=10):
+        return data.head(n)
+
+    def topk(self, data, column, k=10, reverse=False):
+        return data.topk(column, k=k, reverse=reverse)
+
+    def groupby(self, data, keys, operations):
+        import graphlab as gl
+        names = {'count': 'COUNT', 'sum': 'SUM', 'mean': 'AVG', 'max': 'MAX', 'min': 'MIN', 'concat': 'CONCAT',
+                 'select_one': 'SELECT_ONE', 'count_distinct': 'COUNT_DISTINCT'}
+        operations = OrderedDict((name, getattr(gl.aggregate, names[op])(*([] if column is None else [column])))
+                                 for name, (op, column) in _operations(operations).items())
+        return data.groupby(keys, operations)
+
+    def join(self, left, right, on=None, how='inner'):
+        return left.join(right, on=on, how=how)
+
+    def stack(self, data, column, new_column_name=None, drop_na=False):
+        return data.stack(column, new_column_name=new_column_name, drop_na=drop_na)
+
+    def apply(self, data, fn):
+        return data.apply(fn)
+
+    def unique(self, column):
+        return column.unique()
+
+
+class PandasBackend(object):
+    '''Vectorized pandas/NumPy DataFrame operations (every result has a default index, as SFrames).'''
+    name = 'pandas'
+
+    def handles(self, data):
+        return isinstance(data, (pd.DataFrame, pd.Series))
+
+    def from_pandas(self, data_df):
+        return data_df.reset_index(drop=True)
+
+    def to_pandas(self, data):
+        return data
+
+    def num_rows(self, data):
+        return len(data)
+
+    def column_names(self, data):
+        return list(data.columns)
+
+    def column(self, data, name):
+        return data[name]
+
+    def values(self, column):
+        return np.asarray(column)
+
+    def add_column(self, data, name, values):
+        data[name] = np.asarray(values) if not isinstance(values, pd.Series) else values.values
+        return data
+
+    def select_columns(self, data, columns):
+        return data[list(columns)]
+
+    def filter_by(self, data, values, column, exclude=False):
+        mask = data[column].isin(_as_list(values)).values
+        return data[~mask if exclude else mask].reset_index(drop=True)
+
+    def filter_rows(self, data, mask):
+        return data[np.asarray(mask, dtype=bool)].reset_index(drop=True)
+
+    def dropna(self, data, columns=None):
+        columns = [columns] if isinstance(columns, str) else columns
+        return data.dropna(subset=columns).reset_index(drop=True)
+
+    def sort(self, data, columns, ascending=True):
+        return data.sort_values(columns, ascending=ascending, kind='mergesort').reset_index(drop=True)
+
+    def head(self, data, n=10):
+        return data.iloc[:n].reset_index(drop=True)
+
+    def topk(self, data, column, k=10, reverse=False):
+        # the k largest values (the k smallest with reverse=True), sorted; partial selection for numbers
+        if pd.api.types.is_numeric_dtype(data[column]):
+            selected = data.nsmallest(k, column) if reverse else data.nlargest(k, column)
+        else:
+            selected = data.sort_values(column, ascending=reverse, kind='mergesort').iloc[:k]
+        return selected.reset_index(drop=True)
+
+    def groupby(self, data, keys, operations):
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        grouped = data.groupby(keys, sort=False, dropna=False)
+        sizes = grouped.size()
+        columns = OrderedDict()
+        for name, (op, column) in _operations(operations).items():
+            if op == 'count':
+                columns[name] = sizes
+            elif op == 'concat':
+                # the non-missing values of every group (an empty list for groups of missing values only)
+                valid = data[data[column].notna().values]
+                lists = valid.groupby(keys, sort=False, dropna=False)[column].agg(list).reindex(sizes.index)
+                columns[name] = lists.map(lambda values: values if isinstance(values, list) else [])
+            elif op == 'select_one':
+                columns[name] = grouped[column].first()
+            elif op == 'count_distinct':
+                columns[name] = grouped[column].nunique()
+            else:
+                columns[name] = grouped[column].agg(op)
+        return pd.DataFrame(columns, index=sizes.index).reset_index()
+
+    def join(self, left, right, on=None, how='inner'):
+        if on is None:
+            on = [name for name in left.columns if name in right.columns]
+        return left.merge(right, on=on, how=how)
+
+    def stack(self, data, column, new_column_name=None, drop_na=False):
+        '''One row per element of a list column, or per (key, value) pair of a dict column.'''
+        items = data[column].map(_stack_items)
+        is_dict = any(isinstance(value, dict) for value in data[column].values)
+        stacked = data.drop(columns=[column])
+        stacked[column] = items.values
+        stacked = stacked.explode(column, ignore_index=True)
+        if drop_na:
+            stacked = stacked[stacked[column].notna().values].reset_index(drop=True)
+        values = stacked.pop(column)
+        if is_dict:
+            key_name, value_name = new_column_name or ['K', 'V']
+            pairs = [value if isinstance(value, tuple) else (None, None) for value in values]
+            stacked[key_name] = pd.Series([key for key, _ in pairs], dtype=object)
+            stacked[value_name] = pd.Series([value for _, value in pairs], dtype=object)
+        else:
+            stacked[new_column_name or column] = values.values
+        return stacked
+
+    def apply(self, data, fn):
+        if isinstance(data, pd.Series):
+            return data.map(fn).reset_index(drop=True)
+        return pd.Series([fn(row) for row in data.to_dict('records')])
+
+    def unique(self, column):
+        return pd.Series(pd.unique(np.asarray(column)))
+
+
+def _map_type(values):
+    # the (nested) Arrow map type of dict values
+    keys, items = [], []
+    for value in values:
+        if isinstance(value, dict):
+            keys.extend(value.keys())
+            items.extend(value.values())
+    key_type = pa.array(keys).type if keys else pa.string()
+    if any(isinstance(item, dict) for item in items):
+        return pa.map_(key_type, _map_type(items))
+    return pa.map_(key_type, pa.array(items).type if items else pa.null())
+
+
+def _map_items(value):
+    if not isinstance(value, dict):
+        return None
+    return [(key, _map_items(item) if isinstance(item, dict) else item) for key, item in value.items()]
+
+
+class ArrowBackend(PandasBackend):
+    '''Columnar Arrow Table operations (requires pyarrow; dict columns are stored as map columns).'''
+    name = 'arrow'
+
+    def handles(self, data):
+        return pa is not None and isinstance(data, (pa.Table, pa.ChunkedArray, pa.Array))
+
+    def from_pandas(self, data_df):
+        columns = OrderedDict()
+        for name in data_df.columns:
+            values = data_df[name]
+            if values.dtype == object and any(isinstance(value, dict) for value in values.values):
+                columns[name] = pa.array([_map_items(value) for value in values.values], type=_map_type(values.values))
+            else:
+                columns[name] = pa.Array.from_pandas(values)
+        return pa.table(columns)
+
+    def to_pandas(self, data):
+        return data.to_pandas()
+
+    def num_rows(self, data):
+        return data.num_rows if isinstance(data, pa.Table) else len(data)
+
+    def column_names(self, data):
+        return list(data.column_names)
+
+    def column(self, data, name):
+        return data[name]
+
+    def values(self, column):
+        return column.to_numpy(zero_copy_only=False) if isinstance(column, pa.Array) else column.to_numpy()
+
+    def add_column(self, data, name, values):
+        values = values if isinstance(values, (pa.Array, pa.ChunkedArray)) else pa.array(values)
+        if name in data.column_names:
+            return data.set_column(data.column_names.index(name), name, values)
+        return data.append_column(name, values)
+
+    def select_columns(self, data, columns):
+        return data.select(list(columns))
+
+    def filter_by(self, data, values, column, exclude=False):
+        mask = pc.is_in(data[column], value_set=pa.array(_as_list(values), type=data.schema.field(column).type))
+        return data.filter(pc.invert(mask) if exclude else mask)
+
+    def filter_rows(self, data, mask):
+        return data.filter(pa.array(np.asarray(mask, dtype=bool)))
+
+    def dropna(self, data, columns=None):
+        columns = [columns] if isinstance(columns, str) else columns or data.column_names
+        mask = pc.is_valid(data[columns[0]])
+        for name in columns[1:]:
+            mask = pc.and_(mask, pc.is_valid(data[name]))
+        return data.filter(mask)
+
+    def sort(self, data, columns, ascending=True):
+        columns = [columns] if isinstance(columns, str) else columns
+        return data.sort_by([(name, 'ascending' if ascending else 'descending') for name in columns])
+
+    def head(self, data, n=10):
+        return data.slice(0, n)
+
+    def topk(self, data, column, k=10, reverse=False):
+        sort_keys = [(column, 'ascending' if reverse else 'descending')]
+        return data.take(pc.select_k_unstable(data, k=min(k, data.num_rows), sort_keys=sort_keys)).sort_by(sort_keys)
+
+    def groupby(self, data, keys, operations):
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        names = {'count': 'count', 'sum': 'sum', 'mean': 'mean', 'max': 'max', 'min': 'min', 'concat': 'list',
+                 'select_one': 'first', 'count_distinct': 'count_distinct'}
+        operations = _operations(operations)
+        aggregations = [(keys[0], 'count', pc.CountOptions(mode='all')) if op == 'count' else (column, names[op])
+                        for op, column in operations.values()]
+        # ordered aggregations (first) and groups in order of appearance need a single thread
+        result = data.group_by(keys, use_threads=False).aggregate(aggregations)
+        columns = OrderedDict((key, result[key]) for key in keys)
+        for name, (op, column) in operations.items():
+            values = result['%s_%s' % (keys[0] if op == 'count' else column, names[op])]
+            if op == 'concat':
+                # drop the missing values of the lists
+                lists = values.combine_chunks()
+                flat = pc.list_flatten(lists)
+                valid = pc.is_valid(flat).to_numpy(zero_copy_only=False)
+                parents = pc.list_parent_indices(lists).to_numpy(zero_copy_only=False)
+                offsets = np.concatenate([[0], np.cumsum(np.bincount(parents[valid], minlength=len(lists)))])
+                values = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), flat.filter(pa.array(valid)))
+            columns[name] = values
+        return pa.table(columns)
+
+    def join(self, left, right, on=None, how='inner'):
+        if on is None:
+            on = [name for name in left.column_names if name in right.column_names]
+        join_types = {'inner': 'inner', 'left': 'left outer', 'right': 'right outer', 'outer': 'full outer'}
+        on = [on] if isinstance(on, str) else list(on)
+        # join the keys and row numbers only (nested columns can't be joined), then take the rows
+        left_rows = left.select(on).append_column('__left', pa.array(np.arange(left.num_rows)))
+        right_rows = right.select(on).append_column('__right', pa.array(np.arange(right.num_rows)))
+        pairs = left_rows.join(right_rows, keys=on, join_type=join_types[how])
+        joined = pairs.select(on)
+        for table, rows in [(left, pairs['__left']), (right, pairs['__right'])]:
+            others = table.drop_columns(on).take(rows)
+            for name in others.column_names:
+                joined = joined.append_column(name, others[name])
+        return joined
+
+    def stack(self, data, column, new_column_name=None, drop_na=False):
+        '''One row per element of a list column, or per (key, value) pair of a map column.'''
+        values = data[column].combine_chunks()
+        if not pa.types.is_list(values.type) and not pa.types.is_large_list(values.type) \
+                and not pa.types.is_map(values.type):
+            raise TypeError('Only list and map columns can be stacked, not %s.' % values.type)
+        is_map = pa.types.is_map(values.type)
+        if is_map:
+            values = values.cast(pa.list_(pa.struct([values.type.key_field, values.type.item_field])))
+        flat = pc.list_flatten(values)
+        lengths = pc.fill_null(pc.list_value_length(values), 0).to_numpy(zero_copy_only=False).astype(np.int64)
+        counts = lengths if drop_na else np.maximum(lengths, 1)
+        # the flattened position of every stacked element (missing for the rows of empty/missing lists)
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        within = np.arange(counts.sum()) - starts
+        positions = np.repeat(np.cumsum(lengths) - lengths, counts) + within
+        empty = within >= np.repeat(lengths, counts)
+        elements = flat.take(pa.array(np.where(empty, 0, positions), mask=empty))
+
+        rows = pa.array(np.repeat(np.arange(len(values)), counts))
+        stacked = data.drop_columns([column]).take(rows)
+        if is_map:
+            key_name, value_name = new_column_name or ['K', 'V']
+            stacked = stacked.append_column(key_name, elements.field(0)).append_column(value_name, elements.field(1))
+        else:
+            stacked = stacked.append_column(new_column_name or column, elements)
+        return stacked
+
+    def apply(self, data, fn):
+        rows = data.to_pylist()
+        return pa.array([fn(row) for row in rows])
+
+    def unique(self, column):
+        return pc.unique(column)
+
+
+BACKENDS = OrderedDict((backend.name, backend) for backend in [GraphLabBackend(), ArrowBackend(), PandasBackend()])
+
+
+def get_backend(data):
+    '''The backend of an SFrame/SArray, a DataFrame/Series or an Arrow Table/Array:
+
+    Usage
+    -----
+    backend = get_backend(reviews)
+    counts = backend.groupby(reviews, 'name', COUNT)
+    counts = backend.sort(counts, 'Count', ascending=False)
+    '''
+    for backend in BACKENDS.values():
+        if backend.handles(data):
+            return backend
+    raise TypeError('No backend handles %s objects.' % type(data).__name__)
+
+
+def to_backend(data, name):
+    '''Convert a table to another backend ('graphlab', 'pandas' or 'arrow'), through pandas.'''
+    return BACKENDS[name].from_pandas(get_backend(data).to_pandas(data))
+
+
+def to_pandas(data):
+    return get_backend(data).to_pandas(data)
+
+
+# the operations of the helpers, dispatched on the type of their (first) table
+def groupby(data, keys, operations):
+    return get_backend(data).groupby(data, keys, operations)
+
+
+def stack(data, column, new_column_name=None, drop_na=False):
+    return get_backend(data).stack(data, column, new_column_name=new_column_name, drop_na=drop_na)
+
+
+def filter_by(data, values, column, exclude=False):
+    return get_backend(data).filter_by(data, values, column, exclude=exclude)
+
+
+def topk(data, column, k=10, reverse=False):
+    return get_backend(data).topk(data, column, k=k, reverse=reverse)
+
+
+def join(left, right, on=None, how='inner'):
+    return get_backend(left).join(left, right, on=on, how=how)
+
+
+def apply(data, fn):
+    return get_backend(data).apply(data, fn)
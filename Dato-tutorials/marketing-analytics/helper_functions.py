@@ -1,11 +1,19 @@
 # helper functions to add (generate) calendar days in data set
 import calendar
-import graphlab as gl
 import numpy as np
+import pandas as pd
+import os
+import sys
+# the table backends are shared by the Dato tutorials (Dato-tutorials/backend_helper_functions.py)
+_DATO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _DATO_DIR not in sys.path:
+    sys.path.append(_DATO_DIR)
+from backend_helper_functions import get_backend, is_graphlab
 
 def add_running_year(month_sf, start_year):
     
     year_attrib = []
+    reference, month_sf = month_sf, _to_numpy(month_sf)
     
     for row_idx in range(len(month_sf)):
         running_month = month_sf[row_idx]
@@ -23,26 +31,27 @@ def add_running_year(month_sf, start_year):
                 year +=1
                 year_attrib.append(year)
         
-    year_sf = gl.SArray(year_attrib)
+    year_sf = _like(np.array(year_attrib), reference)
     
     return year_sf
 
 def add_month_running_date(data, year_column_name, month_column_name, wkday_column_name):
     calendar.setfirstweekday(calendar.SUNDAY)
+    backend = get_backend(data)
 
-    year_sf = data[year_column_name].astype(int)
-    month_sf = data[month_column_name].astype(int)
-    wkday_sf = data[wkday_column_name].astype(int)
+    year_sf = backend.values(backend.column(data, year_column_name)).astype(int)
+    month_sf = backend.values(backend.column(data, month_column_name)).astype(int)
+    wkday_sf = backend.values(backend.column(data, wkday_column_name)).astype(int)
     monthcal_date_sf = []
 
     prev_running_date = 0
 
-    for row_idx in range(len(data)):
+    for row_idx in range(len(year_sf)):
         running_year = year_sf[row_idx]
         running_month = month_sf[row_idx]
         running_wkday = wkday_sf[row_idx]
         
-        monthcal = calendar.monthcalendar(running_year, running_month)
+        monthcal = calendar.monthcalendar(int(running_year), int(running_month))
         
         if(row_idx == 0):
             prev_running_year = running_year
@@ -79,31 +88,157 @@ def add_month_running_date(data, year_column_name, month_column_name, wkday_colu
                 monthcal_date_sf.append(running_date)
                 break
         
-    monthcal_date_sf = gl.SArray(monthcal_date_sf)
+    monthcal_date_sf = _like(np.array(monthcal_date_sf), data)
                        
     return monthcal_date_sf
 
 def add_running_date(data, year_column_name, month_column_name, wkday_column_name):
-    year_sf = data[year_column_name]
-    month_sf = data[month_column_name]
+    backend = get_backend(data)
+    year_sf = backend.values(backend.column(data, year_column_name))
+    month_sf = backend.values(backend.column(data, month_column_name))
     data_sf = []
     
-    for row_idx in range(len(data)):
+    for row_idx in range(len(year_sf)):
         running_year = year_sf[row_idx]
         running_month = month_sf[row_idx]
         
         if(row_idx == 0):
-            monthdata = data.filter_by(running_year, year_column_name).filter_by(running_month, month_column_name)
+            monthdata = backend.filter_by(backend.filter_by(data, running_year, year_column_name),
+                                          running_month, month_column_name)
             monthcal_date_sf = add_month_running_date(monthdata, year_column_name, month_column_name, wkday_column_name)
             data_sf.extend(monthcal_date_sf)
         else:
             prev_running_year = year_sf[row_idx-1]
             prev_running_month = month_sf[row_idx-1]
             if((running_year != prev_running_year) | (running_month != prev_running_month)):
-                monthdata = data.filter_by(running_year, year_column_name).filter_by(running_month, month_column_name)
+                monthdata = backend.filter_by(backend.filter_by(data, running_year, year_column_name),
+                                              running_month, month_column_name)
                 monthcal_date_sf = add_month_running_date(monthdata, year_column_name, month_column_name, wkday_column_name)
                 data_sf.extend(monthcal_date_sf)
         
-    data_sf = gl.SArray(data_sf)
+    data_sf = _like(np.array(data_sf), data)
     
-    return data_sf
\ No newline at end of file
+    return data_sf
+
+# vectorized (per-vocabulary instead of per-row) timestamping of the contacts
+MONTH_NUMBERS = dict((calendar.month_abbr[nr].lower(), nr) for nr in range(1, 13))
+MONTH_NUMBERS.update((calendar.month_name[nr].lower(), nr) for nr in range(1, 13))
+# as strftime('%w'), with Sunday=0
+WKDAY_NUMBERS = dict((calendar.day_abbr[wkday].lower(), (wkday + 1) % 7) for wkday in range(7))
+WKDAY_NUMBERS.update((calendar.day_name[wkday].lower(), (wkday + 1) % 7) for wkday in range(7))
+
+def _to_numpy(values):
+    if hasattr(values, 'to_numpy'):
+        return np.asarray(values.to_numpy())
+    return np.asarray(values)
+
+def _like(values, reference):
+    # return a SArray for SArray/SFrame inputs, a numpy array otherwise
+    if is_graphlab(reference):
+        import graphlab as gl
+        return gl.SArray(list(values))
+    return values
+
+def map_vocabulary(values, vocabulary):
+    '''Map the values of a small closed vocabulary (e.g. 'jan'..'dec') to numbers in one vectorized pass:
+    
+    Parameters
+    ----------
+    values: SArray or array-like of strings
+    vocabulary: dict
+        lower case word -> number, e.g. MONTH_NUMBERS or WKDAY_NUMBERS.
+    
+    Returns
+    -------
+    numbers: numpy array of ints
+    '''
+    uniques, inverse = np.unique(_to_numpy(values).astype(str), return_inverse=True)
+    lookup = np.array([vocabulary.get(word.strip().lower(), -1) for word in uniques], dtype=int)
+    if (lookup < 0).any():
+        raise ValueError('Unknown values: {}'.format(', '.join(uniques[lookup < 0])))
+    return lookup[inverse.ravel()]
+
+def month_to_number(values):
+    return _like(map_vocabulary(values, MONTH_NUMBERS), values)
+
+def wkday_to_number(values):
+    return _like(map_vocabulary(values, WKDAY_NUMBERS), values)
+
+def running_year(month_nr, start_year):
+    '''Vectorized `add_running_year`: the year increases whenever the month number decreases.'''
+    month_nr = _to_numpy(month_nr).astype(int)
+    year_change = np.concatenate([[0], month_nr[1:] < month_nr[:-1]])
+    return start_year + np.cumsum(year_change)
+
+def running_date(year, month_nr, wkday_nr):
+    '''Vectorized `add_running_date`: the day of the month of chronologically ordered contacts:
+    
+    Within a (year, month) run, a new (Sunday first) calendar week starts whenever the weekday
+    number decreases; the first row falls in the first week of the month holding its weekday.
+    Rows running past the end of the month get 0 (as `calendar.monthcalendar` would).
+    
+    Parameters
+    ----------
+    year, month_nr, wkday_nr: array-likes of ints
+        wkday_nr as strftime('%w'), with Sunday=0.
+    
+    Returns
+    -------
+    day: numpy array of ints
+    '''
+    year = _to_numpy(year).astype(int)
+    month_nr = _to_numpy(month_nr).astype(int)
+    wkday_nr = _to_numpy(wkday_nr).astype(int)
+    
+    new_month = np.ones(len(year), dtype=bool)
+    new_month[1:] = (year[1:] != year[:-1]) | (month_nr[1:] != month_nr[:-1])
+    month_id = np.cumsum(new_month) - 1
+    month_start = np.flatnonzero(new_month)
+    
+    # (Sunday first) weekday of the 1st and number of days of every month, 1970-01-01 was a Thursday
+    months = (year[month_start] - 1970) * 12 + month_nr[month_start] - 1
+    first_day = months.astype('datetime64[M]').astype('datetime64[D]')
+    num_days = ((months + 1).astype('datetime64[M]').astype('datetime64[D]') - first_day).astype(int)
+    first_wkday = (first_day.astype(int) + 4) % 7
+    
+    new_week = np.zeros(len(year), dtype=int)
+    new_week[1:] = wkday_nr[1:] < wkday_nr[:-1]
+    new_week[month_start] = 0
+    weeks = np.cumsum(new_week)
+    week = weeks - weeks[month_start][month_id] + (wkday_nr[month_start] < first_wkday)[month_id]
+    
+    day = 7 * week + wkday_nr - first_wkday[month_id] + 1
+    day[(day < 1) | (day > num_days[month_id])] = 0
+    return day
+
+def add_timestamps(data, start_year, month_column_name='month', wkday_column_name='day_of_week'):
+    '''Add the 'month_nr', 'wkday_nr', 'year' and 'date' (datetime) columns in one vectorized pass:
+    
+    Replaces the row-wise dateutil parsing and the `add_running_year` / `add_running_date`
+    loops of the lead scoring notebook, e.g.
+        bank_marketing = add_timestamps(bank_marketing, 2008)
+    
+    Parameters
+    ----------
+    data: SFrame, DataFrame or Arrow Table
+        The chronologically ordered contacts.
+    start_year: int
+        The year of the first contact.
+    
+    Returns
+    -------
+    data: SFrame, DataFrame or Arrow Table
+        The input, with the added columns (a new table for Arrow inputs).
+    '''
+    backend = get_backend(data)
+    month_nr = map_vocabulary(backend.values(backend.column(data, month_column_name)), MONTH_NUMBERS)
+    wkday_nr = map_vocabulary(backend.values(backend.column(data, wkday_column_name)), WKDAY_NUMBERS)
+    year = running_year(month_nr, start_year)
+    day = running_date(year, month_nr, wkday_nr)
+    date = pd.to_datetime(pd.DataFrame({'year': year, 'month': month_nr, 'day': day}), errors='coerce')
+    
+    data = backend.add_column(data, 'month_nr', month_nr)
+    data = backend.add_column(data, 'wkday_nr', wkday_nr)
+    data = backend.add_column(data, 'year', year)
+    data = backend.add_column(data, 'date', date.dt.to_pydatetime() if is_graphlab(data) else date.values)
+    return data
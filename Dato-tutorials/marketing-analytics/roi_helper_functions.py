@@ -0,0 +1,181 @@
+# helper functions to evaluate the ROI of lead-scored call campaigns
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+def _to_numpy(values):
+    # accept GraphLab SArrays, pandas Series and array-likes
+    if hasattr(values, 'to_numpy'):
+        return np.asarray(values.to_numpy())
+    return np.asarray(values)
+
+
+def _targets(contact_list, target):
+    if isinstance(contact_list, (np.ndarray, list, tuple)):
+        return np.asarray(contact_list, dtype=float)
+    return _to_numpy(contact_list[target]).astype(float)
+
+
+def _num_calls(num_contacts, pcts_tocall):
+    pcts_tocall = np.atleast_1d(np.asarray(pcts_tocall, dtype=float))
+    num_calls = (num_contacts * pcts_tocall).astype(np.int64)
+    if (num_calls < 1).any():
+        raise ValueError('Every pct_tocall should lead to at least one phone call.')
+    return pcts_tocall, num_calls
+
+
+def _roi(num_subscriptions, num_calls, cost_ofcall, cust_ltv):
+    return (num_subscriptions * cust_ltv - num_calls * cost_ofcall) / (num_calls * cost_ofcall)
+
+
+def ranked_conversions(targets, lead_score):
+    '''Cumulative conversions of a contact list sorted (once) by decreasing lead score:
+
+    Returns
+    -------
+    cum_conversions: numpy array, len(targets) + 1
+        cum_conversions[k] is the number of subscriptions among the k highest scored contacts.
+    '''
+    order = np.argsort(-_to_numpy(lead_score).astype(float), kind='mergesort')
+    return np.concatenate([[0.], np.cumsum(targets[order])])
+
+
+def calc_call_roi(contact_list, lead_score, pct_tocall, target='y', cost_ofcall=1.00, cust_ltv=100.00):
+    '''Vectorized drop-in of the notebook's `calc_call_roi`:
+
+    Parameters
+    ----------
+    contact_list: SFrame, DataFrame or array of 0/1 targets
+        The contacts, holding the target column.
+    lead_score: SArray or array-like
+        The lead score of every contact.
+    pct_tocall: float or array-like of floats in (0,1] range
+        The fraction(s) of the contact list we can afford to call.
+    cost_ofcall, cust_ltv: float, optional
+        The cost of a phone call and the customer lifetime value.
+
+    Returns
+    -------
+    roi: float (or numpy array for several pct_tocall)
+    '''
+    targets = _targets(contact_list, target)
+    cum_conversions = ranked_conversions(targets, lead_score)
+    pcts_tocall, num_calls = _num_calls(len(targets), pct_tocall)
+    roi = _roi(cum_conversions[num_calls], num_calls, cost_ofcall, cust_ltv)
+    return float(roi[0]) if np.ndim(pct_tocall) == 0 else roi
+
+
+def call_roi_curves(contact_list, lead_scores, pcts_tocall=None, target='y',
+                    cost_ofcall=1.00, cust_ltv=100.00):
+    '''ROI-vs-budget curves of several lead scoring models in one vectorized pass:
+
+    Every model's scores are sorted once and the cumulative conversions
+    (prefix sums) give the number of subscriptions for every calling budget.
+
+    Parameters
+    ----------
+    contact_list: SFrame, DataFrame or array of 0/1 targets
+    lead_scores: dict
+        model name -> lead scores, e.g. {'toolkit_model': toolkit_leadscore, ...}
+    pcts_tocall: array-like of floats in (0,1] range, optional
+        The calling budgets (default: 1%, 2%, ..., 100% of the contacts).
+
+    Returns
+    -------
+    roi_curves: DataFrame
+        Columns 'pct_tocall', 'num_calls' and one ROI column per model.
+    '''
+    targets = _targets(contact_list, target)
+    if pcts_tocall is None:
+        pcts_tocall = np.arange(1, 101) / 100.
+    pcts_tocall, num_calls = _num_calls(len(targets), pcts_tocall)
+
+    curves = OrderedDict([('pct_tocall', pcts_tocall), ('num_calls', num_calls)])
+    for model_name, lead_score in lead_scores.items():
+        cum_conversions = ranked_conversions(targets, lead_score)
+        curves[model_name] = _roi(cum_conversions[num_calls], num_calls, cost_ofcall, cust_ltv)
+    return pd.DataFrame(curves)
+
+
+def call_roi_bootstrap(contact_list, lead_scores, pcts_tocall=None, target='y',
+                       cost_ofcall=1.00, cust_ltv=100.00, num_bootstrap=1000,
+                       confidence=0.95, batch_size=100, random_seed=1):
+    '''Bootstrap confidence bands of the ROI-vs-budget curves:
+
+    The contacts are resampled with replacement in batches of `batch_size`
+    replicates. A replicate is represented by the resampling counts of the
+    contacts in (each model's) lead score order, so its top-k calls and their
+    conversions follow from prefix sums and a batched `searchsorted`, with no
+    re-sorting of the replicates.
+
+    Parameters
+    ----------
+    num_bootstrap: int
+        The number of bootstrap replicates.
+    confidence: float in (0,1) range
+        The confidence level of the percentile bands.
+    batch_size: int
+        The number of replicates resampled at once (bounds the memory to
+        batch_size x len(contact_list) counts).
+    random_seed: int
+        The replicates of the i-th batch are drawn with the seed random_seed + i.
+
+    Returns
+    -------
+    roi_bands: DataFrame
+        Columns 'model', 'pct_tocall', 'num_calls', 'roi', 'roi_lower', 'roi_upper'.
+    '''
+    targets = _targets(contact_list, target)
+    num_contacts = len(targets)
+    if pcts_tocall is None:
+        pcts_tocall = np.arange(5, 101, 5) / 100.
+    pcts_tocall, num_calls = _num_calls(num_contacts, pcts_tocall)
+    # the lead score order of every model
+    ranks, sorted_targets = OrderedDict(), OrderedDict()
+    for model_name, lead_score in lead_scores.items():
+        order = np.argsort(-_to_numpy(lead_score).astype(float), kind='mergesort')
+        ranks[model_name] = np.empty(num_contacts, dtype=np.int64)
+        ranks[model_name][order] = np.arange(num_contacts)
+        sorted_targets[model_name] = targets[order]
+
+    rois = OrderedDict((model_name, []) for model_name in lead_scores)
+    for batch_index, start in enumerate(range(0, num_bootstrap, batch_size)):
+        # the same resampled contacts are used for all the models (drawn per batch, seeded by batch)
+        n_batch = min(batch_size, num_bootstrap - start)
+        random_state = np.random.RandomState(random_seed + batch_index)
+        draws = random_state.randint(num_contacts, size=(n_batch, num_contacts))
+        offsets = (np.arange(n_batch) * num_contacts)[:, None]
+        rows = np.arange(n_batch)[:, None]
+        row_offsets = rows * (num_contacts + 1)
+
+        for model_name in lead_scores:
+            rank, model_targets = ranks[model_name], sorted_targets[model_name]
+            counts = np.bincount((rank[draws] + offsets).ravel(),
+                                 minlength=n_batch * num_contacts).reshape(n_batch, num_contacts)
+            cum_counts = np.cumsum(counts, axis=1)
+            cum_conversions = np.cumsum(counts * model_targets, axis=1)
+
+            # position of the k-th call of every replicate (rows are monotone, so a
+            # single searchsorted over the row-offset flattened counts suffices)
+            flat = (cum_counts + row_offsets).ravel()
+            positions = np.searchsorted(flat, (num_calls[None, :] + row_offsets).ravel())
+            positions = positions.reshape(n_batch, len(num_calls)) - rows * num_contacts
+            before = np.where(positions > 0, cum_counts[rows, positions - 1], 0)
+            conversions_before = np.where(positions > 0, cum_conversions[rows, positions - 1], 0.)
+            # calls beyond the previous positions are copies of the contact at `positions`
+            conversions = conversions_before + (num_calls[None, :] - before) * model_targets[positions]
+            rois[model_name].append(_roi(conversions, num_calls[None, :], cost_ofcall, cust_ltv))
+
+    tail = (1. - confidence) / 2.
+    bands = []
+    for model_name in lead_scores:
+        model_rois = np.concatenate(rois[model_name], axis=0)
+        cum_conversions = np.concatenate([[0.], np.cumsum(sorted_targets[model_name])])
+        roi = _roi(cum_conversions[num_calls], num_calls, cost_ofcall, cust_ltv)
+        bands.append(pd.DataFrame(OrderedDict([
+            ('model', model_name), ('pct_tocall', pcts_tocall), ('num_calls', num_calls),
+            ('roi', roi), ('roi_lower', np.percentile(model_rois, 100 * tail, axis=0)),
+            ('roi_upper', np.percentile(model_rois, 100 * (1. - tail), axis=0))])))
+
+    return pd.concat(bands, ignore_index=True)
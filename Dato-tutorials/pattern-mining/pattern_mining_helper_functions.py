@@ -0,0 +1,407 @@
+# helper classes for parallel, cached frequent pattern mining on basket data
+import multiprocessing
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# number of set bits of every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def _support(bits):
+    return int(_POPCOUNT[bits].sum())
+
+
+def _to_dataframe(data):
+    # accept GraphLab SFrames as well as pandas DataFrames
+    if hasattr(data, 'to_dataframe'):
+        return data.to_dataframe()
+    return data
+
+
+class TransactionEncoder(object):
+    '''Compact, incremental encoding of basket data into transactions:
+
+    Every row (item, transaction keys) of the basket data is encoded once into
+    a pair of int32 codes (transaction id, item id); chunks of a file too large
+    to load at once can be fed one at a time with `partial_fit`. The vertical
+    representation used for mining is one packed bitset per item, with one
+    bit per transaction.
+
+    Parameters
+    ----------
+    item_column: string
+        The attribute name of the items, e.g. 'Item'.
+    features: list of strings
+        The attributes identifying a transaction, e.g. ['Receipt', 'StoreNum'].
+    items: list, optional
+        A known item vocabulary (e.g. of the training set) to encode new data with.
+    '''
+    def __init__(self, item_column, features, items=None):
+        self.item_column = item_column
+        self.features = list(features)
+        self.items = [] if items is None else list(items)
+        self._item_ids = dict((item, i) for i, item in enumerate(self.items))
+        self.transactions = []
+        self._transaction_ids = {}
+        self._tid_chunks = []
+        self._item_chunks = []
+
+    def _codes(self, values, ids, labels):
+        # factorize the chunk, then map its (few) unique values to global ids
+        chunk_codes, uniques = pd.factorize(values)
+        mapping = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            if value not in ids:
+                ids[value] = len(labels)
+                labels.append(value)
+            mapping[i] = ids[value]
+        return mapping[chunk_codes]
+
+    def partial_fit(self, data_chunk):
+        '''Encode a chunk of basket data (DataFrame or SFrame).'''
+        data_chunk = _to_dataframe(data_chunk)
+        data_chunk = data_chunk.dropna(subset=[self.item_column] + self.features)
+        keys = pd.MultiIndex.from_frame(data_chunk[self.features]) if len(self.features) > 1 \
+            else data_chunk[self.features[0]]
+        self._tid_chunks.append(self._codes(keys, self._transaction_ids, self.transactions))
+        self._item_chunks.append(self._codes(data_chunk[self.item_column], self._item_ids, self.items))
+        return self
+
+    def fit(self, data):
+        if isinstance(data, pd.DataFrame) or hasattr(data, 'to_dataframe'):
+            return self.partial_fit(data)
+        for chunk in data:
+            self.partial_fit(chunk)
+        return self
+
+    @property
+    def num_transactions(self):
+        return len(self.transactions)
+
+    def codes(self):
+        '''The (transaction id, item id) pairs of all the encoded rows.'''
+        if len(self._tid_chunks) > 1:
+            self._tid_chunks = [np.concatenate(self._tid_chunks)]
+            self._item_chunks = [np.concatenate(self._item_chunks)]
+        if not self._tid_chunks:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        return self._tid_chunks[0], self._item_chunks[0]
+
+    def transaction_item_matrix(self):
+        '''Sparse binary (n_transactions, n_items) matrix of the encoded transactions.'''
+        tids, item_ids = self.codes()
+        matrix = sparse.csr_matrix((np.ones(len(tids), dtype=np.int32), (tids, item_ids)),
+                                   shape=(self.num_transactions, len(self.items)))
+        # items repeated within a transaction count once
+        matrix.data[:] = 1
+        return matrix
+
+    def bitsets(self):
+        '''Packed transaction bitsets, (n_items, ceil(n_transactions/8)) uint8 array.'''
+        tids, item_ids = self.codes()
+        n_bytes = (self.num_transactions + 7) // 8
+        bitsets = np.zeros((len(self.items), n_bytes), dtype=np.uint8)
+        order = np.argsort(item_ids, kind='mergesort')
+        bounds = np.searchsorted(item_ids[order], np.arange(len(self.items) + 1))
+        for item_id in range(len(self.items)):
+            present = np.zeros(self.num_transactions, dtype=bool)
+            present[tids[order[bounds[item_id]:bounds[item_id + 1]]]] = True
+            bitsets[item_id] = np.packbits(present)
+        return bitsets
+
+
+def pattern_item_matrix(patterns, items):
+    '''Sparse binary (n_patterns, n_items) matrix of a list of patterns (lists of items).'''
+    item_ids = dict((item, i) for i, item in enumerate(items))
+    rows, cols = [], []
+    for row, pattern in enumerate(patterns):
+        for item in pattern:
+            rows.append(row)
+            cols.append(item_ids[item])
+    return sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, cols)),
+                             shape=(len(patterns), len(items)))
+
+
+def pattern_containment(transaction_items, pattern_items):
+    '''Which patterns every transaction contains, with a single sparse matrix product:
+
+    A transaction contains a pattern iff the number of their common items equals
+    the pattern length.
+
+    Parameters
+    ----------
+    transaction_items: sparse matrix, (n_transactions, n_items)
+    pattern_items: sparse matrix, (n_patterns, n_items)
+
+    Returns
+    -------
+    containment: sparse csr matrix of int32 0/1, (n_transactions, n_patterns)
+    '''
+    pattern_lengths = np.asarray(pattern_items.sum(axis=1)).ravel()
+    common = sparse.csr_matrix(transaction_items.dot(pattern_items.T))
+    common.data = (common.data == pattern_lengths[common.indices]).astype(np.int32)
+    common.eliminate_zeros()
+    return common
+
+
+def segment_sum(segment_ids, matrix, n_segments=None):
+    '''Sum the rows of a sparse matrix per segment (e.g. per employee):
+
+    Returns
+    -------
+    sums: sparse csr matrix, (n_segments, n_columns)
+    '''
+    segment_ids = np.asarray(segment_ids)
+    n_segments = segment_ids.max() + 1 if n_segments is None else n_segments
+    indicator = sparse.csr_matrix((np.ones(len(segment_ids), dtype=matrix.dtype),
+                                   (segment_ids, np.arange(len(segment_ids)))),
+                                  shape=(n_segments, matrix.shape[0]))
+    return sparse.csr_matrix(indicator.dot(matrix))
+
+
+# worker state, shared with the pool processes once through their initializer
+_WORKER = {}
+
+
+def _init_worker(bitsets, supports, min_support, max_length):
+    _WORKER['bitsets'] = bitsets
+    _WORKER['supports'] = supports
+    _WORKER['min_support'] = min_support
+    _WORKER['max_length'] = max_length
+
+
+def _eclat(prefix, candidates, min_support, max_length, patterns):
+    # depth-first Eclat over an equivalence class of (item, bitset, support) candidates
+    for i, (item, bits, support) in enumerate(candidates):
+        pattern = prefix + (item,)
+        patterns.append((pattern, support))
+        if max_length is not None and len(pattern) >= max_length:
+            continue
+        extensions = []
+        for other, other_bits, _ in candidates[i + 1:]:
+            joint = bits & other_bits
+            joint_support = _support(joint)
+            if joint_support >= min_support:
+                extensions.append((other, joint, joint_support))
+        if extensions:
+            _eclat(pattern, extensions, min_support, max_length, patterns)
+
+
+def _mine_class(position):
+    # mine all the patterns whose first (least frequent) item is the given one
+    bitsets, supports = _WORKER['bitsets'], _WORKER['supports']
+    min_support, max_length = _WORKER['min_support'], _WORKER['max_length']
+    patterns = [((position,), supports[position])]
+    if max_length is not None and max_length <= 1:
+        return patterns
+
+    bits = bitsets[position]
+    extensions = []
+    for other in range(position + 1, len(supports)):
+        joint = bits & bitsets[other]
+        joint_support = _support(joint)
+        if joint_support >= min_support:
+            extensions.append((other, joint, joint_support))
+    _eclat((position,), extensions, min_support, max_length, patterns)
+    return patterns
+
+
+class FrequentPatternMiner(object):
+    '''Parallel Eclat frequent itemset miner with a cached pattern lattice:
+
+    The basket data are encoded once (see `TransactionEncoder`) and mined with
+    Eclat on packed bitsets (support = popcount of bitwise ANDs). The
+    equivalence classes of the frequent items are mined in parallel worker
+    processes. The mined lattice is cached: queries with a higher min_support
+    are answered instantly by filtering it, and only lower min_support values
+    trigger a new mining pass, whose lattice replaces the cached one.
+
+    Parameters
+    ----------
+    data: SFrame, DataFrame, or iterable of DataFrame chunks
+        The basket data, e.g. the bakery training set.
+    item_column: string
+        e.g. 'Item'
+    features: list of strings
+        e.g. ['Receipt', 'StoreNum']
+    n_jobs: int, optional
+        The number of worker processes (default: number of CPUs, 1 mines serially).
+    '''
+    def __init__(self, data, item_column, features, n_jobs=None):
+        self.encoder = TransactionEncoder(item_column, features).fit(data)
+        self.bitsets = self.encoder.bitsets()
+        self.item_supports = _POPCOUNT[self.bitsets].sum(axis=1)
+        self.n_jobs = multiprocessing.cpu_count() if n_jobs is None else n_jobs
+        self._lattice = None
+        self._lattice_min_support = None
+        self._lattice_max_length = None
+
+    @property
+    def num_transactions(self):
+        return self.encoder.num_transactions
+
+    def _absolute_support(self, min_support):
+        if isinstance(min_support, float) and min_support < 1:
+            return max(1, int(np.ceil(min_support * self.num_transactions)))
+        return max(1, int(min_support))
+
+    def _covers(self, min_support, max_length):
+        if self._lattice is None or min_support < self._lattice_min_support:
+            return False
+        if self._lattice_max_length is None:
+            return True
+        return max_length is not None and max_length <= self._lattice_max_length
+
+    def mine(self, min_support, max_length=None):
+        '''Mine (or reuse) the lattice of all itemsets with support >= min_support:
+
+        Returns
+        -------
+        lattice: dict
+            frozenset of item ids -> support
+        '''
+        min_support = self._absolute_support(min_support)
+        if self._covers(min_support, max_length):
+            return self._lattice
+
+        # least frequent items first keeps the equivalence classes small
+        frequent = np.flatnonzero(self.item_supports >= min_support)
+        frequent = frequent[np.argsort(self.item_supports[frequent], kind='mergesort')]
+        bitsets = self.bitsets[frequent]
+        supports = [int(s) for s in self.item_supports[frequent]]
+
+        args = (bitsets, supports, min_support, max_length)
+        if self.n_jobs > 1 and len(frequent) > 1:
+            pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=args)
+            try:
+                classes = pool.map(_mine_class, range(len(frequent)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            _init_worker(*args)
+            classes = [_mine_class(position) for position in range(len(frequent))]
+
+        lattice = {}
+        for patterns in classes:
+            for pattern, support in patterns:
+                lattice[frozenset(int(frequent[p]) for p in pattern)] = support
+
+        self._lattice = lattice
+        self._lattice_min_support = min_support
+        self._lattice_max_length = max_length
+        return lattice
+
+    def _closed(self, patterns):
+        # an itemset is closed if no immediate superset has the same support
+        not_closed = set()
+        for pattern, support in patterns.items():
+            if len(pattern) < 2:
+                continue
+            for item in pattern:
+                subset = pattern - frozenset([item])
+                if patterns.get(subset) == support:
+                    not_closed.add(subset)
+        return dict((p, s) for p, s in patterns.items() if p not in not_closed)
+
+    def frequent_patterns(self, min_support, max_patterns=None, min_length=1, max_length=None,
+                          closed=True):
+        '''Frequent (closed) patterns, most frequent first:
+
+        Parameters
+        ----------
+        min_support: int (absolute count) or float in (0,1) range (fraction of transactions)
+            The minimum support of the patterns.
+        max_patterns: int, optional
+            Return only the max_patterns most frequent patterns.
+        min_length, max_length: int, optional
+            Bounds of the pattern lengths.
+        closed: bool, optional
+            Return closed itemsets only (as `gl.frequent_pattern_mining` does).
+
+        Returns
+        -------
+        patterns: DataFrame
+            Columns 'pattern' (list of items), 'support' and 'length'.
+        '''
+        min_support = self._absolute_support(min_support)
+        lattice = self.mine(min_support, max_length)
+        patterns = dict((p, s) for p, s in lattice.items()
+                        if s >= min_support and (max_length is None or len(p) <= max_length))
+        if closed:
+            patterns = self._closed(patterns)
+
+        items = self.encoder.items
+        rows = [(sorted(items[i] for i in p), s, len(p)) for p, s in patterns.items()
+                if len(p) >= min_length]
+        result = pd.DataFrame(rows, columns=['pattern', 'support', 'length'])
+        result = result.sort_values(['support', 'length'], ascending=[False, False])
+        if max_patterns is not None:
+            result = result.head(max_patterns)
+        return result.reset_index(drop=True)
+
+    def _patterns_list(self, patterns):
+        if isinstance(patterns, pd.DataFrame):
+            return list(patterns['pattern'])
+        return list(patterns)
+
+    def extract_features(self, patterns, data=None):
+        '''Pattern features of every transaction (cf. `model.extract_features(train)`):
+
+        Parameters
+        ----------
+        patterns: DataFrame (output of `frequent_patterns`) or list of lists of items
+        data: SFrame or DataFrame, optional
+            Basket data to extract the features of (default: the mined data).
+
+        Returns
+        -------
+        (transactions, features): tuple
+            The transaction keys and the sparse (n_transactions, n_patterns) 0/1 matrix.
+        '''
+        encoder = self.encoder
+        if data is not None:
+            encoder = TransactionEncoder(self.encoder.item_column, self.encoder.features,
+                                         items=self.encoder.items).fit(data)
+        pattern_items = pattern_item_matrix(self._patterns_list(patterns), encoder.items)
+        features = pattern_containment(encoder.transaction_item_matrix(), pattern_items)
+        return encoder.transactions, features
+
+    def employee_space(self, patterns, data, employee_column='EmpId', dense=True):
+        '''Per-employee sums of the transaction pattern features, i.e. the k-means input:
+
+        Replaces the SFrame pipeline `emps.join(features).groupby('EmpId',
+        agg.SUM('extracted_features'))` by a sparse segment-sum; one employee
+        (any, as `agg.SELECT_ONE`) is assigned to every transaction.
+
+        Parameters
+        ----------
+        patterns: DataFrame (output of `frequent_patterns`) or list of lists of items
+        data: SFrame or DataFrame
+            Basket data holding the employee column (e.g. the bakery training set).
+        employee_column: string
+        dense: bool
+            Return a dense numpy array (else a sparse csr matrix).
+
+        Returns
+        -------
+        (employees, all_features): tuple
+            The employee ids and their (n_employees, n_patterns) pattern counts.
+        '''
+        data = _to_dataframe(data)
+        encoder = TransactionEncoder(self.encoder.item_column, self.encoder.features,
+                                     items=self.encoder.items).fit(data)
+        pattern_items = pattern_item_matrix(self._patterns_list(patterns), encoder.items)
+        features = pattern_containment(encoder.transaction_item_matrix(), pattern_items)
+
+        subset = data.dropna(subset=[encoder.item_column] + encoder.features)
+        employee_codes, employees = pd.factorize(subset[employee_column])
+        transaction_employee = np.zeros(encoder.num_transactions, dtype=np.int64)
+        tids, _ = encoder.codes()
+        transaction_employee[tids] = employee_codes
+
+        all_features = segment_sum(transaction_employee, features, n_segments=len(employees))
+        if dense:
+            all_features = all_features.toarray()
+        return list(employees), all_features
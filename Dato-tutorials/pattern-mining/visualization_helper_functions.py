@@ -1,5 +1,12 @@
 # libraries required
-import graphlab.aggregate as agg
+from __future__ import print_function
+import os
+import sys
+# the table backends are shared by the Dato tutorials (Dato-tutorials/backend_helper_functions.py)
+_DATO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _DATO_DIR not in sys.path:
+    sys.path.append(_DATO_DIR)
+from backend_helper_functions import get_backend, COUNT
 from matplotlib import pyplot as plt
 import seaborn as sns
 
@@ -9,7 +16,7 @@ def item_freq_plot(data_sf, item_column, hue=None, topk=None, pct_threshold=None
     
     Parameters
     ----------
-    data_sf: SFrame
+    data_sf: SFrame, DataFrame or Arrow Table
         SFrame for plotting. If x and y are absent, this is interpreted as wide-form. 
         Otherwise it is expected to be long-form.
     item_column: string
@@ -36,47 +43,49 @@ def item_freq_plot(data_sf, item_column, hue=None, topk=None, pct_threshold=None
     '''    
     # set seaborn style
     sns.set(style=seaborn_style)
+    backend = get_backend(data_sf)
     
     # compute the item counts: (1) apply groupby count operation,
     # (2) check whether a nested grouping exist or not
     if hue is not None:
-        item_counts = data_sf.groupby([item_column,hue], agg.COUNT())
-        hue_order = list(data_sf[hue].unique())
+        item_counts = backend.groupby(data_sf, [item_column,hue], COUNT())
+        hue_order = list(backend.values(backend.unique(backend.column(data_sf, hue))))
         hue_length = len(hue_order)
     else:
-        item_counts = data_sf.groupby(item_column, agg.COUNT())
+        item_counts = backend.groupby(data_sf, item_column, COUNT())
         hue_order=None
         hue_length=1
     # compute frequencies
-    pcts = (item_counts['Count'] / float(item_counts['Count'].sum())) * 100
-    item_counts['Percent'] = pcts
+    counts = backend.values(backend.column(item_counts, 'Count')).astype(float)
+    pcts = (counts / counts.sum()) * 100
+    item_counts = backend.add_column(item_counts, 'Percent', pcts)
     
     # apply a percentage threshold if any
-    if((pct_threshold is not None) & (pct_threshold < 100)):
-        item_counts = item_counts[item_counts['Percent'] >= pct_threshold]
-    elif((pct_threshold is not None) & (pct_threshold >=1)):
-        print 'The frequency threshold was unacceptably high.',\
-        'and have been removed from consideration.',\
-        'If you want to use this flag please choose a value lower than one.'
+    if((pct_threshold is not None) and (pct_threshold < 100)):
+        item_counts = backend.filter_rows(item_counts, pcts >= pct_threshold)
+    elif((pct_threshold is not None) and (pct_threshold >=1)):
+        print('The frequency threshold was unacceptably high.',
+              'and have been removed from consideration.',
+              'If you want to use this flag please choose a value lower than one.')
     
     # print the number of remaining item counts
-    print 'Number of Unique Items: %d' % len(item_counts)
+    print('Number of Unique Items: %d' % backend.num_rows(item_counts))
     
     # determine the ysize per item 
     ysize_per_item = 0.5 * hue_length
     
     # apply topk/sort operations
-    if((topk is not None) & (topk < len(item_counts))):
-        item_counts = item_counts.topk('Percent', k=topk, reverse=reverse)
+    if((topk is not None) and (topk < backend.num_rows(item_counts))):
+        item_counts = backend.topk(item_counts, 'Percent', k=topk, reverse=reverse)
         ysize = ysize_per_item * topk
-        print 'Number of Most Frequent Items, Visualized: %d' % topk
+        print('Number of Most Frequent Items, Visualized: %d' % topk)
     else:
-        item_counts = item_counts.sort('Percent', ascending=False)
-        ysize = ysize_per_item * len(item_counts)
-        print 'Number of Most Frequent Items, Visualized: %d' % len(item_counts)
+        item_counts = backend.sort(item_counts, 'Percent', ascending=False)
+        ysize = ysize_per_item * backend.num_rows(item_counts)
+        print('Number of Most Frequent Items, Visualized: %d' % backend.num_rows(item_counts))
            
     # transform the item_counts SFrame into a Pandas DataFrame
-    item_counts_df = item_counts.to_dataframe()
+    item_counts_df = backend.to_pandas(item_counts)
     
     # initialize the matplotlib figure
     ax = plt.figure(figsize=(7, ysize))
@@ -88,7 +97,7 @@ def item_freq_plot(data_sf, item_column, hue=None, topk=None, pct_threshold=None
     
     # add informative axis labels
     # make final plot adjustments
-    xmax = max(item_counts['Percent'])    
+    xmax = item_counts_df['Percent'].max()    
     ax.set(xlim=(0, xmax),
            ylabel= item_column,
            xlabel='Most Frequent Items\n(% of total occurences)')
@@ -105,7 +114,7 @@ def segments_countplot(data_sf, x=None, y=None, hue=None,
     
     Parameters
     ----------
-    data_sf: SFrame
+    data_sf: SFrame, DataFrame or Arrow Table
         SFrame for plotting. If x and y are absent, this is interpreted as wide-form.
         Otherwise it is expected to be long-form.
     x, y, hue: seaborn countplot names of variables in data or vector data, optional
@@ -137,7 +146,7 @@ def segments_countplot(data_sf, x=None, y=None, hue=None,
     plt.figure(figsize=figsize_tuple)
     
     # transform the SFrame into a Pandas DataFrame
-    data_df = data_sf.to_dataframe()
+    data_df = get_backend(data_sf).to_pandas(data_sf)
 
     # plot the segments counts
     ax = sns.countplot(x=x, y=y, hue=hue, data=data_df, order=order, hue_order=hue_order,
@@ -157,7 +166,7 @@ def univariate_summary_statistics_plot(data_sf, attribs_list, nsubplots_inrow=3,
     
     Parameters
     ----------
-    data_sf: SFrame 
+    data_sf: SFrame, DataFrame or Arrow Table
         SFrame of interest
     attribs_list: list of strings
         Provides the list of SFrame attributes the univariate plots of which we want to draw
@@ -174,13 +183,8 @@ def univariate_summary_statistics_plot(data_sf, attribs_list, nsubplots_inrow=3,
         Color for all of the elements, or seed for light_palette() 
         when using hue nesting in seaborn.barplot().
     '''
-    import graphlab as gl
-    
     # transform the SFrame into a Pandas DataFrame
-    if isinstance(data_sf, gl.data_structures.sframe.SFrame):
-        data_df = data_sf.to_dataframe()
-    else:
-        data_df = data_sf
+    data_df = get_backend(data_sf).to_pandas(data_sf)
         
     # define the plotting style
     sns.set(style=seaborn_style)
@@ -199,14 +203,14 @@ def univariate_summary_statistics_plot(data_sf, attribs_list, nsubplots_inrow=3,
     xattribs_list =list([attrib for\
                          attrib in attribs_list_before if(attrib not in attribs_list)])
     if(len(xattribs_list) !=0):
-        print 'These attributes are not appropriate for a univariate summary statistics,',\
-        'and have been removed from consideration:'
-        print xattribs_list, '\n'
+        print('These attributes are not appropriate for a univariate summary statistics,',
+              'and have been removed from consideration:')
+        print(xattribs_list, '\n')
     
     # initialize the matplotlib figure
     nattribs = len(attribs_list)
     # compute the sublots nrows
-    nrows = ((nattribs-1)/nsubplots_inrow) + 1
+    nrows = ((nattribs-1)//nsubplots_inrow) + 1
     # compute the subplots ncols
     if(nattribs >= nsubplots_inrow):
         ncols = nsubplots_inrow
@@ -238,16 +242,16 @@ def univariate_summary_statistics_plot(data_sf, attribs_list, nsubplots_inrow=3,
     # final plot adjustments
     sns.despine(left=True, bottom=True)
     if subplots_wspace < 0.2:
-        print 'Subplots White Space was less than default, 0.2.'
-        print 'The default vaule is going to be used: \'subplots_wspace=0.2\''
+        print('Subplots White Space was less than default, 0.2.')
+        print('The default vaule is going to be used: \'subplots_wspace=0.2\'')
         subplots_wspace =0.2
     plt.subplots_adjust(wspace=subplots_wspace)
     plt.show()
     
     # print the corresponding summary statistic
-    print '\n', 'Univariate Summary Statistics:\n'
+    print('\n', 'Univariate Summary Statistics:\n')
     summary = data_df[attribs_list].describe(include='all')
-    print summary
+    print(summary)
     
 
 def plot_time_series(timestamp, values, title, **kwargs):
@@ -1,54 +1,66 @@
 # helper function prepared by Chris DuBois, Staff Data Scientist at Dato
 
-import graphlab as gl
-from graphlab.toolkits.text_analytics import trim_rare_words, split_by_sentence, extract_parts_of_speech, stopwords, PartOfSpeech
+try:
+    import graphlab as gl
+    from graphlab.toolkits.text_analytics import trim_rare_words, split_by_sentence, extract_parts_of_speech, stopwords, PartOfSpeech
+except ImportError:
+    gl = None
+import os
+import sys
+# the table backends are shared by the Dato tutorials (Dato-tutorials/backend_helper_functions.py)
+_DATO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _DATO_DIR not in sys.path:
+    sys.path.append(_DATO_DIR)
+from backend_helper_functions import get_backend, COUNT, AVG, CONCAT
 from ipywidgets import widgets
 from IPython.display import display, HTML, clear_output
 
 def search(reviews, query='monitor'):
+    # GraphLab only (the search toolkit has no pandas/Arrow counterpart)
     m = gl._internal.search.create(reviews[['name']].unique().dropna())
     monitors = m.query(query)['name']
     reviews = reviews.filter_by(monitors, 'name')
     return reviews
 
 def get_comparisons(a, b, item_a, item_b, aspects):
+    # a, b: SFrames, DataFrames or Arrow Tables (of the same backend)
+    backend = get_backend(a)
 
     # Compute the number of sentences
-    a2 = a.groupby('tag', {item_a: gl.aggregate.COUNT})
-    b2 = b.groupby('tag', {item_b: gl.aggregate.COUNT})
-    counts = a2.join(b2)
+    a2 = backend.groupby(a, 'tag', {item_a: COUNT})
+    b2 = backend.groupby(b, 'tag', {item_b: COUNT})
+    counts = backend.join(a2, b2)
 
     # Compute the mean sentiment
-    a2 = a.groupby('tag', {item_a: gl.aggregate.AVG('sentiment')})
-    b2 = b.groupby('tag', {item_b: gl.aggregate.AVG('sentiment')})
-    sentiment = a2.join(b2)
+    a2 = backend.groupby(a, 'tag', {item_a: AVG('sentiment')})
+    b2 = backend.groupby(b, 'tag', {item_b: AVG('sentiment')})
+    sentiment = backend.join(a2, b2)
 
     # Get a list of adjectives
     # stack rows modified by theod for GLC v1.9 compatibility
-    a2 = a.select_columns(['tag', 'adjectives'])\
-        .stack('adjectives', ['ADJ','adjectives'])\
-        .stack('adjectives', ['adjective','count'])\
-        .filter_by(aspects, 'adjective', exclude=True)\
-        .groupby(['tag'], {item_a: gl.aggregate.CONCAT('adjective')})
-    b2 = b.select_columns(['tag', 'adjectives'])\
-        .stack('adjectives', ['ADJ','adjectives'])\
-        .stack('adjectives', ['adjective','count'])\
-        .filter_by(aspects, 'adjective', exclude=True)\
-        .groupby(['tag'], {item_b: gl.aggregate.CONCAT('adjective')})
-    adjectives = a2.join(b2)
+    def tag_adjectives(data, item):
+        data = backend.select_columns(data, ['tag', 'adjectives'])
+        data = backend.stack(data, 'adjectives', ['ADJ','adjectives'])
+        data = backend.stack(data, 'adjectives', ['adjective','count'])
+        data = backend.filter_by(data, aspects, 'adjective', exclude=True)
+        return backend.groupby(data, ['tag'], {item: CONCAT('adjective')})
+    adjectives = backend.join(tag_adjectives(a, item_a), tag_adjectives(b, item_b))
 
     return counts, sentiment, adjectives
 
 def get_dropdown(reviews):
-    counts = reviews.groupby('name', gl.aggregate.COUNT).sort('Count', ascending=False)
-    counts['display_name'] = counts.apply(lambda x: '{} ({})'.format(x['name'], x['Count']))
-    counts = counts.head(500)
+    backend = get_backend(reviews)
+    counts = backend.sort(backend.groupby(reviews, 'name', COUNT), 'Count', ascending=False)
+    counts = backend.head(counts, 500)
+    counts = backend.add_column(counts, 'display_name',
+                                backend.apply(counts, lambda x: '{} ({})'.format(x['name'], x['Count'])))
 
     from collections import OrderedDict
-    items = OrderedDict(zip(counts['display_name'], counts['name']))
+    items = OrderedDict(zip(backend.values(backend.column(counts, 'display_name')),
+                            backend.values(backend.column(counts, 'name'))))
     item_dropdown = widgets.Dropdown()
     item_dropdown.options = items
-    item_dropdown.value = items.values()[1]
+    item_dropdown.value = list(items.values())[1]
     return item_dropdown
 
 def get_extreme_sentences(tagged, k=100):
@@ -59,25 +71,23 @@ def get_extreme_sentences(tagged, k=100):
             sentence = sentence.replace(tag, html_tag)
         return sentence
 
-    good = tagged.topk('sentiment', k=k, reverse=False)
-    # row added by theod for GLC v1.9 compatibility
-    good = good.select_columns(['sentence','adjectives', 'tag'])\
-        .stack('adjectives',['ADJ','adjectives'])\
-        .stack('adjectives', ['adjective','count'])
-    # row added by theod to exclude 'None' values in the 'adjectives' column
-    good = good.dropna(columns='adjective')
-    good['highlighted']  = good.apply(lambda x: highlight(x['sentence'], [x['adjective']], 'green'))
-    good['highlighted']  = good.apply(lambda x: highlight(x['highlighted'], [x['tag']], 'green'))
+    def extreme_sentences(reverse, color):
+        sentences = backend.topk(tagged, 'sentiment', k=k, reverse=reverse)
+        # row added by theod for GLC v1.9 compatibility
+        sentences = backend.select_columns(sentences, ['sentence','adjectives', 'tag'])
+        sentences = backend.stack(sentences, 'adjectives', ['ADJ','adjectives'])
+        sentences = backend.stack(sentences, 'adjectives', ['adjective','count'])
+        # row added by theod to exclude 'None' values in the 'adjectives' column
+        sentences = backend.dropna(sentences, columns='adjective')
+        sentences = backend.add_column(sentences, 'highlighted', backend.apply(
+            sentences, lambda x: highlight(x['sentence'], [x['adjective']], color)))
+        sentences = backend.add_column(sentences, 'highlighted', backend.apply(
+            sentences, lambda x: highlight(x['highlighted'], [x['tag']], 'green')))
+        return sentences
 
-    bad = tagged.topk('sentiment', k=k, reverse=True)
-    # row added by theod for GLC v1.9 compatibility
-    bad = bad.select_columns(['sentence','adjectives', 'tag'])\
-        .stack('adjectives',['ADJ','adjectives'])\
-        .stack('adjectives', ['adjective','count'])
-    # row added by theod to exclude 'None' values in the 'adjectives' column
-    bad = bad.dropna(columns='adjective')
-    bad['highlighted']  = bad.apply(lambda x: highlight(x['sentence'], [x['adjective']], 'red'))
-    bad['highlighted']  = bad.apply(lambda x: highlight(x['highlighted'], [x['tag']], 'green'))
+    backend = get_backend(tagged)
+    good = extreme_sentences(False, 'green')
+    bad = extreme_sentences(True, 'red')
 
     return good, bad
 
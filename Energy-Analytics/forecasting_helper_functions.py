@@ -0,0 +1,250 @@
+# helper classes for parallel, cached Prophet forecasting of many (metered sites) consumption series
+from __future__ import print_function
+import os
+import json
+import hashlib
+import multiprocessing
+from collections import OrderedDict
+from time import time
+
+import numpy as np
+import pandas as pd
+
+
+def prophet_factory(**prophet_kwargs):
+    '''Default model factory: a (fb)prophet `Prophet` with the given arguments.'''
+    try:
+        from fbprophet import Prophet
+    except ImportError:
+        from prophet import Prophet
+    return Prophet(**prophet_kwargs)
+
+
+def _model_to_json(model):
+    try:
+        from fbprophet.serialize import model_to_json
+    except ImportError:
+        try:
+            from prophet.serialize import model_to_json
+        except ImportError:
+            return None
+    return model_to_json(model)
+
+
+def data_hash(ds, y, config_key=''):
+    '''Hash of a series (and of the forecasting configuration), keying its cached model.'''
+    digest = hashlib.sha1(np.asarray(ds, dtype='datetime64[ns]').view(np.int64).tobytes())
+    digest.update(np.asarray(y, dtype=np.float64).tobytes())
+    digest.update(config_key.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# worker state, shared with the pool processes once through their initializer
+_WORKER = {}
+
+
+def _init_worker(config):
+    _WORKER.update(config)
+
+
+def _cache_paths(series_id, key):
+    stem = os.path.join(_WORKER['cache_dir'], '%s-%s' % (series_id, key))
+    return stem + '.npz', stem + '.model.json'
+
+
+def _forecast_series(task):
+    # fit (or reuse the cached forecast of) one series
+    series_id, ds, y = task
+    key = data_hash(ds, y, _WORKER['config_key'])
+    report = OrderedDict([('series_id', series_id), ('num_obs', len(y)), ('data_hash', key),
+                          ('cached', False), ('fit_time', np.nan), ('predict_time', np.nan), ('error', None)])
+
+    if _WORKER['cache_dir'] is not None:
+        forecast_path, model_path = _cache_paths(series_id, key)
+        if os.path.exists(forecast_path):
+            with np.load(forecast_path) as cached:
+                forecast = dict((column, cached[column]) for column in cached.files)
+            report['cached'] = True
+            return report, forecast
+
+    history = pd.DataFrame({'ds': pd.DatetimeIndex(ds), 'y': y})
+    regressors, holidays = _WORKER['regressors'], _WORKER['holidays']
+    try:
+        kwargs = dict(_WORKER['prophet_kwargs'])
+        if holidays is not None:
+            kwargs['holidays'] = holidays
+        model = _WORKER['model_factory'](**kwargs)
+        if regressors is not None:
+            for column in regressors.columns:
+                model.add_regressor(column)
+            history = history.join(regressors, on='ds')
+
+        t0 = time()
+        model.fit(history)
+        report['fit_time'] = time() - t0
+
+        future = model.make_future_dataframe(periods=_WORKER['horizon'], freq=_WORKER['freq'],
+                                             include_history=_WORKER['include_history'])
+        if regressors is not None:
+            future = future.join(regressors, on='ds')
+        t0 = time()
+        predictions = model.predict(future)
+        report['predict_time'] = time() - t0
+    except Exception as e:
+        report['error'] = '%s: %s' % (e.__class__.__name__, e)
+        return report, None
+
+    forecast = {'ds': predictions['ds'].values.astype('datetime64[ns]')}
+    for column in _WORKER['output_columns']:
+        forecast[column] = predictions[column].values.astype(np.float32)
+
+    if _WORKER['cache_dir'] is not None:
+        np.savez(forecast_path, **forecast)
+        model_json = _model_to_json(model)
+        if model_json is not None:
+            with open(model_path, 'w') as f:
+                f.write(model_json)
+    return report, forecast
+
+
+class ForecastRunner(object):
+    '''Parallel runner fitting one Prophet model per series (e.g. per metered site):
+
+    The series are fitted on a process pool whose workers are recycled after
+    `max_tasks_per_worker` series, bounding the memory a worker can accumulate.
+    The holiday and regressor (e.g. temperature, traffic) frames are shared with
+    the workers once, through the pool initializer. Every fitted model and its
+    forecast are cached on disk, keyed by the series id and the hash of its data
+    (and of the runner configuration), so unchanged series are skipped by later
+    runs. The forecasts of all the series are gathered in one columnar output.
+
+    Usage
+    -----
+    runner = ForecastRunner(horizon=59, regressors=daily_temp_df, cache_dir='./prophet_cache')
+    forecasts, report = runner.run(consumpt_daily_df, id_column='signal_id',
+                                   output='forecasts.parquet')
+
+    Parameters
+    ----------
+    horizon: int
+        The number of periods to forecast.
+    freq: string
+        The frequency of the series.
+    regressors: DataFrame, optional
+        The extra regressors, indexed by date ('ds'), covering the history and the horizon.
+    holidays: DataFrame, optional
+        The Prophet holidays frame ('holiday', 'ds', ...).
+    cache_dir: string, optional
+        The directory of the cached models and forecasts (None disables the caching).
+    n_jobs: int, optional
+        The number of worker processes (default: number of CPUs, 1 runs serially).
+    max_tasks_per_worker: int, optional
+        The number of series a worker fits before being replaced.
+    include_history: boolean
+        Also output the in-sample predictions.
+    output_columns: list of strings
+        The prediction columns to output.
+    model_factory: callable, optional
+        Builds a model from the Prophet keyword arguments (default: `prophet_factory`).
+    prophet_kwargs: keyword arguments
+        The Prophet arguments, e.g. weekly_seasonality=True.
+    '''
+    def __init__(self, horizon=59, freq='D', regressors=None, holidays=None, cache_dir=None, n_jobs=None,
+                 max_tasks_per_worker=50, include_history=False,
+                 output_columns=('yhat', 'yhat_lower', 'yhat_upper'), model_factory=None, **prophet_kwargs):
+        self.horizon = horizon
+        self.freq = freq
+        self.regressors = regressors
+        self.holidays = holidays
+        self.cache_dir = cache_dir
+        self.n_jobs = multiprocessing.cpu_count() if n_jobs is None else n_jobs
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.include_history = include_history
+        self.output_columns = list(output_columns)
+        self.model_factory = prophet_factory if model_factory is None else model_factory
+        self.prophet_kwargs = prophet_kwargs
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def _config(self):
+        shared = [self.horizon, self.freq, self.include_history, self.output_columns,
+                  sorted(self.prophet_kwargs.items())]
+        for frame in (self.regressors, self.holidays):
+            shared.append(None if frame is None else
+                          hashlib.sha1(pd.util.hash_pandas_object(frame).values.tobytes()).hexdigest())
+        return {'horizon': self.horizon, 'freq': self.freq, 'regressors': self.regressors,
+                'holidays': self.holidays, 'cache_dir': self.cache_dir,
+                'include_history': self.include_history, 'output_columns': self.output_columns,
+                'model_factory': self.model_factory, 'prophet_kwargs': self.prophet_kwargs,
+                'config_key': json.dumps(shared, default=str)}
+
+    @staticmethod
+    def _tasks(series_df, id_column, ds_column, y_column):
+        # split all the series at once (sort by id and date, then cut at the id changes)
+        series_df = series_df.sort_values([id_column, ds_column], kind='mergesort')
+        ids = series_df[id_column].values
+        ds = series_df[ds_column].values.astype('datetime64[ns]')
+        y = series_df[y_column].values.astype(np.float64)
+        starts = np.flatnonzero(np.concatenate([[True], ids[1:] != ids[:-1]]))
+        stops = np.append(starts[1:], len(ids))
+        return [(ids[start], ds[start:stop], y[start:stop]) for start, stop in zip(starts, stops)]
+
+    def run(self, series_df, id_column='signal_id', ds_column='ds', y_column='y', output=None):
+        '''Forecast all the series:
+
+        Parameters
+        ----------
+        series_df: DataFrame
+            The (long format) series: one row per (series id, date).
+        output: string, optional
+            The file of the forecasts ('.parquet', or else a '.npz' of the columns).
+
+        Returns
+        -------
+        (forecasts, report): tuple of DataFrames
+            The forecasts of all the series ('series_id', 'ds' and the output columns),
+            and one row per series with its fit/predict latency (in seconds), whether
+            it was skipped (cached), and its error if any.
+        '''
+        tasks = self._tasks(series_df, id_column, ds_column, y_column)
+        config = self._config()
+        if self.n_jobs > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=(config,),
+                                        maxtasksperchild=self.max_tasks_per_worker)
+            try:
+                outputs = list(pool.imap(_forecast_series, tasks, chunksize=1))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            _init_worker(config)
+            outputs = [_forecast_series(task) for task in tasks]
+
+        reports, columns = [], OrderedDict((column, []) for column in ['series_id', 'ds'] + self.output_columns)
+        for report, forecast in outputs:
+            reports.append(report)
+            if forecast is None:
+                continue
+            columns['series_id'].append(np.repeat(np.asarray([report['series_id']]), len(forecast['ds'])))
+            for column in columns:
+                if column != 'series_id':
+                    columns[column].append(forecast[column])
+        forecasts = pd.DataFrame(OrderedDict((column, np.concatenate(chunks) if chunks else [])
+                                             for column, chunks in columns.items()))
+        if output is not None:
+            save_forecasts(forecasts, output)
+        return forecasts, pd.DataFrame(reports)
+
+
+def save_forecasts(forecasts, path):
+    if path.endswith('.parquet'):
+        forecasts.to_parquet(path, index=False)
+    else:
+        np.savez(path, **dict((column, forecasts[column].values) for column in forecasts.columns))
+
+
+def load_forecasts(path):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    with np.load(path, allow_pickle=True) as columns:
+        return pd.DataFrame(OrderedDict((column, columns[column]) for column in columns.files))
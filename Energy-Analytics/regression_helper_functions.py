@@ -0,0 +1,297 @@
+# helper classes for batch fitting of (nested) OLS model families sharing one design matrix
+from __future__ import print_function
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import patsy
+from scipy import linalg, stats
+
+
+def add_polynomial_terms(data_df, column, max_order=3, names=None, detrend=True):
+    '''Add the Vandermonde (powers) terms of an attribute to a DataFrame:
+
+    As in the Energy notebook, `np.vander(rtemp_demean, N=max_order+1)` of the
+    (linearly detrended) temperature.
+
+    Parameters
+    ----------
+    data_df: DataFrame
+        e.g. ragg, the daily resampled consumption.
+    column: string
+        e.g. 'Temp'
+    max_order: int
+    names: list of strings, optional
+        The names of the powers, from max_order down to 0 (default:
+        ['<column>_demean<power>', ..., 'intercept']).
+    detrend: boolean
+        Remove the linear trend of the attribute first (as `sm.tsa.detrend(x, order=1)`).
+
+    Returns
+    -------
+    data_df: DataFrame
+        A copy of the input, with the added terms.
+    '''
+    values = data_df[column].values.astype(np.float64)
+    if detrend:
+        trend = np.arange(len(values), dtype=np.float64)
+        values = values - np.polyval(np.polyfit(trend, values, 1), trend)
+    if names is None:
+        names = ['%s_demean%d' % (column, power) for power in range(max_order, 0, -1)] + ['intercept']
+    return data_df.assign(**dict(zip(names, np.vander(values, N=max_order + 1).T)))
+
+
+class OLSFit(object):
+    '''The statistics of an OLS fit (named as the statsmodels `RegressionResults` attributes).'''
+
+    def __init__(self, label, formula, params, cov_params, ssr, centered_tss, nobs, has_intercept):
+        self.label = label
+        self.formula = formula
+        self.params = params
+        self.nobs = nobs
+        k = len(params)
+        self.df_resid = nobs - k
+        self.df_model = k - 1 if has_intercept else k
+        self.ssr = ssr
+        self.scale = ssr / self.df_resid
+        self.cov_params = cov_params * self.scale
+        self.bse = pd.Series(np.sqrt(np.diag(self.cov_params)), index=params.index)
+        self.tvalues = params / self.bse
+        self.pvalues = pd.Series(2 * stats.t.sf(np.abs(self.tvalues), self.df_resid), index=params.index)
+        self.rsquared = 1. - ssr / centered_tss
+        self.rsquared_adj = 1. - (nobs - has_intercept) / float(self.df_resid) * (1. - self.rsquared)
+        self.llf = -nobs / 2. * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1.)
+        self.aic = -2 * self.llf + 2 * k
+        self.bic = -2 * self.llf + np.log(nobs) * k
+        ess = centered_tss - ssr
+        self.fvalue = (ess / self.df_model) / self.scale if self.df_model > 0 else np.nan
+        self.f_pvalue = stats.f.sf(self.fvalue, self.df_model, self.df_resid) if self.df_model > 0 else np.nan
+
+    def conf_int(self, alpha=0.05):
+        q = stats.t.ppf(1 - alpha / 2., self.df_resid)
+        return pd.DataFrame({0: self.params - q * self.bse, 1: self.params + q * self.bse})
+
+    def summary2(self):
+        '''The coefficients table (as in statsmodels `summary2`).'''
+        conf_int = self.conf_int()
+        return pd.DataFrame(OrderedDict([('Coef.', self.params), ('Std.Err.', self.bse),
+                                         ('t', self.tvalues), ('P>|t|', self.pvalues),
+                                         ('[0.025', conf_int[0]), ('0.975]', conf_int[1])]))
+
+
+class OLSModelFamily(object):
+    '''Batch fitter of a family of OLS formula models over the same data:
+
+    The union of the terms of all the models (e.g. the Vandermonde temperature
+    terms, the C(Traffic) dummies and their interactions) is turned into one
+    design matrix by patsy, once, and factorized once by a (pivot-free) QR
+    decomposition X = QR. Every model is a subset S of the union columns, whose
+    least squares problem reduces to the small (num_terms x |S|) one of R[:, S]
+    against Q'y, so fitting a model never touches the n observations again. Only
+    the models added since the last `fit` are fitted. When new models bring new
+    terms, only their columns are orthogonalized against Q to extend the QR
+    factorization, and the previous fits are kept (unless the new attributes
+    drop other rows with missing values, in which case all the models are refitted).
+
+    The models are expected to be hierarchical (as in the notebook), so that the
+    union coding of their categorical terms is the one patsy uses for each model
+    alone; rows with missing values in any of the union attributes are dropped.
+
+    Usage
+    -----
+    family = OLSModelFamily(ragg1)
+    family.add('fit1', 'kWh ~ rtemp_demean')
+    family.add('fitSq2', 'kWh ~ rtemp_demean + rtemp_demeanSq + C(Traffic)')
+    family.fit()
+    family.summary()
+
+    Parameters
+    ----------
+    data_df: DataFrame
+    '''
+    def __init__(self, data_df):
+        self.data_df = data_df
+        self.formulas = OrderedDict()
+        self.fits = OrderedDict()
+        self._terms = []
+        self._response = None
+        self._design = None
+        self._Q = None
+
+    def add(self, label, formula):
+        self.formulas[label] = formula
+        self.fits.pop(label, None)
+        return self
+
+    def add_models(self, regr_models):
+        '''Add a list of (label, formula) pairs.'''
+        for label, formula in regr_models:
+            self.add(label, formula)
+        return self
+
+    def _model_desc(self, formula):
+        desc = patsy.ModelDesc.from_formula(formula)
+        response = tuple(term.name() for term in desc.lhs_termlist)
+        if self._response is None:
+            self._response = response
+        elif response != self._response:
+            raise ValueError('All the models of the family should share the same response.')
+        return desc
+
+    def _build(self):
+        # union of the terms, by increasing degree (patsy's own ordering)
+        descs = [self._model_desc(formula) for formula in self.formulas.values()]
+        terms = []
+        for desc in descs:
+            terms.extend(term for term in desc.rhs_termlist if term not in terms)
+        terms.sort(key=lambda term: len(term.factors))
+        new_terms = [term for term in terms if term not in self._terms]
+        if self._design is not None and not new_terms:
+            return
+        lhs = descs[0].lhs_termlist
+        y, X = patsy.dmatrices(patsy.ModelDesc(lhs, terms), self.data_df, return_type='dataframe')
+        term_slices = X.design_info.term_slices
+        # the patsy order of the terms (that of the model columns)
+        self._term_order = dict((term, term_slices[term].start) for term in terms)
+
+        if self._design is not None and y.index.equals(self._index):
+            # same rows: append the columns of the new terms to the QR factorization
+            # (block Gram-Schmidt against Q, reorthogonalized once), keeping the previous fits
+            R, qty, yty, ysum = self._design
+            new_columns = np.concatenate([np.arange(term_slices[term].start, term_slices[term].stop)
+                                          for term in new_terms])
+            X_new = X.values[:, new_columns]
+            R12 = self._Q.T.dot(X_new)
+            residual = X_new - self._Q.dot(R12)
+            correction = self._Q.T.dot(residual)
+            R12 += correction
+            residual -= self._Q.dot(correction)
+            Q2, R22 = linalg.qr(residual, mode='economic')
+            p, k = R.shape[1], len(new_columns)
+            R = np.block([[R, R12], [np.zeros((k, p)), R22]])
+            self._design = (R, np.concatenate([qty, Q2.T.dot(y.values[:, 0])]), yty, ysum)
+            self._Q = np.hstack([self._Q, Q2])
+            offset = p
+            for term in new_terms:
+                width = term_slices[term].stop - term_slices[term].start
+                self._term_columns[term] = np.arange(offset, offset + width)
+                offset += width
+            self._columns = self._columns.append(X.columns[new_columns])
+            self._terms = terms
+            return
+
+        self._terms = terms
+        self._columns = X.columns
+        self._term_columns = dict((term, np.arange(term_slices[term].start, term_slices[term].stop))
+                                  for term in terms)
+        self._index = y.index
+        self._nobs = len(y)
+        y = y.values[:, 0]
+        self._Q, R = linalg.qr(X.values, mode='economic')
+        self._design = (R, self._Q.T.dot(y), y.dot(y), y.sum())
+        # new design rows: every model is refitted
+        self.fits.clear()
+
+    def _fit_model(self, label, formula):
+        R, qty, yty, ysum = self._design
+        desc = patsy.ModelDesc.from_formula(formula)
+        model_terms = sorted(desc.rhs_termlist, key=lambda term: self._term_order[term])
+        columns = np.concatenate([self._term_columns[term] for term in model_terms])
+        # min ||y - X_S b|| = min ||Q'y - R_S b|| (+ the constant ||y||^2 - ||Q'y||^2)
+        Q_S, R_S = linalg.qr(R[:, columns], mode='economic')
+        z = Q_S.T.dot(qty)
+        params = linalg.solve_triangular(R_S, z)
+        ssr = max(yty - z.dot(z), 0.)
+        R_S_inv = linalg.solve_triangular(R_S, np.eye(len(columns)))
+        has_intercept = any(len(term.factors) == 0 for term in desc.rhs_termlist)
+        tss = yty - ysum ** 2 / self._nobs if has_intercept else yty
+        names = self._columns[columns]
+        return OLSFit(label, formula, pd.Series(params, index=names),
+                      pd.DataFrame(R_S_inv.dot(R_S_inv.T), index=names, columns=names),
+                      ssr, tss, self._nobs, has_intercept)
+
+    def fit(self):
+        '''Fit the models added since the last call:
+
+        Returns
+        -------
+        fits: OrderedDict
+            label -> OLSFit
+        '''
+        self._build()
+        for label, formula in self.formulas.items():
+            if label not in self.fits:
+                self.fits[label] = self._fit_model(label, formula)
+        # keep the models in their insertion order
+        self.fits = OrderedDict((label, self.fits[label]) for label in self.formulas)
+        return self.fits
+
+    def summary(self):
+        '''One row of statistics per model.'''
+        self.fit()
+        return pd.DataFrame([OrderedDict([('model', label), ('nobs', fit.nobs),
+                                          ('df_model', fit.df_model), ('df_resid', fit.df_resid),
+                                          ('rsquared', fit.rsquared), ('rsquared_adj', fit.rsquared_adj),
+                                          ('aic', fit.aic), ('bic', fit.bic), ('llf', fit.llf),
+                                          ('fvalue', fit.fvalue), ('f_pvalue', fit.f_pvalue)])
+                             for label, fit in self.fits.items()]).set_index('model')
+
+    def anova(self, labels=None):
+        '''The F tests of the successive (nested) models (as `sm.stats.anova_lm(*fits)`):
+
+        Parameters
+        ----------
+        labels: list of strings, optional
+            The models to compare, from the most restricted one (default: all the models).
+        '''
+        self.fit()
+        labels = list(self.fits.keys()) if labels is None else list(labels)
+        terms = [set(patsy.ModelDesc.from_formula(self.formulas[label]).rhs_termlist) for label in labels]
+        for i in range(1, len(labels)):
+            if not terms[i - 1] < terms[i]:
+                raise ValueError('The models %s and %s are not nested: pass the models in order of '
+                                 'increasing complexity.' % (labels[i - 1], labels[i]))
+        fits = [self.fits[label] for label in labels]
+        table = pd.DataFrame(OrderedDict([('df_resid', [fit.df_resid for fit in fits]),
+                                          ('ssr', [fit.ssr for fit in fits])]),
+                             index=labels)
+        table['df_diff'] = -table['df_resid'].diff()
+        table['ss_diff'] = -table['ssr'].diff()
+        table['F'] = table['ss_diff'] / table['df_diff'] / fits[-1].scale
+        table['Pr(>F)'] = stats.f.sf(table['F'], table['df_diff'], fits[-1].df_resid)
+        return table
+
+
+def regression_models_statistics(regr_models, data_df=None, family=None, verbose=True):
+    '''Batch version of the notebook's `regression_models_statistics`:
+
+    Parameters
+    ----------
+    regr_models: list of (label, formula) pairs
+        e.g. [('fit1', 'kWh ~ rtemp_demean'), ...]
+    data_df: DataFrame, optional
+        The data of a new model family.
+    family: OLSModelFamily, optional
+        An existing family, extended with (only) the new models.
+
+    Returns
+    -------
+    family: OLSModelFamily
+        Its `fits` are the fitted models.
+    '''
+    family = OLSModelFamily(data_df) if family is None else family
+    new_labels = [label for label, _ in regr_models if label not in family.fits]
+    family.add_models(regr_models).fit()
+
+    if verbose:
+        for label in new_labels:
+            s = '\nREGRESSION MODEL: %s' % label
+            print(s)
+            print('-' * int(len(s) * (1 + 1 / 2.)))
+            print(family.summary().loc[[label]].T)
+            print(family.fits[label].summary2())
+        s = '\nANOVA RESULTS:'
+        print(s)
+        print('-' * 80)
+        print(family.anova([label for label, _ in regr_models]))
+    return family
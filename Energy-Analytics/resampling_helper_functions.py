@@ -0,0 +1,200 @@
+# helper classes for vectorized resampling (downsampling) of many energy consumption series at once
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def _bins(timestamps, freq):
+    # fixed frequencies ('D', 'H', '15min') are floored, calendar ones ('W', 'M') go through periods
+    try:
+        floored = timestamps.floor(freq)
+        bins = pd.date_range(floored.min(), floored.max(), freq=freq)
+    except ValueError:
+        periods = timestamps.to_period(freq)
+        floored = periods.to_timestamp()
+        bins = pd.period_range(periods.min(), periods.max(), freq=freq).to_timestamp()
+    return floored, bins
+
+
+class Resampler(object):
+    '''Resampling engine grouping the records by (signal, bin) integer codes, computed once:
+
+    The records of all the signals (metered sites) are assigned a segment code
+    signal_code * num_bins + bin_code. Means and sums are then computed with
+    weighted `np.bincount`s, minima/maxima with segment reductions over the
+    (once) sorted records, and categorical modes with a bincount over
+    (segment, category) codes -- no Python call per bin. As with
+    `DataFrame.resample`, every signal gets all the bins between its first
+    and its last record (empty bins included).
+
+    Usage
+    -----
+    r = Resampler(consumpt_ts.index, freq='D')
+    ragg = r.aggregate(consumpt_ts, {'kW': 'mean', 'Temp': 'mean', 'Traffic': 'mode', 'kWh': 'sum'})
+
+    Parameters
+    ----------
+    timestamps: array-like of datetimes
+    freq: string
+        The resampling frequency, e.g. 'D', 'H', '15min', 'W', 'M'
+        (bins are left closed and labelled by their start, e.g. the Monday of 'W').
+    signals: array-like, optional
+        The signal (site) id of every record, to resample many series in one call.
+    '''
+    def __init__(self, timestamps, freq='D', signals=None):
+        floored, self.bins = _bins(pd.DatetimeIndex(timestamps), freq)
+        bin_codes = self.bins.get_indexer(floored)
+        if signals is None:
+            signal_codes, self.signals = np.zeros(len(floored), dtype=np.int64), None
+        else:
+            signal_codes, self.signals = pd.factorize(np.asarray(signals), sort=True)
+        n_signals = 1 if self.signals is None else len(self.signals)
+        self.num_records = len(floored)
+        self.num_segments = n_signals * len(self.bins)
+        self.codes = signal_codes * len(self.bins) + bin_codes
+
+        # every signal spans the bins between its first and its last record
+        first = np.full(n_signals, len(self.bins), dtype=np.int64)
+        last = np.full(n_signals, -1, dtype=np.int64)
+        np.minimum.at(first, signal_codes, bin_codes)
+        np.maximum.at(last, signal_codes, bin_codes)
+        bin_ids = np.arange(len(self.bins))
+        self.segments = np.flatnonzero(((bin_ids >= first[:, None]) & (bin_ids <= last[:, None])).ravel())
+
+        self._order = None
+
+    def _valid(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        return values[valid], self.codes[valid]
+
+    def count(self, values=None):
+        if values is None:
+            return np.bincount(self.codes, minlength=self.num_segments)[self.segments]
+        _, codes = self._valid(values)
+        return np.bincount(codes, minlength=self.num_segments)[self.segments]
+
+    def sum(self, values):
+        values, codes = self._valid(values)
+        return np.bincount(codes, weights=values, minlength=self.num_segments)[self.segments]
+
+    def mean(self, values):
+        values, codes = self._valid(values)
+        counts = np.bincount(codes, minlength=self.num_segments)[self.segments]
+        sums = np.bincount(codes, weights=values, minlength=self.num_segments)[self.segments]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+    def _reduce(self, ufunc, values):
+        # segment reductions over the records sorted (once) by segment code
+        if self._order is None:
+            self._order = np.argsort(self.codes, kind='mergesort')
+        values = np.asarray(values, dtype=np.float64)[self._order]
+        codes = self.codes[self._order]
+        valid = ~np.isnan(values)
+        values, codes = values[valid], codes[valid]
+        result = np.full(self.num_segments, np.nan)
+        if len(values):
+            starts = np.flatnonzero(np.concatenate([[True], codes[1:] != codes[:-1]]))
+            result[codes[starts]] = ufunc.reduceat(values, starts)
+        return result[self.segments]
+
+    def min(self, values):
+        return self._reduce(np.minimum, values)
+
+    def max(self, values):
+        return self._reduce(np.maximum, values)
+
+    def mode(self, values, exclude=None, empty_value=None):
+        '''The most frequent value of every bin:
+
+        Parameters
+        ----------
+        values: array-like
+            e.g. the 'Traffic' status.
+        exclude: optional
+            A value never chosen as the mode, e.g. 'closed'.
+        empty_value: optional
+            The value of the bins without (non excluded) values.
+
+        Returns
+        -------
+        modes: numpy array (object)
+            Ties are broken in favour of the smallest value (as np.unique does).
+        '''
+        category_codes, categories = pd.factorize(np.asarray(values), sort=True)
+        categories = pd.Index(categories)
+        valid = category_codes >= 0
+        if exclude is not None and exclude in categories:
+            valid &= category_codes != categories.get_loc(exclude)
+        n_categories = max(len(categories), 1)
+        counts = np.bincount(self.codes[valid] * n_categories + category_codes[valid],
+                             minlength=self.num_segments * n_categories)
+        counts = counts.reshape(self.num_segments, n_categories)[self.segments]
+        modes = np.empty(len(self.segments), dtype=object)
+        modes[:] = empty_value
+        observed = counts.sum(axis=1) > 0
+        modes[observed] = np.asarray(categories, dtype=object)[counts[observed].argmax(axis=1)]
+        return modes
+
+    def index(self):
+        '''The (signal, bin) index of the aggregates (or the bin index for a single series).'''
+        bins = self.bins[self.segments % len(self.bins)]
+        if self.signals is None:
+            return bins
+        signals = np.asarray(self.signals)[self.segments // len(self.bins)]
+        return pd.MultiIndex.from_arrays([signals, bins], names=['signal', 'timestamp'])
+
+    def aggregate(self, data_df, how, exclude='closed'):
+        '''Aggregate many columns at once:
+
+        Parameters
+        ----------
+        data_df: DataFrame
+            The records, in the order of the resampler's timestamps.
+        how: dict
+            column -> one of 'mean', 'sum', 'count', 'min', 'max', 'mode'.
+        exclude: optional
+            The value excluded from the modes, e.g. 'closed'.
+
+        Returns
+        -------
+        aggregates: DataFrame
+        '''
+        aggregates = OrderedDict()
+        for column, func in how.items():
+            if func == 'mode':
+                aggregates[column] = self.mode(data_df[column].values, exclude=exclude)
+            else:
+                aggregates[column] = getattr(self, func)(data_df[column].values)
+        return pd.DataFrame(aggregates, index=self.index())
+
+
+def resample_aggregate(data_df, how, freq='D', timestamp_column=None, signal_column=None, exclude='closed'):
+    '''Resample and aggregate (many series of) records in one vectorized pass:
+
+    Parameters
+    ----------
+    data_df: DataFrame
+        e.g. consumpt_ts (timestamps as index) or consumpt_df.
+    how: dict
+        column -> one of 'mean', 'sum', 'count', 'min', 'max', 'mode',
+        e.g. {'kW': 'mean', 'Temp': 'mean', 'Traffic': 'mode', 'kWh': 'sum'}
+    freq: string
+        The resampling frequency.
+    timestamp_column: string, optional
+        The timestamps attribute (default: the index).
+    signal_column: string, optional
+        The signal (site) id attribute, e.g. 'signal_id'.
+    exclude: optional
+        The value excluded from the modes.
+
+    Returns
+    -------
+    aggregates: DataFrame
+        Indexed by the bins (or by (signal, bin) with a signal_column).
+    '''
+    timestamps = data_df.index if timestamp_column is None else data_df[timestamp_column]
+    signals = None if signal_column is None else data_df[signal_column].values
+    return Resampler(timestamps, freq=freq, signals=signals).aggregate(data_df, how, exclude=exclude)
@@ -0,0 +1,144 @@
+# helper classes for (incremental) rolling-window statistics of several windows in one pass
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _window_sums(values, window, start):
+    # sums over the windows ending at the rows start, start+1, ... (one cumulative sum pass)
+    cumsum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    stops = np.arange(start, len(values)) + 1
+    return cumsum[stops] - cumsum[stops - window]
+
+
+def _constant_windows(values, valid, window, start):
+    # windows (ending at the rows start, start+1, ...) whose valid values are all equal, whose variance
+    # is zero (as pandas detects them) rather than the cancellation error of the cumulative sums
+    highs = sliding_window_view(np.where(valid, values, -np.inf), window, axis=0)[start - window + 1:]
+    lows = sliding_window_view(np.where(valid, values, np.inf), window, axis=0)[start - window + 1:]
+    return highs.max(axis=-1) == lows.min(axis=-1)
+
+
+class RollingStatistics(object):
+    '''Rolling means, standard deviations and Pearson correlations of several windows at once:
+
+    The windowed counts, sums, sums of squares (and cross-products of the
+    attribute pairs) of all the windows are differences of the same cumulative
+    sums, from which the moving averages (MA), standard deviations and rolling
+    correlations are derived, as pandas `rolling(window, min_periods)` computes
+    them (missing values excluded). The values are shifted by their first means
+    to keep the sums of squares accurate, and windows of constant values get a
+    zero standard deviation (and no correlation) instead of the round-off of the sums.
+
+    New (e.g. daily) readings are added with `update`: only the last
+    max(windows) - 1 readings are kept, so the statistics of the new readings
+    are computed without going over the full history again.
+
+    Usage
+    -----
+    rolling = RollingStatistics(windows=(5, 30), pairs=[('kWh', 'Temp')])
+    stats = rolling.fit(ragg[['kWh', 'Temp']])    # columns: kWh_ma5, kWh_std5, kWh_Temp_corr5, ...
+    stats = rolling.update(new_daily_readings)     # the statistics of the new readings only
+
+    Parameters
+    ----------
+    windows: list of ints
+        The window sizes, e.g. (5, 30).
+    pairs: list of (string, string) tuples, optional
+        The attribute pairs of the rolling correlations, e.g. [('kWh', 'Temp')].
+    min_periods: int, optional
+        The minimum number of observations of a window (default: the window size).
+    '''
+    def __init__(self, windows=(5, 30), pairs=(), min_periods=None):
+        self.windows = sorted(set(int(w) for w in windows))
+        self.pairs = [tuple(pair) for pair in pairs]
+        self.min_periods = min_periods
+        self.reset()
+
+    def reset(self):
+        self.columns = None
+        self.shift = None
+        self._buffer = None
+        self._history = []
+
+    def _min_periods(self, window):
+        return window if self.min_periods is None else min(self.min_periods, window)
+
+    def update(self, data_df):
+        '''Add new readings (rows following the previous ones):
+
+        Parameters
+        ----------
+        data_df: DataFrame
+            The new readings of the attributes (the first call fixes the attributes).
+
+        Returns
+        -------
+        stats: DataFrame
+            The rolling statistics of the new readings (same index as data_df).
+        '''
+        if self.columns is None:
+            self.columns = list(data_df.columns)
+            values = data_df[self.columns].values.astype(np.float64)
+            shift = np.nanmean(values, axis=0) if len(values) else np.zeros(len(self.columns))
+            self.shift = np.where(np.isnan(shift), 0., shift)
+            self._buffer = np.full((self.windows[-1] - 1, len(self.columns)), np.nan)
+
+        block = np.vstack([self._buffer, data_df[self.columns].values.astype(np.float64) - self.shift])
+        start = len(self._buffer)
+        valid = ~np.isnan(block)
+        zeroed = np.where(valid, block, 0.)
+        positions = dict((column, j) for j, column in enumerate(self.columns))
+
+        stats = OrderedDict()
+        for window in self.windows:
+            min_periods = self._min_periods(window)
+            counts = _window_sums(valid.astype(np.float64), window, start)
+            sums = _window_sums(zeroed, window, start)
+            squares = _window_sums(zeroed ** 2, window, start)
+            constant = _constant_windows(zeroed, valid, window, start)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts >= min_periods, sums / counts, np.nan) + self.shift
+                variances = np.where(constant, 0., (squares - sums ** 2 / counts) / (counts - 1))
+                stds = np.where((counts >= min_periods) & (counts > 1), np.sqrt(np.maximum(variances, 0.)),
+                                np.nan)
+            for j, column in enumerate(self.columns):
+                stats['%s_ma%d' % (column, window)] = means[:, j]
+                stats['%s_std%d' % (column, window)] = stds[:, j]
+
+            for x_column, y_column in self.pairs:
+                jx, jy = positions[x_column], positions[y_column]
+                both = valid[:, jx] & valid[:, jy]
+                x, y = np.where(both, zeroed[:, jx], 0.), np.where(both, zeroed[:, jy], 0.)
+                pair_sums = _window_sums(np.column_stack([both, x, y, x * x, y * y, x * y]).astype(np.float64),
+                                         window, start)
+                n, sx, sy, sxx, syy, sxy = pair_sums.T
+                pair_constant = _constant_windows(np.column_stack([x, y]), np.column_stack([both, both]),
+                                                  window, start).any(axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    denominator = np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+                    corr = np.where((n >= min_periods) & (denominator > 0) & ~pair_constant,
+                                    (n * sxy - sx * sy) / denominator, np.nan)
+                stats['%s_%s_corr%d' % (x_column, y_column, window)] = np.clip(corr, -1., 1.)
+
+        if len(self._buffer):
+            self._buffer = block[len(block) - len(self._buffer):]
+        stats = pd.DataFrame(stats, index=data_df.index)
+        self._history.append(stats)
+        return stats
+
+    def fit(self, data_df):
+        '''Compute the rolling statistics of a full history (forgetting any previous readings).'''
+        self.reset()
+        return self.update(data_df)
+
+    @property
+    def stats(self):
+        '''The rolling statistics of all the readings seen so far.'''
+        if not self._history:
+            return pd.DataFrame()
+        if len(self._history) > 1:
+            self._history = [pd.concat(self._history)]
+        return self._history[0]
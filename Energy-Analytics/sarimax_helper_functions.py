@@ -0,0 +1,293 @@
+# helper classes for a parallel, warm-started and cached SARIMAX order search
+from __future__ import print_function
+import os
+import json
+import hashlib
+import itertools
+import multiprocessing
+import warnings
+from collections import OrderedDict
+from time import time
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from statsmodels.stats.diagnostic import acorr_ljungbox
+
+
+def order_grid(p=range(0, 4), d=(0,), q=range(0, 3), P=range(0, 2), D=(0,), Q=range(0, 2), s=7):
+    '''All the (p,d,q) x (P,D,Q)_s candidates of the given ranges:
+
+    Returns
+    -------
+    candidates: list of ((p,d,q), (P,D,Q,s)) pairs
+    '''
+    return [((p_, d_, q_), (P_, D_, Q_, s if (P_ or D_ or Q_) else 0))
+            for p_, d_, q_, P_, D_, Q_ in itertools.product(p, d, q, P, D, Q)]
+
+
+def _complexity(candidate):
+    (p, _, q), (P, _, Q, _) = candidate
+    return p + q + P + Q
+
+
+def _parents(candidate):
+    # the nested candidates with one AR/MA (seasonal or not) coefficient less
+    (p, d, q), (P, D, Q, s) = candidate
+    orders = [p, q, P, Q]
+    parents = []
+    for i in range(4):
+        if orders[i] > 0:
+            smaller = list(orders)
+            smaller[i] -= 1
+            seasonal = (smaller[2], D, smaller[3], s if (smaller[2] or D or smaller[3]) else 0)
+            parents.append(((smaller[0], d, smaller[1]), seasonal))
+    return parents
+
+
+# worker state, shared with the pool processes once through their initializer
+_WORKER = {}
+
+
+def _init_worker(endog, exog, model_kwargs, fit_kwargs, ljungbox_lags):
+    _WORKER['endog'] = endog
+    _WORKER['exog'] = exog
+    _WORKER['model_kwargs'] = model_kwargs
+    _WORKER['fit_kwargs'] = fit_kwargs
+    _WORKER['ljungbox_lags'] = ljungbox_lags
+
+
+def _model(candidate):
+    order, seasonal_order = candidate
+    return sm.tsa.SARIMAX(_WORKER['endog'], exog=_WORKER['exog'], order=order,
+                          seasonal_order=seasonal_order, **_WORKER['model_kwargs'])
+
+
+def _fit_candidate(task):
+    # fit one candidate, starting from the parameters of its parent (by name) when given
+    candidate, parent_params = task
+    model = _model(candidate)
+    start_params = None
+    if parent_params:
+        start_params = pd.Series(model.start_params, index=model.param_names)
+        for name in model.param_names:
+            if name.startswith(('ar.', 'ma.')):
+                start_params[name] = 0.
+        shared = [name for name in parent_params if name in start_params.index]
+        start_params[shared] = [parent_params[name] for name in shared]
+        start_params = start_params.values
+
+    t0 = time()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        try:
+            fit = model.fit(start_params=start_params, disp=False, **_WORKER['fit_kwargs'])
+        except (ValueError, np.linalg.LinAlgError) as e:
+            return {'candidate': candidate, 'error': str(e), 'fit_time': time() - t0}
+    fit_time = time() - t0
+
+    # the first (differenced) observations are diffuse: keep them out of the residual tests
+    burn = candidate[0][1] + candidate[1][1] * candidate[1][3]
+    resid = np.asarray(fit.resid)[burn:]
+    lags = min(_WORKER['ljungbox_lags'], max(len(resid) // 2 - 1, 1))
+    ljungbox = acorr_ljungbox(resid, lags=[lags], return_df=True)
+    return {'candidate': candidate,
+            'params': OrderedDict(zip(model.param_names, [float(x) for x in fit.params])),
+            'aic': float(fit.aic), 'bic': float(fit.bic), 'llf': float(fit.llf),
+            'num_params': len(model.param_names),
+            'converged': bool(fit.mle_retvals.get('converged', True)) if fit.mle_retvals else True,
+            'lb_lags': lags, 'lb_stat': float(ljungbox['lb_stat'].iloc[0]),
+            'lb_pvalue': float(ljungbox['lb_pvalue'].iloc[0]), 'fit_time': fit_time}
+
+
+class SARIMAXOrderSearch(object):
+    '''Parallel, warm-started and cached SARIMAX order search:
+
+    The candidates are fitted level by level, by increasing number of AR/MA
+    coefficients p+q+P+Q, on a process pool. Every candidate is warm-started
+    from the fitted parameters of its best nested parent (the same model with
+    one coefficient less; the new coefficients start at zero). Fitted states
+    (parameters and statistics) are cached on disk as JSON, keyed by the data,
+    the candidate and the model options, so re-running a search (e.g. over many
+    sites) only fits new models.
+
+    All the candidates are fitted by default. An optional, heuristic pruning
+    (`prune_margin`) skips the candidates whose parents' information criterion
+    are all worse than the incumbent (the best one so far) by more than the
+    margin. It is not a bound: one more coefficient can recover any gap, so a
+    pruned candidate may be better than the reported best one.
+
+    Usage
+    -----
+    search = SARIMAXOrderSearch(endog, exog=XReg, cache_dir='./sarimax_cache')
+    ranking = search.run(order_grid(p=range(4), q=range(3), P=range(2), Q=range(2), s=7))
+    best_fit = search.refit(*ranking['candidate'].iloc[0])
+
+    Parameters
+    ----------
+    endog: array-like
+        e.g. fitSq2INT2.model.data.orig_endog
+    exog: array-like, optional
+        e.g. fitSq2INT2.model.data.orig_exog
+    criterion: {'aic', 'bic'}
+        The information criterion of the ranking and the pruning.
+    prune_margin: float, optional
+        The margin of the heuristic pruning (default None: no pruning).
+    cache_dir: string, optional
+        The directory of the cached fits (None disables the caching).
+    n_jobs: int, optional
+        The number of worker processes (default: number of CPUs, 1 fits serially).
+    ljungbox_lags: int
+        The lag of the Ljung-Box test of the residuals.
+    maxiter: int
+        The maximum number of iterations of each fit.
+    model_kwargs: keyword arguments
+        Other `SARIMAX` arguments, e.g. trend='c'.
+    '''
+    def __init__(self, endog, exog=None, criterion='aic', prune_margin=None, cache_dir=None, n_jobs=None,
+                 ljungbox_lags=14, maxiter=100, **model_kwargs):
+        if criterion not in ('aic', 'bic'):
+            raise ValueError('The criterion should be one of \'aic\', \'bic\'.')
+        self.endog = np.asarray(endog, dtype=np.float64)
+        self.exog = None if exog is None else np.asarray(exog, dtype=np.float64)
+        self.criterion = criterion
+        self.prune_margin = prune_margin
+        self.cache_dir = cache_dir
+        self.n_jobs = multiprocessing.cpu_count() if n_jobs is None else n_jobs
+        self.ljungbox_lags = ljungbox_lags
+        self.fit_kwargs = {'maxiter': maxiter}
+        self.model_kwargs = model_kwargs
+        self.results = OrderedDict()
+        if cache_dir is not None and not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+        digest = hashlib.sha1(self.endog.tobytes())
+        if self.exog is not None:
+            digest.update(self.exog.tobytes())
+        digest.update(json.dumps([self.ljungbox_lags, self.fit_kwargs, self.model_kwargs],
+                                 sort_keys=True, default=str).encode('utf-8'))
+        self._data_key = digest.hexdigest()
+
+    def _cache_path(self, candidate):
+        key = hashlib.sha1((self._data_key + json.dumps(candidate)).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _load(self, candidate):
+        if self.cache_dir is None or not os.path.exists(self._cache_path(candidate)):
+            return None
+        with open(self._cache_path(candidate)) as f:
+            result = json.load(f, object_pairs_hook=OrderedDict)
+        result['candidate'] = candidate
+        result['cached'] = True
+        return result
+
+    def _store(self, result):
+        if self.cache_dir is None or 'error' in result:
+            return
+        path = self._cache_path(result['candidate'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump(dict((k, v) for k, v in result.items() if k != 'candidate'), f)
+        os.rename(path + '.tmp', path)
+
+    def _incumbent(self):
+        scores = [r[self.criterion] for r in self.results.values() if 'error' not in r]
+        return min(scores) if scores else np.inf
+
+    def run(self, candidates, verbose=False):
+        '''Evaluate (or prune) all the candidates:
+
+        Parameters
+        ----------
+        candidates: list of ((p,d,q), (P,D,Q,s)) pairs
+            e.g. the output of `order_grid`.
+
+        Returns
+        -------
+        ranking: DataFrame
+            The fitted candidates ranked by the criterion, with their AIC, BIC,
+            log-likelihood, Ljung-Box statistic and p-value, fit time, and their
+            warm start parent; the (heuristically) pruned candidates are ranked
+            last, with the status 'pruned (heuristic)'.
+        '''
+        candidates = [(tuple(order), tuple(seasonal_order)) for order, seasonal_order in candidates]
+        levels = OrderedDict()
+        for candidate in sorted(set(candidates), key=_complexity):
+            levels.setdefault(_complexity(candidate), []).append(candidate)
+
+        args = (self.endog, self.exog, self.model_kwargs, self.fit_kwargs, self.ljungbox_lags)
+        pool = None
+        if self.n_jobs > 1:
+            pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=args)
+        else:
+            _init_worker(*args)
+        pruned = set()
+        try:
+            for level, level_candidates in levels.items():
+                incumbent = self._incumbent()
+                tasks = []
+                for candidate in level_candidates:
+                    if candidate in self.results:
+                        continue
+                    cached = self._load(candidate)
+                    if cached is not None:
+                        self.results[candidate] = cached
+                        continue
+                    parents = [self.results[p] for p in _parents(candidate)
+                               if p in self.results and 'error' not in self.results[p]]
+                    # the descendants of pruned candidates are pruned as well
+                    if self.prune_margin is not None and (
+                            (parents and min(p[self.criterion] for p in parents) > incumbent + self.prune_margin) or
+                            (not parents and any(p in pruned for p in _parents(candidate)))):
+                        pruned.add(candidate)
+                        continue
+                    parent = min(parents, key=lambda p: p[self.criterion]) if parents else None
+                    tasks.append((candidate, None if parent is None else parent['params'],
+                                  None if parent is None else parent['candidate']))
+
+                work = [(candidate, params) for candidate, params, _ in tasks]
+                if pool is not None:
+                    outputs = pool.map(_fit_candidate, work, chunksize=1)
+                else:
+                    outputs = [_fit_candidate(task) for task in work]
+                for (candidate, _, parent), result in zip(tasks, outputs):
+                    result['warm_start'] = parent
+                    result['cached'] = False
+                    self.results[candidate] = result
+                    self._store(result)
+                if verbose:
+                    print('level %d: %d fitted, %d pruned so far, best %s = %.3f'
+                          % (level, len(tasks), len(pruned), self.criterion.upper(), self._incumbent()))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        rows = []
+        for candidate in candidates:
+            result = self.results.get(candidate)
+            row = OrderedDict([('candidate', candidate), ('order', candidate[0]),
+                               ('seasonal_order', candidate[1])])
+            if result is None:
+                row['status'] = 'pruned (heuristic)'
+            elif 'error' in result:
+                row['status'] = 'error'
+            else:
+                row['status'] = 'cached' if result.get('cached') else 'fitted'
+                for key in ('aic', 'bic', 'llf', 'num_params', 'lb_stat', 'lb_pvalue',
+                            'converged', 'fit_time', 'warm_start'):
+                    row[key] = result.get(key)
+            rows.append(row)
+        ranking = pd.DataFrame(rows)
+        if self.criterion in ranking:
+            ranking = ranking.sort_values(self.criterion, na_position='last', kind='mergesort')
+        return ranking.reset_index(drop=True)
+
+    def refit(self, order, seasonal_order):
+        '''The statsmodels results of a searched candidate, rebuilt from its stored parameters.'''
+        candidate = (tuple(order), tuple(seasonal_order))
+        result = self.results.get(candidate) or self._load(candidate)
+        if result is None or 'error' in result:
+            raise ValueError('The candidate %s has not been fitted.' % (candidate,))
+        model = sm.tsa.SARIMAX(self.endog, exog=self.exog, order=candidate[0],
+                               seasonal_order=candidate[1], **self.model_kwargs)
+        return model.smooth(np.array(list(result['params'].values())))
@@ -0,0 +1,236 @@
+# helper functions for memory-lean, schema-driven loading (and columnar caching) of the loan data sets
+import os
+import json
+import shutil
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import CategoricalDtype, union_categoricals
+
+
+# Schemas: attribute name -> dtype, with
+#   CategoricalDtype(categories, ordered) for closed vocabularies (parsed straight into codes),
+#   'category' for open vocabularies (categories gathered over the chunks),
+#   'datetime64[ns]' for dates (see `date_formats`), and compact numeric dtypes otherwise.
+CREDIT_DATA_SCHEMA = OrderedDict([
+    ('checking_acc_status', CategoricalDtype(['none', 'overdraft', 'adequate', 'good'], ordered=True)),
+    ('loan_duration', 'int16'),
+    ('credit_hist', CategoricalDtype(['none', 'Paid-Off', 'Serviced', 'Delayed', 'Critical'], ordered=True)),
+    ('loan_purpose', 'category'),
+    ('credit_amount', 'float32'),
+    ('savings', 'float32'),
+    ('consecutive_emp', CategoricalDtype(['E0', 'E1', 'E4', 'E7', 'E7+'], ordered=True)),
+    ('installment_rate', 'float32'),
+    ('sex_personal_status', 'category'),
+    ('other_debtors_guarantors', 'category'),
+    ('present_residence_since', 'int8'),
+    ('property_type', 'category'),
+    ('age', 'int16'),
+    ('other_installment_plans', 'category'),
+    ('housing_type', CategoricalDtype(['guest', 'rent', 'own'], ordered=True)),
+    ('credits_at_bank', 'int8'),
+    ('work_experience', CategoricalDtype(['D', 'C', 'B', 'A'], ordered=True)),
+    ('num_people_liable', 'int8'),
+    ('phone_exist', 'category'),
+    ('foreign_worker', 'category'),
+    ('credit_risk', 'category')])
+
+LOAN_DATA_SCHEMA = OrderedDict([
+    ('id', 'int64'),
+    ('member_id', 'int64'),
+    ('loan_amnt', 'float32'),
+    ('funded_amnt', 'float32'),
+    ('term', 'category'),
+    ('int_rate', 'float32'),
+    ('installment', 'float32'),
+    ('grade', CategoricalDtype(list('ABCDEFG'), ordered=True)),
+    ('sub_grade', CategoricalDtype([g + str(i) for g in 'ABCDEFG' for i in range(1, 6)], ordered=True)),
+    ('emp_length', 'category'),
+    ('home_ownership', 'category'),
+    ('annual_inc', 'float32'),
+    ('verification_status', 'category'),
+    ('issue_d', 'datetime64[ns]'),
+    ('loan_status', 'category'),
+    ('pymnt_plan', 'category'),
+    ('purpose', 'category'),
+    ('addr_state', 'category'),
+    ('dti', 'float32'),
+    ('policy_code', 'float32'),
+    ('application_type', 'category'),
+    ('annual_inc_joint', 'float32'),
+    ('dti_joint', 'float32'),
+    ('verification_status_joint', 'category')])
+
+LOAN_DATA_DATE_FORMATS = {'issue_d': '%b-%Y'}
+
+
+def _is_categorical(dtype):
+    return isinstance(dtype, CategoricalDtype) or dtype == 'category'
+
+
+def read_csv_schema(path, schema, names=None, date_formats=None, chunksize=100000, **read_csv_kwargs):
+    '''Read only the schema attributes of a CSV file, in chunks, into compact dtypes:
+
+    Closed vocabularies are parsed straight into category codes (values outside
+    the categories become NaN), numeric attributes into the (int8/float32...)
+    schema dtypes, so the full object-typed frame is never materialized.
+
+    Parameters
+    ----------
+    path: string
+        The CSV file, e.g. credit_data_path.
+    schema: OrderedDict
+        attribute name -> dtype, e.g. CREDIT_DATA_SCHEMA.
+    names: list of strings, optional
+        New names of all the CSV columns (replacing its header), e.g. the short
+        attribute names of the Credit Risk notebook.
+    date_formats: dict, optional
+        attribute name -> strftime format of the datetime attributes.
+    chunksize: int
+        The number of rows parsed at once.
+
+    Returns
+    -------
+    data_df: DataFrame
+    '''
+    date_formats = date_formats or {}
+    dates = [attrib for attrib, dtype in schema.items() if dtype == 'datetime64[ns]']
+    dtypes = dict((attrib, dtype) for attrib, dtype in schema.items() if attrib not in dates)
+    if names is not None:
+        read_csv_kwargs.update(names=names, header=0)
+
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=list(schema), dtype=dtypes, chunksize=chunksize,
+                             **read_csv_kwargs):
+        for attrib in dates:
+            chunk[attrib] = pd.to_datetime(chunk[attrib], format=date_formats.get(attrib))
+        chunks.append(chunk[list(schema)])
+    if not chunks:
+        return pd.DataFrame(columns=list(schema))
+
+    # the open vocabularies differ among the chunks: unify them before concatenating
+    for attrib, dtype in schema.items():
+        if dtype == 'category' and len(chunks) > 1:
+            categories = union_categoricals([chunk[attrib] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[attrib] = chunk[attrib].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _source_key(path, schema, names, date_formats):
+    # identifies the source file version and the parsing options of a cache
+    stat = os.stat(path)
+    spec = [os.path.abspath(path), stat.st_size, stat.st_mtime, names, date_formats,
+            [(attrib, str(dtype)) for attrib, dtype in schema.items()]]
+    return hashlib.md5(json.dumps(spec, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def save_columnar(data_df, cache_dir, key=None):
+    '''Store a DataFrame as a columnar cache (one .npy file per column, plus its metadata):
+
+    Categorical (and string) columns are stored as their codes, datetimes as int64.
+    '''
+    tmp_dir = cache_dir.rstrip(os.sep) + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    columns = []
+    for i, attrib in enumerate(data_df.columns):
+        values = data_df[attrib]
+        meta = {'name': attrib, 'file': 'col_{0:04d}.npy'.format(i), 'kind': 'numeric'}
+        if values.dtype == object:
+            values = values.astype('category')
+        if isinstance(values.dtype, CategoricalDtype):
+            meta.update(kind='categorical', categories=values.cat.categories.tolist(),
+                        ordered=bool(values.cat.ordered))
+            array = values.cat.codes.values
+        elif np.issubdtype(values.dtype, np.datetime64):
+            meta.update(kind='datetime', dtype=str(values.dtype))
+            array = values.values.view(np.int64)
+        else:
+            array = values.values
+        np.save(os.path.join(tmp_dir, meta['file']), np.ascontiguousarray(array))
+        columns.append(meta)
+
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'key': key, 'num_rows': len(data_df), 'columns': columns}, f, default=str)
+    # replace the previous cache only once the new one is complete
+    if os.path.exists(cache_dir):
+        shutil.rmtree(cache_dir)
+    os.rename(tmp_dir, cache_dir)
+
+
+def load_columnar(cache_dir, columns=None, mmap_mode='c'):
+    '''Load (a subset of the columns of) a columnar cache, memory-mapping the column files:
+
+    The frame is built without copying, so its columns stay backed by the
+    memory maps. With the default copy-on-write maps (mmap_mode='c'), only
+    the modified pages are copied into memory and the cache files are never written.
+    '''
+    with open(os.path.join(cache_dir, 'meta.json')) as f:
+        meta = json.load(f)
+
+    data = OrderedDict()
+    for column in meta['columns']:
+        if columns is not None and column['name'] not in columns:
+            continue
+        array = np.load(os.path.join(cache_dir, column['file']), mmap_mode=mmap_mode)
+        # a plain ndarray view (over the memory map) for pandas
+        array = array.view(np.ndarray)
+        if column['kind'] == 'categorical':
+            dtype = CategoricalDtype(column['categories'], ordered=column['ordered'])
+            # (the codes were validated when the cache was written)
+            data[column['name']] = pd.Categorical.from_codes(array, dtype=dtype, validate=False)
+        elif column['kind'] == 'datetime':
+            data[column['name']] = array.view(column['dtype'])
+        else:
+            data[column['name']] = array
+    return pd.DataFrame(data, index=pd.RangeIndex(meta['num_rows']), copy=False)
+
+
+def _cache_key(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            return json.load(f)['key']
+    except (IOError, OSError, ValueError, KeyError):
+        return None
+
+
+def load_dataset(path, schema, cache_dir=None, names=None, date_formats=None, chunksize=100000,
+                 refresh=False, columns=None, **read_csv_kwargs):
+    '''Schema-driven CSV loader backed by a memory-mapped columnar cache:
+
+    The first call parses the CSV (see `read_csv_schema`) and stores the result
+    in `cache_dir`; later calls (e.g. new notebook sessions) memory-map the
+    cached columns instead. The cache is rebuilt whenever the CSV file or the
+    parsing options change.
+
+    Usage
+    -----
+    credit_data_df = load_dataset(credit_data_path, CREDIT_DATA_SCHEMA,
+                                  names=list(CREDIT_DATA_SCHEMA))
+    loan_df = load_dataset(loan_csv_path, LOAN_DATA_SCHEMA, date_formats=LOAN_DATA_DATE_FORMATS)
+
+    Parameters
+    ----------
+    cache_dir: string, optional
+        The cache directory (default: next to the CSV file, '<path>.columnar').
+    refresh: boolean
+        Rebuild the cache even if it is up to date.
+    columns: list of strings, optional
+        Load only these attributes (from the cache).
+
+    Returns
+    -------
+    data_df: DataFrame
+    '''
+    cache_dir = path + '.columnar' if cache_dir is None else cache_dir
+    key = _source_key(path, schema, names, date_formats)
+    if refresh or _cache_key(cache_dir) != key:
+        data_df = read_csv_schema(path, schema, names=names, date_formats=date_formats,
+                                  chunksize=chunksize, **read_csv_kwargs)
+        save_columnar(data_df, cache_dir, key=key)
+    return load_columnar(cache_dir, columns=columns)
@@ -0,0 +1,251 @@
+# helper classes for parallel, cross-validated comparison of (credit risk) classifiers
+import itertools
+import multiprocessing
+from collections import OrderedDict
+from time import time
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.feature_selection import SelectFromModel
+from sklearn.metrics import fbeta_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+
+class FoldPreprocessor(object):
+    '''Preprocessing (label encoding and feature selection) fitted once per CV fold:
+
+    The categories of the categorical attributes are learned on the training part
+    of the fold (unseen categories of the test part are encoded as -1). The feature
+    selection estimator is fitted once per fold, and the `SelectFromModel` supports
+    of all the thresholds are derived from its feature importances.
+
+    Parameters
+    ----------
+    categorical_features: list of strings
+        The attributes to label encode, e.g. imp_categ_attribs.
+    selector: estimator with feature_importances_ (or coef_), optional
+        The feature selection estimator (default: a RandomForestClassifier).
+    '''
+    def __init__(self, categorical_features=None, selector=None):
+        self.categorical_features = list(categorical_features or [])
+        self.selector = selector
+
+    def fit(self, X_train, y_train):
+        self.columns = list(X_train.columns)
+        self.categories = {}
+        for attrib in self.categorical_features:
+            self.categories[attrib] = pd.Index(pd.unique(X_train[attrib].astype(str)))
+        self.selector_ = None
+        self._supports = {}
+        self.X_train_ = self.transform(X_train)
+        return self
+
+    def transform(self, X):
+        encoded = np.empty((len(X), len(self.columns)), dtype=np.float64)
+        for j, attrib in enumerate(self.columns):
+            if attrib in self.categories:
+                encoded[:, j] = self.categories[attrib].get_indexer(X[attrib].astype(str))
+            else:
+                encoded[:, j] = X[attrib].values
+        return encoded
+
+    def support(self, threshold, y_train):
+        '''Boolean mask of the features selected at the given threshold (None selects all).'''
+        if threshold is None:
+            return np.ones(len(self.columns), dtype=bool)
+        if threshold not in self._supports:
+            if self.selector_ is None:
+                selector = RandomForestClassifier(n_estimators=400, max_features='sqrt', random_state=345) \
+                    if self.selector is None else self.selector
+                self.selector_ = clone(selector).fit(self.X_train_, y_train)
+            self._supports[threshold] = SelectFromModel(self.selector_, threshold=threshold,
+                                                        prefit=True).get_support()
+        return self._supports[threshold]
+
+
+# worker state, shared with the pool processes once through their initializer
+_WORKER = {}
+
+
+def _init_worker(folds, candidates, beta, pos_label):
+    _WORKER['folds'] = folds
+    _WORKER['candidates'] = candidates
+    _WORKER['beta'] = beta
+    _WORKER['pos_label'] = pos_label
+
+
+def _evaluate(task):
+    # fit one (candidate, parameters, threshold) on one fold, growing ensembles incrementally
+    candidate_id, params, threshold, fold_id = task
+    estimator, n_estimators = _WORKER['candidates'][candidate_id][1:3]
+    X_train, y_train, X_test, y_test, supports = _WORKER['folds'][fold_id]
+    X_train, X_test = X_train[:, supports[threshold]], X_test[:, supports[threshold]]
+    beta, pos_label = _WORKER['beta'], _WORKER['pos_label']
+    estimator = clone(estimator).set_params(**params)
+
+    def score(y_pred):
+        return fbeta_score(y_test, y_pred, beta=beta, pos_label=pos_label, average='binary')
+
+    rows = []
+    if n_estimators is None:
+        t0 = time()
+        estimator.fit(X_train, y_train)
+        rows.append((None, score(estimator.predict(X_test)), time() - t0))
+    elif 'warm_start' in estimator.get_params():
+        # (bagging/boosting) ensembles keep their fitted trees and only add the new ones
+        estimator.set_params(warm_start=True)
+        fit_time = 0.
+        for n in n_estimators:
+            t0 = time()
+            estimator.set_params(n_estimators=n).fit(X_train, y_train)
+            fit_time += time() - t0
+            rows.append((n, score(estimator.predict(X_test)), fit_time))
+    else:
+        # e.g. AdaBoost: fit the largest ensemble once and score its stages;
+        # the fit time of a stage is prorated to its number of estimators
+        t0 = time()
+        estimator.set_params(n_estimators=n_estimators[-1]).fit(X_train, y_train)
+        fit_time = time() - t0
+        wanted = set(n_estimators)
+        for n, y_pred in enumerate(estimator.staged_predict(X_test), 1):
+            if n in wanted:
+                rows.append((n, score(y_pred), fit_time * n / n_estimators[-1]))
+    return [(candidate_id, params, threshold, fold_id) + row for row in rows]
+
+
+class ModelComparison(object):
+    '''Parallel, cross-validated comparison harness of classifiers:
+
+    The preprocessing of every CV fold is fitted once and shared by all the
+    candidates. Tree ensembles are grown incrementally over their n_estimators
+    values (warm_start, or staged predictions when warm_start is not supported)
+    instead of being refitted from scratch. All (candidate, parameters, threshold,
+    fold) fits run on a shared process pool, and the F_beta scores and fit times
+    are gathered in one results table.
+
+    Usage
+    -----
+    comparison = ModelComparison(X_train, y_train, categorical_features=imp_categ_attribs)
+    comparison.add('DTree', dtree, param_grid={'max_depth': [3, 4, 5, 6]})
+    comparison.add('RandomForest', RandomForestClassifier(max_features='sqrt'),
+                   n_estimators=range(30, 501, 10))
+    comparison.add('GradientBoosting', gbc, n_estimators=range(10, 201, 10),
+                   thresholds=['0.58 * median', 'median', 'mean', '1.58 * median'])
+    results = comparison.run()
+
+    Parameters
+    ----------
+    X: DataFrame
+        The (not encoded) attributes.
+    y: array-like
+        The response, e.g. the credit risk classes.
+    categorical_features: list of strings, optional
+        The attributes to label encode.
+    n_splits: int
+        The number of stratified CV folds.
+    beta: float
+        The beta of the F_beta score (default: 1/sqrt(5), precision weighted).
+    pos_label: int
+        The positive class of the F_beta score.
+    selector: estimator, optional
+        The feature selection estimator of the thresholds (see `FoldPreprocessor`).
+    n_jobs: int, optional
+        The number of worker processes (default: number of CPUs, 1 runs serially).
+    random_state: int, optional
+        The seed of the CV folds shuffling.
+    '''
+    def __init__(self, X, y, categorical_features=None, n_splits=5, beta=1 / np.sqrt(5), pos_label=1,
+                 selector=None, n_jobs=None, random_state=None):
+        self.X = X
+        self.y = np.asarray(y)
+        self.categorical_features = categorical_features
+        self.n_splits = n_splits
+        self.beta = beta
+        self.pos_label = pos_label
+        self.selector = selector
+        self.n_jobs = multiprocessing.cpu_count() if n_jobs is None else n_jobs
+        self.random_state = random_state
+        self.candidates = []
+        self._folds = None
+
+    def add(self, label, estimator, param_grid=None, n_estimators=None, thresholds=(None,)):
+        '''Add a candidate classifier:
+
+        Parameters
+        ----------
+        label: string
+        estimator: scikit-learn classifier
+        param_grid: dict, optional
+            The parameters grid to explore (n_estimators excluded).
+        n_estimators: list of ints, optional
+            The ensemble sizes to explore (grown incrementally).
+        thresholds: list, optional
+            The `SelectFromModel` thresholds to explore (None: no feature selection).
+        '''
+        n_estimators = None if n_estimators is None else sorted(set(int(n) for n in n_estimators))
+        self.candidates.append((label, estimator, n_estimators, param_grid or {}, list(thresholds)))
+        return self
+
+    def folds(self):
+        '''The (cached) preprocessed CV folds: (X_train, y_train, X_test, y_test, supports).'''
+        thresholds = set(itertools.chain.from_iterable(c[4] for c in self.candidates))
+        if self._folds is None:
+            skf = StratifiedKFold(n_splits=self.n_splits, shuffle=self.random_state is not None,
+                                  random_state=self.random_state)
+            self._folds = []
+            for train_ix, test_ix in skf.split(self.X, self.y):
+                X_train, X_test = self.X.iloc[train_ix], self.X.iloc[test_ix]
+                preprocessor = FoldPreprocessor(self.categorical_features, self.selector)
+                preprocessor.fit(X_train, self.y[train_ix])
+                self._folds.append((preprocessor.X_train_, self.y[train_ix],
+                                    preprocessor.transform(X_test), self.y[test_ix], preprocessor))
+        folds = []
+        for X_train, y_train, X_test, y_test, preprocessor in self._folds:
+            supports = dict((thr, preprocessor.support(thr, y_train)) for thr in thresholds)
+            folds.append((X_train, y_train, X_test, y_test, supports))
+        return folds
+
+    def run(self):
+        '''Fit and score all the candidates:
+
+        Returns
+        -------
+        results: DataFrame
+            One row per (model, threshold, params, n_estimators), sorted by decreasing
+            mean F_beta score, with the fold-averaged F_beta score (and its std), the
+            fold-averaged fit time and the total fit time (over the folds) in seconds.
+        '''
+        folds = self.folds()
+        tasks = [(candidate_id, params, threshold, fold_id)
+                 for candidate_id, candidate in enumerate(self.candidates)
+                 for params in ParameterGrid(candidate[3])
+                 for threshold in candidate[4]
+                 for fold_id in range(len(folds))]
+
+        args = (folds, self.candidates, self.beta, self.pos_label)
+        if self.n_jobs > 1 and len(tasks) > 1:
+            pool = multiprocessing.Pool(self.n_jobs, initializer=_init_worker, initargs=args)
+            try:
+                outputs = pool.map(_evaluate, tasks, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            _init_worker(*args)
+            outputs = [_evaluate(task) for task in tasks]
+
+        scores = pd.DataFrame([OrderedDict([('model', self.candidates[c][0]),
+                                            ('threshold', 'none' if thr is None else thr),
+                                            ('params', str(params)), ('n_estimators', n), ('fold', fold),
+                                            ('fbeta', fb), ('fit_time', fit_time)])
+                               for rows in outputs for c, params, thr, fold, n, fb, fit_time in rows])
+        scores['n_estimators'] = scores['n_estimators'].fillna(0).astype(int)
+        results = (scores.groupby(['model', 'threshold', 'params', 'n_estimators'], sort=False)
+                   .agg(fbeta_mean=('fbeta', 'mean'), fbeta_std=('fbeta', 'std'),
+                        fit_time_mean=('fit_time', 'mean'), fit_time_total=('fit_time', 'sum'))
+                   .reset_index()
+                   .sort_values('fbeta_mean', ascending=False, kind='mergesort')
+                   .reset_index(drop=True))
+        return results
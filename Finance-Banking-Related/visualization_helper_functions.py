@@ -0,0 +1,206 @@
+# libraries required
+from __future__ import print_function
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from matplotlib import pyplot as plt
+
+
+class FrequencyTables(object):
+    '''Class-conditional frequency tables of categorical attributes, built in one pass:
+
+    Every (chunk of) data is scanned once: the attribute and class values are
+    factorized into codes of global vocabularies, and all the attribute x class
+    contingency tables are counted with a single vectorized `np.bincount`.
+    Partial tables of data chunks (or of worker processes) are combined with
+    `merge`, so the full loan book can be profiled without repeated scans.
+
+    Usage
+    -----
+    tables = FrequencyTables(categ_attribs, 'credit_risk')
+    for chunk in pd.read_csv(path, chunksize=100000):
+        tables.partial_fit(chunk)
+    tables.table('checking_acc_status')
+
+    Parameters
+    ----------
+    attribs: list of strings
+        The categorical attributes, e.g. categ_attribs.
+    class_attrib: string
+        The class attribute, e.g. 'credit_risk'.
+    '''
+    def __init__(self, attribs, class_attrib):
+        self.attribs = list(attribs)
+        self.class_attrib = class_attrib
+        self.values = OrderedDict((attrib, []) for attrib in self.attribs + [class_attrib])
+        self._ids = dict((attrib, {}) for attrib in self.values)
+        self.ordered = dict((attrib, False) for attrib in self.values)
+        self.counts = OrderedDict((attrib, np.zeros((0, 0), dtype=np.int64)) for attrib in self.attribs)
+        self.num_records = 0
+
+    def _add_values(self, attrib, values):
+        ids, labels = self._ids[attrib], self.values[attrib]
+        mapping = np.empty(len(values), dtype=np.int64)
+        for i, value in enumerate(values):
+            if value not in ids:
+                ids[value] = len(labels)
+                labels.append(value)
+            mapping[i] = ids[value]
+        return mapping
+
+    def _codes(self, attrib, column):
+        # codes of the global vocabulary (-1 for missing values)
+        if hasattr(column, 'cat'):
+            # keep the (possibly unobserved) categories, in their order
+            self.ordered[attrib] = self.ordered[attrib] or bool(column.cat.ordered)
+            chunk_codes, uniques = column.cat.codes.values, column.cat.categories
+        else:
+            chunk_codes, uniques = pd.factorize(column.values)
+        mapping = self._add_values(attrib, list(uniques))
+        return np.where(chunk_codes >= 0, mapping[np.maximum(chunk_codes, 0)], -1)
+
+    def _resize(self):
+        n_classes = len(self.values[self.class_attrib])
+        for attrib in self.attribs:
+            counts = self.counts[attrib]
+            shape = (len(self.values[attrib]), n_classes)
+            if counts.shape != shape:
+                resized = np.zeros(shape, dtype=np.int64)
+                resized[:counts.shape[0], :counts.shape[1]] = counts
+                self.counts[attrib] = resized
+
+    def partial_fit(self, data_chunk):
+        '''Add the counts of a chunk of data (a DataFrame).'''
+        class_codes = self._codes(self.class_attrib, data_chunk[self.class_attrib])
+        attrib_codes = [self._codes(attrib, data_chunk[attrib]) for attrib in self.attribs]
+        self._resize()
+
+        # all the tables are laid out in one flat array: one bincount per chunk
+        n_classes = len(self.values[self.class_attrib])
+        sizes = [self.counts[attrib].size for attrib in self.attribs]
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+        flat_ids = []
+        for offset, codes in zip(offsets, attrib_codes):
+            valid = (codes >= 0) & (class_codes >= 0)
+            flat_ids.append(offset + codes[valid] * n_classes + class_codes[valid])
+        flat_counts = np.bincount(np.concatenate(flat_ids), minlength=offsets[-1]) if flat_ids else []
+
+        for attrib, start, stop in zip(self.attribs, offsets[:-1], offsets[1:]):
+            self.counts[attrib] += flat_counts[start:stop].reshape(self.counts[attrib].shape)
+        self.num_records += len(data_chunk)
+        return self
+
+    def fit(self, data, chunksize=None):
+        '''Count a DataFrame (in chunks of `chunksize` rows), or an iterable of DataFrame chunks.'''
+        if isinstance(data, pd.DataFrame):
+            chunksize = chunksize or max(len(data), 1)
+            data = [data.iloc[start:start + chunksize] for start in range(0, len(data), chunksize)]
+        for data_chunk in data:
+            self.partial_fit(data_chunk)
+        return self
+
+    def merge(self, other):
+        '''Add the counts of another FrequencyTables (e.g. of another chunk or worker).'''
+        mappings = {}
+        for attrib in self.values:
+            self.ordered[attrib] = self.ordered[attrib] or other.ordered[attrib]
+            mappings[attrib] = self._add_values(attrib, other.values[attrib])
+        self._resize()
+        class_mapping = mappings[self.class_attrib]
+        for attrib in self.attribs:
+            rows = np.repeat(mappings[attrib], len(class_mapping))
+            cols = np.tile(class_mapping, len(mappings[attrib]))
+            np.add.at(self.counts[attrib], (rows, cols), other.counts[attrib].ravel())
+        self.num_records += other.num_records
+        return self
+
+    def _sorted(self, attrib):
+        # categorical vocabularies keep their order, the others are sorted when possible
+        positions = np.arange(len(self.values[attrib]))
+        if not self.ordered[attrib]:
+            try:
+                positions = np.array(sorted(positions, key=lambda i: self.values[attrib][i]), dtype=int)
+            except TypeError:
+                pass
+        return positions
+
+    def table(self, attrib, drop_empty=True):
+        '''The frequency table of an attribute:
+
+        Returns
+        -------
+        table: DataFrame
+            Indexed by (attrib value, class value), with the 'count' and the (within class)
+            'frequency' columns.
+        '''
+        rows, cols = self._sorted(attrib), self._sorted(self.class_attrib)
+        counts = self.counts[attrib][np.ix_(rows, cols)]
+        class_totals = counts.sum(axis=0)
+        frequency = counts / np.where(class_totals > 0, class_totals, 1).astype(float)
+        index = pd.MultiIndex.from_product([[self.values[attrib][i] for i in rows],
+                                            [self.values[self.class_attrib][j] for j in cols]],
+                                           names=[attrib, self.class_attrib])
+        table = pd.DataFrame({'count': counts.ravel(), 'frequency': frequency.ravel()}, index=index)
+        if drop_empty:
+            observed = counts.sum(axis=1) > 0
+            table = table[np.repeat(observed, len(cols))]
+        return table
+
+    def num_unique(self, attrib):
+        return int((self.counts[attrib].sum(axis=1) > 0).sum())
+
+    def tables(self):
+        return OrderedDict((attrib, self.table(attrib)) for attrib in self.attribs)
+
+
+def freq_tables(data_df, attribs, class_attrib, barplot=False, matplotlib_style=None, chunksize=None):
+    '''Print (and plot) the class-conditional frequency tables of categorical attributes:
+
+    All the tables are computed in one pass over the data (see `FrequencyTables`).
+
+    Parameters
+    ----------
+    data_df: DataFrame, iterable of DataFrame chunks, or FrequencyTables
+        The data (or their already computed tables).
+    attribs: list of strings
+        The categorical attributes, e.g. categ_attribs.
+    class_attrib: string
+        The class attribute, e.g. 'credit_risk'.
+    barplot: boolean
+        Barplot every frequency table.
+    matplotlib_style: string, optional
+        The matplotlib style of the barplots, e.g. 'seaborn-whitegrid'.
+    chunksize: int, optional
+        The number of rows counted at once.
+
+    Returns
+    -------
+    tables: OrderedDict
+        attrib -> frequency table (DataFrame)
+    '''
+    if isinstance(data_df, FrequencyTables):
+        engine = data_df
+    else:
+        engine = FrequencyTables(attribs, class_attrib).fit(data_df, chunksize=chunksize)
+
+    tables = OrderedDict()
+    for attrib in attribs:
+        s = 'Attribute: \'%s\':' % attrib
+        print(s)
+        print('-' * (len(s) + 3))
+        print('Check the uniqueness of \'%s\' attribute values...\n' % attrib)
+        print('Found %d unique values in %d record lines.\n' % (engine.num_unique(attrib), engine.num_records))
+        print('Prints a frequency table of (\'%s\', \'%s\') values...\n' % (attrib, class_attrib))
+        tables[attrib] = engine.table(attrib)
+        print(tables[attrib])
+        print('\n')
+
+        if barplot:
+            with plt.style.context(matplotlib_style or 'default'):
+                fig, ax = plt.subplots()
+                tables[attrib]['frequency'].unstack(class_attrib).plot.bar(ax=ax, rot=0)
+                ax.set_ylabel('frequency')
+                ax.set_title('\'%s\' Frequencies per \'%s\' Class' % (attrib, class_attrib))
+                plt.show()
+    return tables
@@ -1,3 +1,5 @@
+import os
+import time
 import numpy as np
 import pandas as pd
 import xgboost as xgb
@@ -137,6 +139,170 @@ def remove_collinear_predictors(train, test, attribs_of_interest, threshold=0.9)
     return train, test
 
 
+class BoosterCheckpoint(xgb.callback.TrainingCallback):
+    """
+    Training callback checkpointing the booster every `every_rounds` rounds
+    (written to a temporary file and atomically renamed) and logging the eval
+    metrics every `log_every` rounds as CSV rows (round, <data>-<metric>, ...).
+
+    Early stopping is done here rather than by `early_stopping_rounds`: the best
+    score and iteration are kept as booster attributes, so they are saved with
+    the checkpoints and survive a resumed session. A session also stops (after
+    a checkpoint) once it has run `max_seconds`, e.g. to stay below a kernel
+    runtime limit; the next session resumes from the checkpoint.
+
+    Requires xgboost >= 1.6 (`TrainingCallback`, `num_boosted_rounds`,
+    `iteration_range` and the .ubj model format).
+    """
+
+    def __init__(self, path, every_rounds=100, metrics_path=None, log_every=50,
+                 early_stopping_rounds=None, maximize=None, max_seconds=None):
+        self.path = path
+        self.every_rounds = int(every_rounds)
+        self.metrics_path = metrics_path
+        self.log_every = int(log_every)
+        self.early_stopping_rounds = early_stopping_rounds
+        self.maximize = maximize
+        self.max_seconds = max_seconds
+        self.status = None
+        super(BoosterCheckpoint, self).__init__()
+
+    def save(self, model):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # (the model format follows the file extension)
+        root, ext = os.path.splitext(self.path)
+        tmp_path = root + '.tmp' + ext
+        model.save_model(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def _log(self, rnd, evals_log):
+        columns = ['%s-%s' % (data, metric) for data, metrics in evals_log.items() for metric in metrics]
+        values = [metrics[metric][-1] for metrics in evals_log.values() for metric in metrics]
+        values = [value[0] if isinstance(value, tuple) else value for value in values]
+        write_header = not os.path.exists(self.metrics_path) or os.path.getsize(self.metrics_path) == 0
+        with open(self.metrics_path, 'a') as f:
+            if write_header:
+                f.write(','.join(['round'] + columns) + '\n')
+            f.write(','.join(['%d' % rnd] + ['%.6g' % value for value in values]) + '\n')
+
+    def before_training(self, model):
+        self._start = model.num_boosted_rounds()
+        self._start_time = time.time()
+        self._last = (self._start, None)
+        self._logged = None
+        self.status = 'running'
+        # drop the metrics logged after the checkpoint resumed from (all of them for a new run)
+        if self.metrics_path is not None and os.path.exists(self.metrics_path):
+            with open(self.metrics_path) as f:
+                lines = f.readlines()
+            kept = lines[:1] + [line for line in lines[1:] if int(line.split(',', 1)[0]) <= self._start]
+            with open(self.metrics_path, 'w') as f:
+                f.writelines(kept if self._start else [])
+        return model
+
+    def after_iteration(self, model, epoch, evals_log):
+        # rounds are counted from 1, across the resumed sessions
+        rnd = self._start + epoch + 1
+        stop = False
+        if evals_log:
+            # the last metric of the last evaluation data set decides, as for xgboost's early stopping
+            data = list(evals_log.keys())[-1]
+            metric = list(evals_log[data].keys())[-1]
+            score = evals_log[data][metric][-1]
+            score = score[0] if isinstance(score, tuple) else score
+            maximize = self.maximize
+            if maximize is None:
+                # (as xgboost's EarlyStopping: 'mape' is the one minimized metric starting with 'map')
+                maximize = metric.startswith(('auc', 'aucpr', 'map', 'ndcg', 'pre')) and metric != 'mape'
+            best_score = model.attr('best_score')
+            if best_score is None or (score > float(best_score) if maximize else score < float(best_score)):
+                model.set_attr(best_score=repr(float(score)), best_iteration=str(rnd - 1))
+            stop = bool(self.early_stopping_rounds) and \
+                rnd - 1 - int(model.attr('best_iteration')) >= self.early_stopping_rounds
+
+            if self.metrics_path is not None and (rnd % self.log_every == 0 or stop):
+                self._log(rnd, evals_log)
+                self._logged = rnd
+
+        if stop:
+            model.set_attr(early_stopped='1')
+            self.status = 'early_stopped'
+        elif self.max_seconds is not None and time.time() - self._start_time >= self.max_seconds:
+            self.status = 'time_limit'
+            stop = True
+        if stop or rnd % self.every_rounds == 0:
+            self.save(model)
+        self._last = (rnd, evals_log)
+        return stop
+
+    def after_training(self, model):
+        # the last round is always checkpointed (and logged)
+        rnd, evals_log = self._last
+        if self.status == 'running':
+            self.status = 'finished'
+            self.save(model)
+        if self.metrics_path is not None and evals_log and self._logged != rnd:
+            self._log(rnd, evals_log)
+        return model
+
+
+def train_checkpointed(params, dtrain, evals, num_boost_round=10000, early_stopping_rounds=50,
+                       checkpoint_path='./xgbtree_checkpoint.ubj', checkpoint_every=100,
+                       metrics_path='./xgbtree_metrics.csv', log_every=50, maximize=None,
+                       max_seconds=None, resume=True):
+    """
+    Train an XGBoost booster with periodic checkpoints, resuming (through
+    `xgb_model`) from the last checkpoint of an interrupted run, if any.
+
+    Parameters
+    ----------
+    num_boost_round : int
+        Total number of boosting rounds, across the resumed sessions.
+    early_stopping_rounds : int or None
+        Stop once the last metric of the last `evals` data set has not improved
+        for that many rounds.
+    checkpoint_every, log_every : int
+        Checkpointing and metrics logging (file and stdout) cadences, in rounds.
+    max_seconds : float or None
+        Checkpoint and stop this session after that many seconds.
+
+    Returns
+    -------
+    booster : xgb.Booster
+        With `best_iteration`/`best_score` attributes; see `predict_best`.
+    """
+    booster = None
+    if resume and os.path.exists(checkpoint_path):
+        booster = xgb.Booster(params, model_file=checkpoint_path)
+        done_rounds = booster.num_boosted_rounds()
+        print('Resuming from the checkpoint of round %d: %s\n' % (done_rounds, checkpoint_path))
+        if booster.attr('early_stopped') == '1' or done_rounds >= num_boost_round:
+            return booster
+        num_boost_round -= done_rounds
+
+    checkpoint = BoosterCheckpoint(checkpoint_path, every_rounds=checkpoint_every, metrics_path=metrics_path,
+                                   log_every=log_every, early_stopping_rounds=early_stopping_rounds,
+                                   maximize=maximize, max_seconds=max_seconds)
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round, evals=evals,
+                        verbose_eval=log_every, xgb_model=booster, callbacks=[checkpoint])
+    if checkpoint.status == 'time_limit':
+        print('Stopped at the time limit after %d rounds, run again to resume.\n' % booster.num_boosted_rounds())
+    return booster
+
+
+def predict_best(booster, data):
+    """
+    Predict with the trees up to the best iteration of `train_checkpointed`
+    (all the trees of a booster without a best iteration).
+    """
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is None:
+        return booster.predict(data)
+    return booster.predict(data, iteration_range=(0, int(best_iteration) + 1))
+
+
 if __name__ == '__main__':
 
     print('Start\n')
@@ -239,13 +405,17 @@ if __name__ == '__main__':
 
     watchlist = [(dtrain, 'train'), (dvaldt, 'eval')]
 
-    xgbtree = xgb.train(params, dtrain, num_boost_round=10000,
-    evals=watchlist, early_stopping_rounds=50, evals_result=None,
-    verbose_eval=True, learning_rates=None, xgb_model=None)
+    # checkpointed every 100 rounds, so that a run stopped at the time limit
+    # (or interrupted) resumes from the last checkpoint when run again
+    xgbtree = train_checkpointed(params, dtrain, watchlist, num_boost_round=10000,
+                                 early_stopping_rounds=50, checkpoint_path='./xgbtree_checkpoint.ubj',
+                                 checkpoint_every=100, metrics_path='./xgbtree_metrics.csv',
+                                 log_every=50, max_seconds=1100)
+    print('Best iteration: %s (eval-logloss: %s)\n' % (xgbtree.attr('best_iteration'), xgbtree.attr('best_score')))
 
-    # PROVIDE THE ACTUAL PREDICTIONS
+    # PROVIDE THE ACTUAL PREDICTIONS (with the trees up to the best iteration)
     print('Providing the actual predictions...\n')
-    test_pred = xgbtree.predict(dtest)
+    test_pred = predict_best(xgbtree, dtest)
 
     print('Start Output\n')
     print('Preparing my submission file...\n')
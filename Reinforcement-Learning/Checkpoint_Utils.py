@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import random
+import numpy as np
+
+
+class TrainingCheckpointer(object):
+    """
+    Periodic checkpoints of long Monte Carlo / TD training runs, so that an
+    interrupted run (e.g. on a pre-emptible batch node) resumes exactly from
+    the last checkpoint instead of starting over.
+
+    A checkpoint is a single `.npz` file holding the learned tables ("q_values",
+    counts, ...), the index of the next episode to run and the state of the
+    random number generators (`numpy.random`, `random` and, optionally, the
+    environment's own `np_random`). Files are written to a temporary file and
+    atomically renamed, so a crash while saving never corrupts the last checkpoint.
+
+    Usage
+    -----
+    ckpt = TrainingCheckpointer('./ckpt/blackjack_off_policy.npz', every_episodes=100000, env=env)
+    start, tables = ckpt.resume(q_values=q_values, q_values_count=q_values_count)
+    for episode in range(start, n_episodes):
+        ...
+        ckpt.maybe_save(episode + 1, q_values=q_values, q_values_count=q_values_count)
+    """
+
+    def __init__(self, path, every_episodes=10000, every_seconds=None, env=None,
+                 compressed=False):
+        self.path = path
+        self.every_episodes = int(every_episodes) if every_episodes else None
+        self.every_seconds = every_seconds
+        self.env = env
+        self.compressed = compressed
+
+        self._next_save = self.every_episodes
+        self._last_save_time = time.time()
+
+    # RNG states
+    def _rng_states(self):
+        states = {}
+        np_state = np.random.get_state()
+        states['rng_numpy_keys'] = np_state[1]
+        states['rng_numpy_meta'] = np.array([np_state[2], np_state[3], np_state[4]])
+
+        py_state = random.getstate()
+        states['rng_random_keys'] = np.asarray(py_state[1], dtype=np.uint64)
+        states['rng_random_meta'] = np.array([py_state[0],
+                                              np.nan if py_state[2] is None else py_state[2]])
+
+        env_rng = getattr(self.env, 'np_random', None) if self.env is not None else None
+        if env_rng is not None:
+            if hasattr(env_rng, 'get_state'):
+                env_state = env_rng.get_state()
+                states['rng_env_keys'] = env_state[1]
+                states['rng_env_meta'] = np.array([env_state[2], env_state[3], env_state[4]])
+            elif hasattr(env_rng, 'bit_generator'):
+                states['rng_env_json'] = np.array(json.dumps(env_rng.bit_generator.state,
+                                                             default=int))
+        return states
+
+    def _restore_rng_states(self, data):
+        meta = data['rng_numpy_meta']
+        np.random.set_state(('MT19937', data['rng_numpy_keys'],
+                             int(meta[0]), int(meta[1]), float(meta[2])))
+
+        meta = data['rng_random_meta']
+        gauss_next = None if np.isnan(meta[1]) else float(meta[1])
+        random.setstate((int(meta[0]), tuple(int(k) for k in data['rng_random_keys']), gauss_next))
+
+        env_rng = getattr(self.env, 'np_random', None) if self.env is not None else None
+        if env_rng is None:
+            return
+        if 'rng_env_keys' in data and hasattr(env_rng, 'set_state'):
+            meta = data['rng_env_meta']
+            env_rng.set_state(('MT19937', data['rng_env_keys'],
+                               int(meta[0]), int(meta[1]), float(meta[2])))
+        elif 'rng_env_json' in data and hasattr(env_rng, 'bit_generator'):
+            env_rng.bit_generator.state = json.loads(str(data['rng_env_json']))
+
+    # Saving
+    def save(self, episode, **tables):
+        """
+        Write a checkpoint: the next episode index, the given arrays and the RNG states.
+        """
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        arrays = dict(('table_' + name, np.asarray(table)) for name, table in tables.items())
+        arrays.update(self._rng_states())
+        arrays['episode'] = np.array(int(episode))
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            if self.compressed:
+                np.savez_compressed(f, **arrays)
+            else:
+                np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+        self._next_save = (int(episode) + self.every_episodes) if self.every_episodes else None
+        self._last_save_time = time.time()
+
+    def maybe_save(self, episode, **tables):
+        """
+        Save a checkpoint only if `every_episodes` episodes or `every_seconds`
+        seconds have passed since the last one. The check is a couple of
+        comparisons, so it can be called after every episode.
+
+        Returns
+        -------
+        saved : bool
+        """
+        due = self._next_save is not None and episode >= self._next_save
+        if not due and self.every_seconds is not None:
+            due = (time.time() - self._last_save_time) >= self.every_seconds
+        if due:
+            self.save(episode, **tables)
+        return due
+
+    # Loading
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self, restore_rng=True):
+        """
+        Read the last checkpoint.
+
+        Returns
+        -------
+        episode : int
+            Index of the next episode to run.
+        tables : dict of ndarrays
+        """
+        with np.load(self.path) as data:
+            episode = int(data['episode'])
+            tables = dict((name[len('table_'):], data[name]) for name in data.files
+                          if name.startswith('table_'))
+            if restore_rng:
+                self._restore_rng_states(data)
+
+        self._next_save = (episode + self.every_episodes) if self.every_episodes else None
+        self._last_save_time = time.time()
+
+        return episode, tables
+
+    def resume(self, **tables):
+        """
+        Restore the given arrays in place (and the RNG states) from the last
+        checkpoint, if there is one.
+
+        Returns
+        -------
+        episode : int
+            Index of the next episode to run (0 if there is no checkpoint).
+        tables : dict of ndarrays
+            The given arrays, updated in place.
+        """
+        if not self.exists():
+            return 0, tables
+
+        episode, saved = self.load()
+        for name, table in tables.items():
+            if name in saved:
+                table[...] = saved[name]
+        print('Resuming from the checkpoint of episode {0:,d}: {1}'.format(episode, self.path))
+
+        return episode, tables
+
+    def remove(self):
+        """
+        Delete the checkpoint (e.g. once the run has completed).
+        """
+        if self.exists():
+            os.remove(self.path)
@@ -0,0 +1,297 @@
+import time
+import numpy as np
+
+
+class DynamicProgrammingUtils(object):
+    """
+    Exact Dynamic Programming solvers (Value and Policy Iteration) for tabular
+    OpenAI Gym environments exposing their transition model as `env.P`, i.e.
+    `env.P[state][action] = [(prob, next_state, reward, done), ...]`
+    (e.g. 'Taxi-v3', 'CliffWalking-v0', 'FrozenLake-v0').
+
+    The transition model is densified once into NumPy arrays, so that every
+    Bellman backup is a single vectorized tensor contraction over all
+    state-action pairs.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self.transitions, self.rewards = self.transition_model(env)
+        self.n_states, self.n_actions = self.rewards.shape
+
+    def transition_model(self, env):
+        """
+        Build the dense transition model of a tabular gym environment.
+
+        Transitions flagged as `done` do not bootstrap on the value of their
+        next state, therefore they only contribute to the expected rewards.
+
+        Parameters
+        ----------
+        env : gym.Env
+            Tabular environment with `P`, `observation_space.n` and `action_space.n`.
+
+        Returns
+        -------
+        transitions : ndarray, shape (n_states, n_actions, n_states)
+            Probability of a non-terminal transition s -(a)-> s'.
+        rewards : ndarray, shape (n_states, n_actions)
+            Expected immediate reward of taking action a in state s.
+        """
+        model = getattr(env, 'P', None)
+        if model is None:
+            model = getattr(env.unwrapped, 'P', None)
+        if model is None:
+            raise ValueError('The environment does not expose a tabular transition model (env.P).')
+
+        n_states = env.observation_space.n
+        n_actions = env.action_space.n
+
+        transitions = np.zeros((n_states, n_actions, n_states))
+        rewards = np.zeros((n_states, n_actions))
+        for state in range(n_states):
+            for action in range(n_actions):
+                for prob, next_state, reward, done in model[state][action]:
+                    rewards[state, action] += prob * reward
+                    if not done:
+                        transitions[state, action, next_state] += prob
+
+        return transitions, rewards
+
+    def bellman_backup(self, s_values, discount=1.):
+        """
+        One synchronous Bellman backup of all state-action values.
+
+        Returns
+        -------
+        q_values : ndarray, shape (n_states, n_actions)
+            q(s,a) = r(s,a) + discount * sum_s' p(s'|s,a) v(s')
+        """
+        return self.rewards + discount * (self.transitions @ s_values)
+
+    def value_iteration(self, discount=1., theta=1e-8, max_iterations=10000):
+        """
+        Compute the optimal state-values, action-values and a deterministic
+        optimal policy with (synchronous) Value Iteration.
+
+        Parameters
+        ----------
+        discount : float
+            Discount factor of the MDP.
+        theta : float
+            Stop when the largest state-value change of a sweep falls below theta.
+        max_iterations : int
+            Upper bound on the number of sweeps (guards against episodic tasks
+            with improper policies and discount=1).
+
+        Returns
+        -------
+        s_values : ndarray, shape (n_states,)
+            Optimal state-value function V*.
+        q_values : ndarray, shape (n_states, n_actions)
+            Optimal action-value function Q*.
+        policy : ndarray of ints, shape (n_states,)
+            Greedy optimal policy π* w.r.t. Q*.
+        """
+        s_values = np.zeros(self.n_states)
+        for _ in range(int(max_iterations)):
+            q_values = self.bellman_backup(s_values, discount)
+            new_s_values = q_values.max(axis=1)
+            delta = np.max(np.abs(new_s_values - s_values))
+            s_values = new_s_values
+            if delta < theta:
+                break
+
+        q_values = self.bellman_backup(s_values, discount)
+        policy = np.argmax(q_values, axis=1)
+
+        return s_values, q_values, policy
+
+    def policy_evaluation(self, policy, discount=1., theta=1e-8, max_iterations=10000,
+                          s_values=None):
+        """
+        Iterative (vectorized) evaluation of a deterministic policy.
+
+        Parameters
+        ----------
+        policy : array_like of ints, shape (n_states,)
+            Action taken in every state.
+        s_values : ndarray, shape (n_states,), optional
+            Initial estimate of the state-values (warm start).
+
+        Returns
+        -------
+        s_values : ndarray, shape (n_states,)
+            State-value function of the policy.
+        """
+        states = np.arange(self.n_states)
+        policy = np.asarray(policy, dtype=int)
+        transitions_pi = self.transitions[states, policy, :]
+        rewards_pi = self.rewards[states, policy]
+
+        if s_values is None:
+            s_values = np.zeros(self.n_states)
+        for _ in range(int(max_iterations)):
+            new_s_values = rewards_pi + discount * (transitions_pi @ s_values)
+            delta = np.max(np.abs(new_s_values - s_values))
+            s_values = new_s_values
+            if delta < theta:
+                break
+
+        return s_values
+
+    def policy_iteration(self, discount=1., theta=1e-8, max_iterations=1000,
+                         max_evaluation_iterations=10000, policy=None):
+        """
+        Compute the optimal state-values, action-values and a deterministic
+        optimal policy with Policy Iteration.
+
+        Parameters
+        ----------
+        discount : float
+            Discount factor of the MDP.
+        theta : float
+            Accuracy of every policy evaluation step.
+        max_iterations : int
+            Upper bound on the number of policy improvement steps.
+        max_evaluation_iterations : int
+            Upper bound on the number of sweeps of every policy evaluation step.
+        policy : array_like of ints, shape (n_states,), optional
+            Initial policy (e.g. the greedy policy of a learned "q_values" table).
+
+        Returns
+        -------
+        s_values, q_values, policy : see `value_iteration`
+        """
+        if policy is None:
+            policy = np.zeros(self.n_states, dtype=int)
+        policy = np.asarray(policy, dtype=int)
+
+        s_values = None
+        for _ in range(int(max_iterations)):
+            s_values = self.policy_evaluation(policy, discount=discount, theta=theta,
+                                              max_iterations=max_evaluation_iterations,
+                                              s_values=s_values)
+            q_values = self.bellman_backup(s_values, discount)
+            # keep the current action on ties, so that the loop terminates
+            current = q_values[np.arange(self.n_states), policy]
+            improved = q_values.max(axis=1) > current + theta
+            if not improved.any():
+                break
+            policy = np.where(improved, np.argmax(q_values, axis=1), policy)
+
+        q_values = self.bellman_backup(s_values, discount)
+
+        return s_values, q_values, policy
+
+    def optimal_action_mask(self, q_star, tolerance=1e-6):
+        """
+        Boolean (n_states, n_actions) mask of all the optimal actions per state.
+        """
+        return q_star >= (q_star.max(axis=1, keepdims=True) - tolerance)
+
+    def policy_distance(self, q_values, q_star, states=None, tolerance=1e-6):
+        """
+        Fraction of states where the greedy action of a learned "q_values" table
+        is not optimal (ties of Q* count as optimal).
+
+        It costs a single vectorized argmax, so it can be logged every N episodes
+        of a training sweep without slowing it down.
+
+        Parameters
+        ----------
+        q_values : ndarray, shape (n_states, n_actions) or reshapeable to it
+            Learned action-values.
+        q_star : ndarray, shape (n_states, n_actions)
+            Optimal action-values (e.g. from `value_iteration`).
+        states : array_like, optional
+            Boolean mask or indices of the states to consider (e.g. excluding
+            the cliff and goal cells of the Cliff-Walking grid-world).
+        tolerance : float
+            Absolute tolerance within which actions are considered optimal.
+
+        Returns
+        -------
+        distance : float in [0, 1]
+        """
+        q_values = np.asarray(q_values).reshape(q_star.shape)
+        greedy = np.argmax(q_values, axis=1)
+        optimal = self.optimal_action_mask(q_star, tolerance)
+        is_optimal = optimal[np.arange(q_star.shape[0]), greedy]
+        if states is not None:
+            is_optimal = is_optimal[states]
+
+        return 1. - is_optimal.mean()
+
+    def policy_regret(self, q_values, q_star, states=None, weights=None):
+        """
+        One-step regret of the greedy policy of a learned "q_values" table,
+        i.e. the (weighted) average of V*(s) - Q*(s, argmax_a q(s,a)).
+
+        Parameters
+        ----------
+        q_values : ndarray, shape (n_states, n_actions) or reshapeable to it
+            Learned action-values.
+        q_star : ndarray, shape (n_states, n_actions)
+            Optimal action-values.
+        states : array_like, optional
+            Boolean mask or indices of the states to consider.
+        weights : array_like, optional
+            State distribution to average over (e.g. `env.isd`, the initial
+            state distribution of the gym toy-text environments).
+
+        Returns
+        -------
+        regret : float (>= 0)
+        """
+        q_values = np.asarray(q_values).reshape(q_star.shape)
+        greedy = np.argmax(q_values, axis=1)
+        gaps = q_star.max(axis=1) - q_star[np.arange(q_star.shape[0]), greedy]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+        if states is not None:
+            gaps = gaps[states]
+            if weights is not None:
+                weights = weights[states]
+
+        return float(np.average(gaps, weights=weights))
+
+    def policy_value_regret(self, q_values, s_star, discount=1., weights=None,
+                            max_iterations=10000):
+        """
+        Exact regret V*(s) - V^π(s) of the greedy policy π of a learned "q_values"
+        table, averaged over a state distribution (default: `env.isd` if the
+        environment provides it, else uniform).
+
+        More expensive than `policy_regret` since it evaluates π exactly.
+        """
+        q_values = np.asarray(q_values).reshape((self.n_states, self.n_actions))
+        policy = np.argmax(q_values, axis=1)
+        s_values = self.policy_evaluation(policy, discount=discount,
+                                          max_iterations=max_iterations)
+        if weights is None:
+            weights = getattr(self.env.unwrapped, 'isd', None)
+
+        return float(np.average(s_star - s_values, weights=weights))
+
+    def solve(self, env=None, method='value_iteration', discount=1., **kwargs):
+        """
+        Convenience wrapper timing an exact solution of the MDP.
+
+        Returns
+        -------
+        s_values, q_values, policy : see `value_iteration`
+        """
+        if env is not None and env is not self.env:
+            self.__init__(env)
+
+        solvers = {'value_iteration': self.value_iteration,
+                   'policy_iteration': self.policy_iteration}
+        if method not in solvers:
+            raise ValueError("method should be one of {}".format(list(solvers.keys())))
+
+        start = time.time()
+        s_values, q_values, policy = solvers[method](discount=discount, **kwargs)
+        print('Exact {0} solution computed in {1:.2f} ms.'.format(method, 1e3 * (time.time() - start)))
+
+        return s_values, q_values, policy
@@ -0,0 +1,287 @@
+import numpy as np
+
+
+def _reset(env):
+    # gym >= 0.26 returns (obs, info)
+    out = env.reset()
+    if isinstance(out, tuple) and len(out) == 2 and isinstance(out[1], dict):
+        return out[0]
+    return out
+
+
+def _step(env, action):
+    # gym >= 0.26 returns (obs, reward, terminated, truncated, info)
+    out = env.step(action)
+    if len(out) == 5:
+        obs, reward, terminated, truncated, _ = out
+        return obs, reward, terminated or truncated
+    obs, reward, done, _ = out
+    return obs, reward, done
+
+
+class BatchImportanceSampling(object):
+    """
+    Vectorized off-policy Monte Carlo (importance sampling) estimators for the
+    'Blackjack-v0' environment.
+
+    Episodes are stored as padded (episode x step) arrays of states, actions,
+    rewards and behavior probabilities. The returns G_t are computed with a
+    reverse (discounted) cumulative sum, the importance sampling weights
+    W_t = prod_{k>t} π(A_k|S_k) / b(A_k|S_k) with a reverse cumulative product,
+    and all the updates are applied in bulk with `np.bincount`.
+
+    The "q_values" tables follow the layout used in the Blackjack notebook,
+    i.e. q_values[player_sum - 12, dealer_card - 1, usable_ace, action].
+    States with a player sum lower than 12 (where hitting is trivially
+    optimal) take part in the importance sampling ratios but are not estimated.
+    """
+
+    def __init__(self, env, state_shape=(10, 10, 2), state_offset=(12, 1, 0), discount=1.):
+        self.env = env
+        self.state_shape = tuple(state_shape)
+        self.state_offset = np.asarray(state_offset)
+        self.n_states = int(np.prod(self.state_shape))
+        self.n_actions = env.action_space.n
+        self.discount = discount
+        self.reset()
+
+    def reset(self):
+        """
+        Forget all the accumulated estimates.
+        """
+        n_pairs = self.n_states * self.n_actions
+        # weighted IS: cumulative weights C(s,a) and estimates Q(s,a)
+        self.c_weights = np.zeros(n_pairs)
+        self.q_weighted = np.zeros(n_pairs)
+        # ordinary IS: number of visits N(s,a) and sum of weighted returns
+        self.n_visits = np.zeros(n_pairs)
+        self.sum_weighted_returns = np.zeros(n_pairs)
+
+    def encode_states(self, states):
+        """
+        Map (..., 3) arrays of (player_sum, dealer_card, usable_ace) observations
+        to flat state indices.
+
+        Returns
+        -------
+        state_idx : ndarray of ints
+            Flat index of every state (0 for the invalid ones).
+        valid : ndarray of bools
+            Whether the state lies in the estimated part of the state space.
+        """
+        coords = np.asarray(states, dtype=int) - self.state_offset
+        valid = np.all((coords >= 0) & (coords < np.asarray(self.state_shape)), axis=-1)
+        coords = np.where(valid[..., None], coords, 0)
+        state_idx = np.ravel_multi_index(np.moveaxis(coords, -1, 0), self.state_shape)
+        return state_idx, valid
+
+    def policy_table(self, policy):
+        """
+        Tabulate a notebook-style policy callable, `policy(obs) -> (action, prob)`,
+        into an (n_states, n_actions) array of action probabilities π(a|s).
+        Deterministic policies are assumed, as is the case for `target_default_policy`.
+        """
+        table = np.zeros((self.n_states, self.n_actions))
+        for state_idx in range(self.n_states):
+            coords = np.unravel_index(state_idx, self.state_shape)
+            obs = tuple(int(c + o) for c, o in zip(coords, self.state_offset))
+            obs = obs[:-1] + (bool(obs[-1]),)
+            action, _ = policy(obs)
+            table[state_idx, action] = 1.
+        return table
+
+    def generate_episodes(self, env, behavior_policy, n_episodes, max_steps=50):
+        """
+        Roll out episodes with a behavior policy, `behavior_policy(obs) -> (action, prob)`,
+        and store them as padded (n_episodes x max_steps) arrays.
+        Both the old (4-tuple step) and the new (gym >= 0.26) environment APIs are supported.
+
+        Returns
+        -------
+        episodes : dict of ndarrays
+            'states' (n_episodes, max_steps, 3), 'actions', 'rewards',
+            'behavior_probs' (n_episodes, max_steps) and 'lengths' (n_episodes,).
+        """
+        n_episodes = int(n_episodes)
+        states = np.zeros((n_episodes, max_steps, 3), dtype=np.int8)
+        actions = np.zeros((n_episodes, max_steps), dtype=np.int8)
+        rewards = np.zeros((n_episodes, max_steps))
+        behavior_probs = np.ones((n_episodes, max_steps))
+        lengths = np.zeros(n_episodes, dtype=np.int32)
+
+        for episode in range(n_episodes):
+            obs = _reset(env)
+            for step in range(max_steps):
+                action, prob = behavior_policy(obs)
+                states[episode, step] = obs
+                actions[episode, step] = action
+                behavior_probs[episode, step] = prob
+                obs, reward, done = _step(env, action)
+                rewards[episode, step] = reward
+                if done:
+                    break
+            lengths[episode] = step + 1
+
+        return {'states': states, 'actions': actions, 'rewards': rewards,
+                'behavior_probs': behavior_probs, 'lengths': lengths}
+
+    def returns(self, rewards):
+        """
+        Discounted returns G_t = R_{t+1} + discount * G_{t+1} of padded reward arrays.
+        """
+        if self.discount == 1.:
+            return np.cumsum(rewards[:, ::-1], axis=1)[:, ::-1]
+
+        returns = np.zeros_like(rewards, dtype=float)
+        g = np.zeros(rewards.shape[0])
+        for step in range(rewards.shape[1] - 1, -1, -1):
+            g = rewards[:, step] + self.discount * g
+            returns[:, step] = g
+        return returns
+
+    def importance_weights(self, target_probs, behavior_probs, mask):
+        """
+        Importance sampling weights W_t = prod_{k>t} π(A_k|S_k) / b(A_k|S_k),
+        the weights of the action-value estimates of the (S_t, A_t) pairs.
+        Padded steps contribute a unit ratio.
+        """
+        ratios = np.where(mask, target_probs / behavior_probs, 1.)
+        tail = np.cumprod(ratios[:, ::-1], axis=1)[:, ::-1]
+        weights = np.ones_like(tail)
+        weights[:, :-1] = tail[:, 1:]
+        return weights
+
+    def _accumulate(self, episodes, target_table):
+        n_steps = episodes['actions'].shape[1]
+        mask = np.arange(n_steps)[None, :] < episodes['lengths'][:, None]
+        state_idx, valid = self.encode_states(episodes['states'])
+        actions = episodes['actions'].astype(int)
+
+        # steps outside the estimated state space follow the "hit" action of the target
+        target_probs = np.where(valid, target_table[state_idx, actions], (actions == 1).astype(float))
+        weights = self.importance_weights(target_probs, episodes['behavior_probs'], mask)
+        returns = self.returns(episodes['rewards'])
+
+        update = mask & valid
+        pairs = (state_idx * self.n_actions + actions)[update]
+        n_pairs = self.n_states * self.n_actions
+        batch_weights = np.bincount(pairs, weights=weights[update], minlength=n_pairs)
+        batch_weighted_returns = np.bincount(pairs, weights=(weights * returns)[update],
+                                             minlength=n_pairs)
+        batch_visits = np.bincount(pairs, minlength=n_pairs)
+
+        # weighted IS: Q <- (C Q + sum W G) / (C + sum W), identical to the incremental rule
+        new_c_weights = self.c_weights + batch_weights
+        seen = new_c_weights > 0
+        self.q_weighted[seen] = ((self.c_weights[seen] * self.q_weighted[seen] +
+                                  batch_weighted_returns[seen]) / new_c_weights[seen])
+        self.c_weights = new_c_weights
+        # ordinary IS
+        self.n_visits += batch_visits
+        self.sum_weighted_returns += batch_weighted_returns
+
+    def q_values(self, weighted=True):
+        """
+        Current action-value estimates in the notebook layout
+        (player_sum - 12, dealer_card - 1, usable_ace, action).
+        """
+        if weighted:
+            q_values = self.q_weighted
+        else:
+            q_values = np.divide(self.sum_weighted_returns, self.n_visits,
+                                 out=np.zeros_like(self.sum_weighted_returns),
+                                 where=self.n_visits > 0)
+        return q_values.reshape(self.state_shape + (self.n_actions,)).copy()
+
+    def _resume(self, checkpointer):
+        if checkpointer is None:
+            return 0
+        start, _ = checkpointer.resume(**self._tables())
+        return start
+
+    def _tables(self):
+        return {'c_weights': self.c_weights, 'q_weighted': self.q_weighted,
+                'n_visits': self.n_visits, 'sum_weighted_returns': self.sum_weighted_returns}
+
+    def off_policy_prediction(self, env, behavior_policy, target_policy, n_episodes,
+                              batch_size=10000, weighted=True, episodes=None,
+                              checkpointer=None):
+        """
+        Off-policy every-visit MC prediction of the action-values of a target policy.
+
+        Parameters
+        ----------
+        env : gym.Env
+            The 'Blackjack-v0' environment.
+        behavior_policy : callable
+            `behavior_policy(obs) -> (action, prob)` generating the episodes,
+            e.g. `behavior_random_policy`.
+        target_policy : callable or ndarray
+            `target_policy(obs) -> (action, prob)` (e.g. `target_default_policy`),
+            or an (n_states, n_actions) table of π(a|s).
+        n_episodes : int
+            Number of episodes to generate (ignored if `episodes` is given).
+        batch_size : int
+            Number of episodes per vectorized update.
+        weighted : bool
+            Return the weighted (True) or ordinary (False) IS estimates.
+        episodes : dict of ndarrays, optional
+            Pre-generated padded episodes (see `generate_episodes`).
+        checkpointer : TrainingCheckpointer, optional
+            Resume from its last checkpoint and save after every batch it deems due
+            (see `Checkpoint_Utils.py`).
+
+        Returns
+        -------
+        q_values : ndarray, shape (10, 10, 2, n_actions)
+        """
+        target_table = (target_policy if isinstance(target_policy, np.ndarray)
+                        else self.policy_table(target_policy))
+
+        if episodes is not None:
+            self._accumulate(episodes, target_table)
+        else:
+            n_episodes = int(n_episodes)
+            for start in range(self._resume(checkpointer), n_episodes, batch_size):
+                n_batch = min(batch_size, n_episodes - start)
+                batch = self.generate_episodes(env, behavior_policy, n_batch)
+                self._accumulate(batch, target_table)
+                if checkpointer is not None:
+                    checkpointer.maybe_save(start + n_batch, **self._tables())
+
+        return self.q_values(weighted)
+
+    def off_policy_control(self, env, behavior_policy, n_episodes, batch_size=10000,
+                           checkpointer=None):
+        """
+        Off-policy every-visit MC control with weighted importance sampling.
+
+        The greedy target policy is kept fixed within a batch of episodes
+        (evaluated in bulk) and improved between batches, i.e. a batched form
+        of generalized policy iteration. With `batch_size=1` it reduces to the
+        per-episode algorithm. An optional `checkpointer` (TrainingCheckpointer)
+        makes the run resumable from its last saved batch.
+
+        Returns
+        -------
+        q_values : ndarray, shape (10, 10, 2, n_actions)
+        pi_values : ndarray of ints, shape (10, 10, 2)
+            Greedy target policy.
+        """
+        n_episodes = int(n_episodes)
+        start = self._resume(checkpointer)
+        greedy = np.argmax(self.q_weighted.reshape(self.n_states, self.n_actions), axis=1)
+        for start in range(start, n_episodes, batch_size):
+            target_table = np.zeros((self.n_states, self.n_actions))
+            target_table[np.arange(self.n_states), greedy] = 1.
+            n_batch = min(batch_size, n_episodes - start)
+            batch = self.generate_episodes(env, behavior_policy, n_batch)
+            self._accumulate(batch, target_table)
+            greedy = np.argmax(self.q_weighted.reshape(self.n_states, self.n_actions), axis=1)
+            if checkpointer is not None:
+                checkpointer.maybe_save(start + n_batch, **self._tables())
+
+        q_values = self.q_values(weighted=True)
+        pi_values = greedy.reshape(self.state_shape)
+
+        return q_values, pi_values
@@ -0,0 +1,364 @@
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from collections import OrderedDict
+
+
+class _NullTimer(object):
+    """
+    Do-nothing context manager returned by a disabled profiler.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _PhaseTimer(object):
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class TrainingProfiler(object):
+    """
+    Opt-in, per-phase timers and counters for the RL training loops.
+
+    The phases of interest (`env.step`, action selection with `behavior_policy` /
+    `epsilon_greedy_policy`, Q updates) are timed either by wrapping the
+    callables (`wrap`, `instrument_env`) or with `timer(name)` blocks. When the
+    profiler is disabled `wrap` returns the callable itself and `timer` a shared
+    no-op context manager, so the instrumented code runs at (nearly) full speed.
+
+    Usage
+    -----
+    prof = TrainingProfiler(enabled=True)
+    env = prof.instrument_env(env)
+    policy = prof.wrap(TD.epsilon_greedy_policy, 'action_selection')
+    prof.start()
+    for episode in range(n_episodes):
+        ...
+        with prof.timer('q_update'):
+            q_values[state, action] += step_size * (target - q_values[state, action])
+        ...
+        prof.episode_done(n_steps)
+    prof.stop()
+    prof.summary(title='SARSA trial_1')
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.times = OrderedDict()
+        self.calls = OrderedDict()
+        self.counters = OrderedDict()
+        self.episodes = 0
+        self.steps = 0
+        self._wall_start = None
+        self.wall_time = 0.
+
+    def _add(self, name, elapsed):
+        self.times[name] = self.times.get(name, 0.) + elapsed
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    # Instrumentation
+    def timer(self, name):
+        """
+        Context manager timing the enclosed block under the phase `name`.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _PhaseTimer(self, name)
+
+    def wrap(self, fn, name):
+        """
+        Return `fn` timed under the phase `name` (or `fn` itself if disabled).
+        """
+        if not self.enabled:
+            return fn
+        perf_counter = time.perf_counter
+        add = self._add
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                add(name, perf_counter() - start)
+        timed.__wrapped__ = fn
+        return timed
+
+    def instrument_env(self, env, name='env.step'):
+        """
+        Time every `env.step` call of a gym environment (in place).
+        """
+        if self.enabled and not hasattr(env.step, '__wrapped__'):
+            env.step = self.wrap(env.step, name)
+        return env
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def episode_done(self, n_steps=0):
+        if self.enabled:
+            self.episodes += 1
+            self.steps += n_steps
+
+    def start(self):
+        self._wall_start = time.perf_counter()
+
+    def stop(self):
+        if self._wall_start is not None:
+            self.wall_time += time.perf_counter() - self._wall_start
+            self._wall_start = None
+
+    # Reporting
+    def stats(self):
+        """
+        Dictionary of throughput and per-phase statistics.
+        """
+        wall_time = self.wall_time
+        if self._wall_start is not None:
+            wall_time += time.perf_counter() - self._wall_start
+
+        phases = OrderedDict()
+        for name, total in self.times.items():
+            phases[name] = {'calls': self.calls[name], 'total_s': total,
+                            'mean_us': 1e6 * total / self.calls[name],
+                            'pct_wall': 100. * total / wall_time if wall_time > 0 else np.nan}
+        return {'wall_s': wall_time, 'episodes': self.episodes, 'steps': self.steps,
+                'episodes_per_s': self.episodes / wall_time if wall_time > 0 else np.nan,
+                'steps_per_s': self.steps / wall_time if wall_time > 0 else np.nan,
+                'phases': phases, 'counters': dict(self.counters)}
+
+    def summary(self, title=None, file=None):
+        """
+        Print a summary table of the trial and return its statistics.
+        """
+        file = sys.stdout if file is None else file
+        stats = self.stats()
+        if title is not None:
+            print(title, file=file)
+        print('{0:,d} episodes, {1:,d} steps in {2:.2f}s '
+              '({3:,.1f} episodes/s, {4:,.1f} steps/s)'.format(stats['episodes'], stats['steps'],
+                                                                stats['wall_s'], stats['episodes_per_s'],
+                                                                stats['steps_per_s']), file=file)
+        print('{0:<20s}{1:>12s}{2:>12s}{3:>12s}{4:>10s}'.format('phase', 'calls', 'total [s]',
+                                                                'mean [us]', '% wall'), file=file)
+        print('-' * 66, file=file)
+        for name, phase in stats['phases'].items():
+            print('{0:<20s}{1:>12,d}{2:>12.3f}{3:>12.2f}{4:>10.1f}'.format(name, phase['calls'],
+                                                                          phase['total_s'], phase['mean_us'],
+                                                                          phase['pct_wall']), file=file)
+        for name, value in stats['counters'].items():
+            print('{0:<20s}{1:>12,d}'.format(name, value), file=file)
+        print('', file=file)
+
+        return stats
+
+
+# Standard benchmark workloads (fixed seeds)
+def _make_env(names, seed):
+    import gym
+
+    for name in names:
+        try:
+            env = gym.make(name)
+            break
+        except Exception:
+            continue
+    else:
+        raise ValueError('None of the environments {} is available.'.format(names))
+    if hasattr(env, 'seed'):
+        env.seed(seed)
+    else:
+        # gym >= 0.26 seeds the environment through its first reset
+        env.reset(seed=seed)
+    env.action_space.seed(seed)
+    return env
+
+
+def _reset(env):
+    out = env.reset()
+    if isinstance(out, tuple) and len(out) == 2 and isinstance(out[1], dict):
+        return out[0]
+    return out
+
+
+def _step(env, action):
+    out = env.step(action)
+    if len(out) == 5:
+        obs, reward, terminated, truncated, _ = out
+        return obs, reward, terminated or truncated
+    obs, reward, done, _ = out
+    return obs, reward, done
+
+
+def _epsilon_greedy(q_values, state, epsilon):
+    if np.random.random() < epsilon:
+        return np.random.randint(q_values.shape[1])
+    values = q_values[state]
+    return np.random.choice(np.flatnonzero(values == values.max()))
+
+
+def benchmark_blackjack_mc(prof, n_episodes=20000, seed=0):
+    """
+    First-visit MC prediction of the 'stick on 20 or 21' sample policy.
+    """
+    np.random.seed(seed)
+    env = prof.instrument_env(_make_env(['Blackjack-v0', 'Blackjack-v1'], seed))
+    policy = prof.wrap(lambda obs: 0 if obs[0] >= 20 else 1, 'action_selection')
+    returns_sum, returns_count = {}, {}
+
+    prof.start()
+    for _ in range(int(n_episodes)):
+        obs, done, episode = _reset(env), False, []
+        while not done:
+            action = policy(obs)
+            next_obs, reward, done = _step(env, action)
+            episode.append((obs, reward))
+            obs = next_obs
+        with prof.timer('value_update'):
+            g, first_visit = 0., {}
+            for t in range(len(episode) - 1, -1, -1):
+                g += episode[t][1]
+                first_visit[episode[t][0]] = g
+            for state, g in first_visit.items():
+                returns_sum[state] = returns_sum.get(state, 0.) + g
+                returns_count[state] = returns_count.get(state, 0) + 1
+        prof.episode_done(len(episode))
+    prof.stop()
+
+
+def benchmark_taxi_sarsa(prof, n_episodes=300, seed=0, step_size=0.4, discount=1., epsilon=0.017):
+    """
+    SARSA on-policy TD(0) control on 'Taxi-v3'.
+    """
+    np.random.seed(seed)
+    env = prof.instrument_env(_make_env(['Taxi-v3'], seed))
+    q_values = np.zeros((env.observation_space.n, env.action_space.n))
+    policy = prof.wrap(_epsilon_greedy, 'action_selection')
+
+    prof.start()
+    for _ in range(int(n_episodes)):
+        state, done, n_steps = _reset(env), False, 0
+        action = policy(q_values, state, epsilon)
+        while not done:
+            next_state, reward, done = _step(env, action)
+            next_action = policy(q_values, next_state, epsilon)
+            with prof.timer('q_update'):
+                target = reward + (0. if done else discount * q_values[next_state, next_action])
+                q_values[state, action] += step_size * (target - q_values[state, action])
+            state, action = next_state, next_action
+            n_steps += 1
+        prof.episode_done(n_steps)
+    prof.stop()
+
+
+def benchmark_cliffwalking_nstep_sarsa(prof, n_episodes=100, seed=0, n_step=4, step_size=0.3,
+                                       discount=1., epsilon=0.1):
+    """
+    n-step SARSA on-policy TD(n) control on 'CliffWalking-v0'.
+    """
+    np.random.seed(seed)
+    env = prof.instrument_env(_make_env(['CliffWalking-v0'], seed))
+    q_values = np.zeros((env.observation_space.n, env.action_space.n))
+    policy = prof.wrap(_epsilon_greedy, 'action_selection')
+
+    prof.start()
+    for _ in range(int(n_episodes)):
+        states = [_reset(env)]
+        actions = [policy(q_values, states[0], epsilon)]
+        rewards = [0.]
+        T, t = np.inf, 0
+        while True:
+            if t < T:
+                next_state, reward, done = _step(env, actions[t])
+                states.append(next_state)
+                rewards.append(reward)
+                if done:
+                    T = t + 1
+                else:
+                    actions.append(policy(q_values, next_state, epsilon))
+            tau = t - n_step + 1
+            if tau >= 0:
+                with prof.timer('q_update'):
+                    g = sum(discount ** (i - tau - 1) * rewards[i]
+                            for i in range(tau + 1, int(min(tau + n_step, T)) + 1))
+                    if tau + n_step < T:
+                        g += discount ** n_step * q_values[states[tau + n_step], actions[tau + n_step]]
+                    q_values[states[tau], actions[tau]] += step_size * (g - q_values[states[tau], actions[tau]])
+            if tau == T - 1:
+                break
+            t += 1
+        prof.episode_done(int(T))
+    prof.stop()
+
+
+BENCHMARKS = OrderedDict([('blackjack_mc', benchmark_blackjack_mc),
+                          ('taxi_sarsa', benchmark_taxi_sarsa),
+                          ('cliffwalking_nstep_sarsa', benchmark_cliffwalking_nstep_sarsa)])
+
+
+def run_benchmarks(names=None, seed=0, scale=1., output=None):
+    """
+    Run the fixed-seed benchmark workloads and print a summary table per workload.
+
+    Parameters
+    ----------
+    names : list of strings, optional
+        Workloads to run (default: all of `BENCHMARKS`).
+    seed : int
+        Seed of `numpy.random` and of the environments.
+    scale : float
+        Multiplier of the default number of episodes per workload.
+    output : string, optional
+        Path of a JSON file to store the statistics (for regression tracking).
+    """
+    results = OrderedDict()
+    for name in (names or list(BENCHMARKS.keys())):
+        benchmark = BENCHMARKS[name]
+        n_episodes = benchmark.__defaults__[0]
+        prof = TrainingProfiler(enabled=True)
+        benchmark(prof, n_episodes=max(1, int(scale * n_episodes)), seed=seed)
+        results[name] = prof.summary(title='[{}]'.format(name))
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Fixed-seed throughput benchmarks of the RL training loops.')
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, among {} (default: all)'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scale', type=float, default=1., help='multiplier of the number of episodes')
+    parser.add_argument('--output', default=None, help='JSON file to store the results')
+    args = parser.parse_args()
+    unknown = [name for name in args.workloads if name not in BENCHMARKS]
+    if unknown:
+        parser.error('unknown workloads: {}'.format(', '.join(unknown)))
+
+    run_benchmarks(args.workloads, seed=args.seed, scale=args.scale, output=args.output)
@@ -0,0 +1,253 @@
+import os
+import numpy as np
+from collections import OrderedDict
+
+
+class LearningCurveRecorder(object):
+    """
+    Bounded-memory recorder of learning curves for multi-trial RL sweeps.
+
+    Instead of keeping full per-episode reward histories (and final "q_values"
+    tables) for every trial in `OrderedDict`s of growing `np.array`s, every
+    independent run streams its episode rewards into reward bins:
+
+      - decimation='window':      fixed-width bins of `window` episodes,
+      - decimation='exponential': bins whose width grows geometrically by `growth`
+                                  (full resolution early on, O(log n) bins overall).
+
+    The bin means of the independent runs are combined online (Welford's
+    algorithm), so only the mean, variance and run count per bin are kept.
+    "q_values" tables can be periodically checkpointed to memory-mapped `.npy`
+    files instead of being held in memory.
+    """
+
+    def __init__(self, decimation='window', window=100, growth=1.05,
+                 checkpoint_dir=None, max_checkpoints=10):
+        if decimation not in ('window', 'exponential'):
+            raise ValueError("decimation should be either 'window' or 'exponential'")
+        if window < 1:
+            raise ValueError('window should be a positive number of episodes')
+        if growth < 1:
+            raise ValueError('growth should be larger or equal to 1')
+
+        self.decimation = decimation
+        self.window = int(window)
+        self.growth = float(growth)
+        self.checkpoint_dir = checkpoint_dir
+        self.max_checkpoints = int(max_checkpoints)
+
+        # bin edges (episode indices), shared by all trials and extended lazily
+        self._edges = [0]
+        self._trials = OrderedDict()
+        self._checkpoints = {}
+
+    # Binning
+    def _extend_edges(self, n_episodes):
+        while self._edges[-1] < n_episodes:
+            n_bins = len(self._edges) - 1
+            if self.decimation == 'window':
+                width = self.window
+            else:
+                width = max(1, int(self.window * self.growth ** n_bins))
+            self._edges.append(self._edges[-1] + width)
+
+    def bin_edges(self, n_bins=None):
+        """
+        Episode indices delimiting the reward bins (n_bins + 1 values).
+        """
+        edges = np.asarray(self._edges)
+        return edges if n_bins is None else edges[:n_bins + 1]
+
+    # Recording
+    def _trial(self, trial):
+        if trial not in self._trials:
+            self._trials[trial] = {'run': None, 'episode': 0, 'bin': 0,
+                                   'bin_sum': 0., 'bin_count': 0, 'n_episodes': 0,
+                                   'count': np.zeros(0, dtype=np.int64),
+                                   'mean': np.zeros(0), 'm2': np.zeros(0)}
+        return self._trials[trial]
+
+    def _update_bins(self, state, first_bin, values):
+        # Welford update of the per-bin statistics across independent runs
+        last_bin = first_bin + len(values)
+        if last_bin > len(state['mean']):
+            pad = last_bin - len(state['mean'])
+            state['count'] = np.concatenate([state['count'], np.zeros(pad, dtype=np.int64)])
+            state['mean'] = np.concatenate([state['mean'], np.zeros(pad)])
+            state['m2'] = np.concatenate([state['m2'], np.zeros(pad)])
+
+        idx = slice(first_bin, last_bin)
+        state['count'][idx] += 1
+        delta = values - state['mean'][idx]
+        state['mean'][idx] += delta / state['count'][idx]
+        state['m2'][idx] += delta * (values - state['mean'][idx])
+
+    def record(self, trial, reward, run=0):
+        """
+        Record the total reward of the next episode of a trial's current run.
+
+        Parameters
+        ----------
+        trial : hashable
+            Label of the RL trial (e.g. 'trial_1', 'sarsa(2)').
+        reward : float
+            Total reward of the episode.
+        run : hashable, optional
+            Id of the independent run; a new id closes the previous run.
+        """
+        state = self._trial(trial)
+        if state['run'] is not None and run != state['run']:
+            self.end_run(trial)
+        state['run'] = run
+
+        self._extend_edges(state['episode'] + 1)
+        state['bin_sum'] += reward
+        state['bin_count'] += 1
+        state['episode'] += 1
+        state['n_episodes'] = max(state['n_episodes'], state['episode'])
+        if state['episode'] == self._edges[state['bin'] + 1]:
+            self._update_bins(state, state['bin'],
+                              np.array([state['bin_sum'] / state['bin_count']]))
+            state['bin'] += 1
+            state['bin_sum'] = 0.
+            state['bin_count'] = 0
+
+    def record_run(self, trial, rewards):
+        """
+        Record a complete run (array of per-episode total rewards) at once,
+        e.g. the "tot_rewards" returned by the TD utilities, without keeping it.
+        """
+        self.end_run(trial)
+        state = self._trial(trial)
+        rewards = np.asarray(rewards, dtype=float).ravel()
+        if rewards.size == 0:
+            return
+
+        state['n_episodes'] = max(state['n_episodes'], rewards.size)
+        self._extend_edges(rewards.size)
+        edges = np.asarray(self._edges)
+        starts = edges[edges < rewards.size]
+        ends = np.minimum(edges[1:len(starts) + 1], rewards.size)
+        bin_means = np.add.reduceat(rewards, starts) / (ends - starts)
+        self._update_bins(state, 0, bin_means)
+
+    def end_run(self, trial):
+        """
+        Close the current run of a trial (flushing its last, partial bin).
+        """
+        state = self._trial(trial)
+        if state['bin_count'] > 0:
+            self._update_bins(state, state['bin'],
+                              np.array([state['bin_sum'] / state['bin_count']]))
+        state.update({'run': None, 'episode': 0, 'bin': 0, 'bin_sum': 0., 'bin_count': 0})
+
+    # Q-table checkpoints
+    def checkpoint(self, trial, q_values, episode):
+        """
+        Write a "q_values" snapshot of a trial to a memory-mapped `.npy` file.
+
+        The last `max_checkpoints` snapshots are kept in a ring buffer of shape
+        (max_checkpoints, *q_values.shape), next to a small `.npy` file with the
+        episode index of every slot (-1 for empty slots).
+        """
+        if self.checkpoint_dir is None:
+            raise ValueError('No checkpoint_dir has been given to the recorder.')
+        q_values = np.asarray(q_values)
+
+        if trial not in self._checkpoints:
+            if not os.path.exists(self.checkpoint_dir):
+                os.makedirs(self.checkpoint_dir)
+            prefix = os.path.join(self.checkpoint_dir, str(trial).replace(os.sep, '_'))
+            q_mmap = np.lib.format.open_memmap(prefix + '_q_values.npy', mode='w+',
+                                               dtype=q_values.dtype,
+                                               shape=(self.max_checkpoints,) + q_values.shape)
+            episodes = np.lib.format.open_memmap(prefix + '_episodes.npy', mode='w+',
+                                                 dtype=np.int64, shape=(self.max_checkpoints,))
+            episodes[:] = -1
+            self._checkpoints[trial] = {'q_values': q_mmap, 'episodes': episodes, 'next': 0}
+
+        ckpt = self._checkpoints[trial]
+        slot = ckpt['next'] % self.max_checkpoints
+        ckpt['q_values'][slot] = q_values
+        ckpt['episodes'][slot] = episode
+        ckpt['next'] += 1
+        ckpt['q_values'].flush()
+        ckpt['episodes'].flush()
+
+    def load_checkpoints(self, trial):
+        """
+        Read-only memory maps of a trial's checkpoints, ordered by episode.
+
+        Returns
+        -------
+        episodes : ndarray of ints
+        q_values : ndarray, shape (n_checkpoints, *q_values.shape)
+        """
+        prefix = os.path.join(self.checkpoint_dir, str(trial).replace(os.sep, '_'))
+        q_mmap = np.load(prefix + '_q_values.npy', mmap_mode='r')
+        episodes = np.load(prefix + '_episodes.npy', mmap_mode='r')
+        valid = np.flatnonzero(episodes >= 0)
+        order = valid[np.argsort(episodes[valid])]
+
+        return np.asarray(episodes[order]), q_mmap[order]
+
+    # Summaries
+    def summary(self, trial, cumulative_reward=False):
+        """
+        Compact learning curve of a trial.
+
+        Returns
+        -------
+        summary : dict with keys
+            'episodes': bin centers (episode index),
+            'mean':     mean over runs of the per-bin mean episode reward,
+            'std':      standard deviation over runs,
+            'runs':     number of runs that contributed to every bin.
+        With `cumulative_reward=True` 'mean' is the mean cumulative reward at the
+        end of every bin (the std is then omitted since it is not additive).
+        """
+        state = self._trial(trial)
+        n_bins = len(state['mean'])
+        edges = self.bin_edges(n_bins)
+        count = state['count']
+        variance = np.where(count > 1, state['m2'] / np.maximum(count - 1, 1), 0.)
+        summary = {'episodes': 0.5 * (edges[:-1] + edges[1:] - 1),
+                   'mean': state['mean'].copy(),
+                   'std': np.sqrt(variance),
+                   'runs': count.copy()}
+        if cumulative_reward:
+            edges = np.minimum(edges, state['n_episodes'])
+            summary['mean'] = np.cumsum(state['mean'] * np.diff(edges))
+            summary['episodes'] = edges[1:] - 1
+            summary['std'] = None
+
+        return summary
+
+    def rewards_per_trial(self, cumulative_reward=False):
+        """
+        `OrderedDict` of trial label -> mean learning curve, i.e. the layout the
+        notebooks pass to `PlotUtils.plot_learning_curve` (one point per bin).
+        """
+        return OrderedDict((trial, self.summary(trial, cumulative_reward)['mean'])
+                           for trial in self._trials)
+
+    def plot_learning_curve(self, title=None, cumulative_reward=False, show_std=True,
+                            figsize=(14, 7)):
+        """
+        Plot the compact learning curves of all trials (mean ± std across runs).
+        """
+        from matplotlib import pyplot as plt
+
+        plt.figure(figsize=figsize)
+        for trial in self._trials:
+            summary = self.summary(trial, cumulative_reward)
+            plt.plot(summary['episodes'], summary['mean'], label=trial)
+            if show_std and summary['std'] is not None:
+                plt.fill_between(summary['episodes'], summary['mean'] - summary['std'],
+                                 summary['mean'] + summary['std'], alpha=0.2)
+        plt.xlabel('Episodes')
+        plt.ylabel('Cumulative Reward' if cumulative_reward else 'Sum of Rewards during Episode')
+        if title is not None:
+            plt.title(title)
+        plt.legend(loc='lower right')
+        plt.show()